@@ -183,33 +183,77 @@ const state = {
 
 // ------------------ 大盘解读渲染 ------------------
 
+function marketFromOverview(data) {
+  return {
+    indices: (data.indices || []).map((i) => ({
+      name: i.name,
+      value: i.close,
+      chgPct: (i.pct_chg ?? 0) / 100,
+    })),
+    turnoverYi: data.turnover_yi ?? null,
+    turnoverDeltaPct: null,
+    northYi: null,
+    mainForceYi: null,
+    adv: data.sentiment?.adv ?? 0,
+    decl: data.sentiment?.decl ?? 0,
+    volChangePct: data.sentiment?.volume_change_pct ?? 0,
+    upLimit: data.sentiment?.limit_up ?? 0,
+    downLimit: data.sentiment?.limit_down ?? 0,
+    sectors: (data.sectors || []).map((s) => ({ name: s.name, gainPct: s.gain_pct ?? 0, moneyYi: s.money_yi ?? 0 })),
+    volIntensity: data.vol_intensity ?? 50,
+    sentimentScore: data.sentiment?.score ?? 50,
+  };
+}
+
 async function renderMarket() {
   try {
     const data = await fetchJSON("/market/overview");
-    state.market = {
-      indices: (data.indices || []).map((i) => ({
-        name: i.name,
-        value: i.close,
-        chgPct: (i.pct_chg ?? 0) / 100,
-      })),
-      turnoverYi: data.turnover_yi ?? null,
-      turnoverDeltaPct: null,
-      northYi: null,
-      mainForceYi: null,
-      adv: data.sentiment?.adv ?? 0,
-      decl: data.sentiment?.decl ?? 0,
-      volChangePct: data.sentiment?.volume_change_pct ?? 0,
-      upLimit: data.sentiment?.limit_up ?? 0,
-      downLimit: data.sentiment?.limit_down ?? 0,
-      sectors: (data.sectors || []).map((s) => ({ name: s.name, gainPct: s.gain_pct ?? 0, moneyYi: s.money_yi ?? 0 })),
-      volIntensity: data.vol_intensity ?? 50,
-      sentimentScore: data.sentiment?.score ?? 50,
-    };
+    state.market = marketFromOverview(data);
   } catch (e) {
     state.market = makeMarketSnapshot(1234567);
     toast("后端未就绪", "暂时使用示例大盘数据（请启动 FastAPI 并配置 TUSHARE_TOKEN）。");
   }
+  paintMarket();
+}
+
+function mergePatch(target, patch) {
+  const out = { ...target };
+  for (const [k, v] of Object.entries(patch)) {
+    const isObj = (x) => x && typeof x === "object" && !Array.isArray(x);
+    out[k] = isObj(v) && isObj(out[k]) ? mergePatch(out[k], v) : v;
+  }
+  return out;
+}
+
+// 服务端推送：首条 full，之后只收变化字段；不支持 SSE 或连接被关闭时退回轮询
+function startMarketStream() {
+  const poll = () => setInterval(renderMarket, 15000);
+  if (!window.EventSource) {
+    poll();
+    return;
+  }
+  let data = null;
+  const es = new EventSource(`${API_BASE}/market/overview/stream`);
+  const apply = () => {
+    state.market = marketFromOverview(data);
+    paintMarket();
+  };
+  es.addEventListener("full", (e) => {
+    data = JSON.parse(e.data);
+    apply();
+  });
+  es.addEventListener("patch", (e) => {
+    if (!data) return;
+    data = mergePatch(data, JSON.parse(e.data));
+    apply();
+  });
+  es.onerror = () => {
+    // EventSource 会自动重连；只有彻底关闭时才改用轮询
+    if (es.readyState === EventSource.CLOSED) poll();
+  };
+}
 
+function paintMarket() {
   const indicesEl = document.getElementById("indices");
   indicesEl.innerHTML = state.market.indices
     .map((i) => {
@@ -567,7 +611,23 @@ function runScreen(strategyLike) {
   runDraftScreen();
 }
 
+function todayYMD() {
+  const d = new Date();
+  return `${d.getFullYear()}${`${d.getMonth() + 1}`.padStart(2, "0")}${`${d.getDate()}`.padStart(2, "0")}`;
+}
+
 async function runScreenById(id) {
+  // 收盘后由后端批量预计算；当天已有结果时直接读取，不再触发实时选股
+  try {
+    const latest = await fetchJSON(`/strategies/${encodeURIComponent(id)}/latest`);
+    if (latest.params?.batch_id && latest.result?.trade_date === todayYMD()) {
+      renderActiveFiltersFromDraft(draftFromForm());
+      renderScreenTableFromAPI(latest.result.items || []);
+      return;
+    }
+  } catch {
+    // 没有历史结果，继续实时运行
+  }
   try {
     const data = await fetchJSON(`/strategies/${encodeURIComponent(id)}/run`, { method: "POST" });
     const res = data.result;
@@ -853,14 +913,13 @@ async function renderKlineChart(ts_code) {
   const fmt = (d) => `${d.getFullYear()}${`${d.getMonth() + 1}`.padStart(2, "0")}${`${d.getDate()}`.padStart(2, "0")}`;
 
   try {
-    const data = await fetchJSON(`/stocks/${encodeURIComponent(ts_code)}/kline?start=${fmt(start)}&end=${fmt(end)}&adj=qfq`);
-    const bars = (data.bars || []).map((b) => ({
-      time: `${b.t.slice(0, 4)}-${b.t.slice(4, 6)}-${b.t.slice(6, 8)}`,
-      open: b.o,
-      high: b.h,
-      low: b.l,
-      close: b.c,
-    }));
+    // 列式响应：每个字段一个数组（t 为整数 YYYYMMDD）；未变化时浏览器凭 ETag 拿到 304
+    const data = await fetchJSON(`/stocks/${encodeURIComponent(ts_code)}/kline?start=${fmt(start)}&end=${fmt(end)}&adj=qfq&format=columns`);
+    const cols = data.bars || { t: [] };
+    const bars = cols.t.map((t, i) => {
+      const s = String(t);
+      return { time: `${s.slice(0, 4)}-${s.slice(4, 6)}-${s.slice(6, 8)}`, open: cols.o[i], high: cols.h[i], low: cols.l[i], close: cols.c[i] };
+    });
     series.setData(bars);
     chart.timeScale().fitContent();
   } catch {
@@ -1266,6 +1325,7 @@ function bootstrap() {
   bindEvents(layoutCtl);
 
   renderMarket();
+  startMarketStream();
   refreshStrategies().then(() => {
     applyDraftToForm(defaultStrategyDraft());
     runDraftScreen();
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from backend.settings import get_settings
@@ -13,9 +13,31 @@ class Base(DeclarativeBase):
 _settings = get_settings()
 engine = create_engine(
     _settings.db_url,
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False, "timeout": _settings.db_busy_timeout_ms / 1000},
+    # 读连接池：WAL 下读不阻塞写，多个请求线程各用各的连接
+    pool_size=_settings.db_read_pool,
+    max_overflow=_settings.db_read_pool,
     future=True,
 )
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    """每个新连接的 SQLite 参数：WAL + NORMAL 同步（提交不再每次 fsync），忙等待，较大的页缓存和 mmap。"""
+    if engine.dialect.name != "sqlite":
+        return
+    cur = dbapi_conn.cursor()
+    # 只对还没建表的新库生效；旧库需离线执行一次 python -m backend.maintenance --vacuum
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={int(_settings.db_busy_timeout_ms)}")
+    cur.execute(f"PRAGMA cache_size=-{int(_settings.db_cache_mb) * 1024}")
+    cur.execute(f"PRAGMA mmap_size={int(_settings.db_mmap_mb) * 1024 * 1024}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
@@ -24,4 +46,22 @@ def init_db() -> None:
     from backend import models  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
+    _migrate_existing_tables()
+
+
+def _migrate_existing_tables() -> None:
+    """create_all 不会修改已有表：为旧库补上模型里新增的（可空）列和索引。"""
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
@@ -0,0 +1,292 @@
+"""Bulk daily-bar ingestion into the local bar store.
+
+    python -m backend.ingest                   # 全市场，默认近 5 年
+    python -m backend.ingest --incremental     # 每只股票只补最后一根已存K线之后的数据
+    python -m backend.ingest --symbols 600519.SH,000001.SZ --start 20150101
+
+Walks the universe from the spot snapshot (falling back to the symbols already
+in the bar store) and syncs each one through ``sync_bars`` — the same AkShare
+calls the kline endpoint makes. Workers share one global rate limit. Progress
+is checkpointed next to the bar store, so an interrupted run picks up where it
+stopped when started again with the same arguments. While the upstream is
+unavailable (breaker open, timeouts) all workers pause with exponential
+backoff instead of marking the remaining symbols failed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from backend.db import init_db
+from backend.services.bar_store import get_bar_store, shift_day, today_int
+from backend.services.logs import configure_logging
+from backend.services.spot_snapshot import get_spot_snapshot
+from backend.services.stocks import sync_bars
+from backend.services.upstream import UpstreamUnavailable
+from backend.settings import get_settings
+
+# 以 python -m 运行时 __name__ 是 "__main__"，固定名字才能挂到 backend 日志配置下
+log = logging.getLogger("backend.ingest")
+
+# 上游不可用时同一只股票最多暂停重试的次数；暂停时长从熔断恢复时间开始翻倍，封顶 5 分钟
+UNAVAILABLE_RETRIES = 6
+MAX_PAUSE = 300.0
+
+
+class RateLimiter:
+    """Global request spacing shared by all worker threads (``rate`` calls per second)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / max(rate, 0.01)
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every worker's next request for at least ``seconds``."""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class Checkpoint:
+    """JSON file of finished symbols for one run, keyed by its arguments as given; written atomically.
+
+    The resolved date range is stored too: resuming a run that defaulted to
+    "until today" on a later day keeps the original range (and progress).
+    """
+
+    def __init__(self, path: str, run_key: str):
+        self.path = path
+        self.run_key = run_key
+        self.done: set[str] = set()
+        self.failed: dict[str, str] = {}
+        self.start: int | None = None
+        self.end: int | None = None
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("run_key") == run_key and not data.get("finished"):
+            self.done = set(data.get("done", []))
+            self.start, self.end = data.get("start"), data.get("end")
+
+    @property
+    def resumed(self) -> bool:
+        return self.start is not None
+
+    def mark(self, ts_code: str, error: str | None) -> None:
+        with self._lock:
+            if error is None:
+                self.done.add(ts_code)
+                self.failed.pop(ts_code, None)
+            else:
+                self.failed[ts_code] = error
+        if time.monotonic() - self._saved_at >= 5:
+            self.save()
+
+    def save(self, finished: bool = False) -> None:
+        with self._lock:
+            data = {
+                "run_key": self.run_key,
+                "start": self.start,
+                "end": self.end,
+                "finished": finished,
+                "done": sorted(self.done),
+                "failed": dict(self.failed),
+                "saved_at": time.time(),
+            }
+            self._saved_at = time.monotonic()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+def universe(adj: str, symbols: list[str] | None = None) -> list[str]:
+    if symbols:
+        return symbols
+    snap = get_spot_snapshot()
+    if not snap.empty:
+        return snap.df["ts_code"].tolist()
+    # 上游不可用时至少能把已有的股票补到最新
+    log.warning("spot snapshot unavailable, using symbols already in the bar store")
+    return get_bar_store().symbols(adj)
+
+
+def _sync_one(
+    ts_code: str, start: int, end: int, adj: str, incremental: bool, limiter: RateLimiter, pause: float
+) -> tuple[int, str | None]:
+    """Returns (bars added, error or None)."""
+    store = get_bar_store()
+    before, _ = store.load(ts_code, adj)
+    n0 = len(before)
+    if incremental and n0:
+        start = int(before["t"][-1])
+    for attempt in range(UNAVAILABLE_RETRIES + 1):
+        try:
+            ok = sync_bars(ts_code, start, end, adj, limiter=limiter)
+            break
+        except UpstreamUnavailable as e:
+            if attempt == UNAVAILABLE_RETRIES:
+                return 0, str(e)
+            wait = min(MAX_PAUSE, pause * 2**attempt)
+            log.warning("upstream unavailable, pausing", extra={"ts_code": ts_code, "error": str(e), "pause_s": wait})
+            limiter.pause(wait)
+        except Exception as e:
+            return 0, str(e)
+    after, _ = store.load(ts_code, adj)
+    return len(after) - n0, None if ok else "upstream fetch failed"
+
+
+def ingest(
+    start: int | None = None,
+    end: int | None = None,
+    adj: str = "qfq",
+    incremental: bool = False,
+    workers: int = 4,
+    rate: float = 4.0,
+    symbols: list[str] | None = None,
+    retries: int = 1,
+    report_every: float = 10.0,
+    pause: float | None = None,
+) -> dict:
+    """Sync every symbol in the universe into the bar store; returns a summary.
+
+    ``end`` defaults to today and ``start`` to five years before ``end``; a
+    resumed run reuses the range it started with. ``pause`` is the first
+    backoff while the upstream is unavailable (default: the breaker's reset
+    time, when it lets a probe through).
+    """
+    settings = get_settings()
+    pause = settings.upstream_breaker_reset_seconds if pause is None else pause
+    mode = "incremental" if incremental else "full"
+    # 按用户给出的参数（而不是解析后的日期）识别同一次运行
+    run_key = f"{mode}:{adj}:{start or 'default'}:{end or 'today'}"
+    ckpt = Checkpoint(os.path.join(settings.bar_store_dir, f"_ingest_{adj}.json"), run_key)
+    if ckpt.resumed:
+        start, end = ckpt.start, ckpt.end
+    else:
+        end = end or today_int()
+        start = start or shift_day(end, -5 * 365)
+        ckpt.start, ckpt.end = start, end
+    codes = universe(adj, symbols)
+    todo = [c for c in codes if c not in ckpt.done]
+    log.info("start", extra={"run_key": run_key, "start": start, "end": end, "symbols": len(codes), "resumed": len(codes) - len(todo), "workers": workers, "rate": rate})
+
+    limiter = RateLimiter(rate)
+    t0 = time.monotonic()
+    stats = {"done": 0, "failed": 0, "bars": 0}
+    last_report = t0
+
+    def report(final: bool = False) -> None:
+        took = time.monotonic() - t0
+        per_sec = stats["done"] / took if took > 0 else 0.0
+        left = len(todo) - stats["done"] - stats["failed"]
+        eta = left / per_sec if per_sec > 0 else None
+        fields = {
+            "processed": stats["done"] + stats["failed"],
+            "total": len(todo),
+            "ok": stats["done"],
+            "failed": stats["failed"],
+            "bars": stats["bars"],
+            "sym_per_s": round(per_sec, 2),
+            "bars_per_s": round(stats["bars"] / took) if took > 0 else 0,
+        }
+        if eta is not None and not final:
+            fields["eta_s"] = round(eta)
+        else:
+            fields["seconds"] = round(took, 1)
+        log.info("finished" if final else "progress", extra=fields)
+
+    pending = todo
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            log.info("retrying failed symbols", extra={"symbols": len(pending), "attempt": attempt + 1})
+            stats["failed"] -= len(pending)
+        failed_now: list[str] = []
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest") as pool:
+            futures = {pool.submit(_sync_one, c, start, end, adj, incremental, limiter, pause): c for c in pending}
+            for fut in as_completed(futures):
+                ts_code = futures[fut]
+                added, error = fut.result()
+                ckpt.mark(ts_code, error)
+                if error is None:
+                    stats["done"] += 1
+                    stats["bars"] += added
+                else:
+                    stats["failed"] += 1
+                    failed_now.append(ts_code)
+                if time.monotonic() - last_report >= report_every:
+                    last_report = time.monotonic()
+                    report()
+        pending = failed_now
+
+    ckpt.save(finished=not ckpt.failed)
+    report(final=True)
+    if ckpt.failed:
+        sample = ", ".join(f"{c} ({e})" for c, e in list(ckpt.failed.items())[:10])
+        log.warning("symbols failed; rerun to resume", extra={"failed": len(ckpt.failed), "sample": sample})
+    return {
+        "run_key": run_key,
+        "start": start,
+        "end": end,
+        "symbols": len(codes),
+        "resumed": len(codes) - len(todo),
+        "ok": stats["done"],
+        "failed": dict(ckpt.failed),
+        "bars": stats["bars"],
+        "seconds": round(time.monotonic() - t0, 3),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.ingest", description="Bulk-download daily bars into the local bar store.")
+    parser.add_argument("--start", help="YYYYMMDD (default: 5 years ago)")
+    parser.add_argument("--end", help="YYYYMMDD (default: today)")
+    parser.add_argument("--adj", default="qfq", choices=["qfq", "none"])
+    parser.add_argument("--incremental", action="store_true", help="only fetch bars after each symbol's last stored date")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=4.0, help="global upstream requests per second")
+    parser.add_argument("--symbols", help="comma-separated ts_codes (default: whole market)")
+    parser.add_argument("--retries", type=int, default=1, help="extra passes over failed symbols")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    # 全市场快照会经过 SQLite 缓存层
+    init_db()
+    summary = ingest(
+        int(args.start) if args.start else None,
+        int(args.end) if args.end else None,
+        adj=args.adj,
+        incremental=args.incremental,
+        workers=args.workers,
+        rate=args.rate,
+        symbols=[s.strip() for s in args.symbols.split(",") if s.strip()] if args.symbols else None,
+        retries=args.retries,
+        report_every=args.report_every,
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
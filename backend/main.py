@@ -1,17 +1,49 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from backend.db import init_db
-from backend.routers import market, stocks, strategies
+from backend.routers import market, stocks, strategies, system
+from backend.services.cache_maintenance import cache_maintainer
+from backend.services.db_writer import db_writer
+from backend.services.logs import configure_logging
+from backend.services.market_stream import overview_stream
+from backend.services.metrics import MetricsMiddleware
+from backend.services.profile_store import profile_refresher
+from backend.services.spot_snapshot import spot_manager
+from backend.services.strategy_batch import strategy_scheduler
+from backend.services.strategy_store import normalize_legacy_runs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # SQLite 单写线程；全市场快照后台定时刷新；缓存表定期清理；个股资料批量维护；大盘推送轮询；收盘后批量跑策略
+    db_writer.start()
+    spot_manager.start()
+    cache_maintainer.start()
+    profile_refresher.start()
+    overview_stream.start()
+    strategy_scheduler.start()
+    yield
+    strategy_scheduler.stop()
+    overview_stream.stop()
+    profile_refresher.stop()
+    cache_maintainer.stop()
+    spot_manager.stop()
+    db_writer.stop()
 
 
 def create_app() -> FastAPI:
+    configure_logging()
     init_db()
+    # 旧版运行记录的 items 拆到 strategy_run_items（只在首次升级时有数据要搬）
+    normalize_legacy_runs()
 
-    app = FastAPI(title="stockAnalysis API", version="0.1.0")
+    app = FastAPI(title="stockAnalysis API", version="0.1.0", lifespan=lifespan)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -19,10 +51,13 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # 最外层：耗时包含 CORS 等其它中间件
+    app.add_middleware(MetricsMiddleware)
 
     app.include_router(market.router, prefix="/api")
     app.include_router(stocks.router, prefix="/api")
     app.include_router(strategies.router, prefix="/api")
+    app.include_router(system.router, prefix="/api")
 
     # Serve current project root as static (demo convenience)
     app.mount("/", StaticFiles(directory=".", html=True), name="static")
@@ -0,0 +1,45 @@
+"""Offline database maintenance; run while the server is stopped.
+
+    python -m backend.maintenance --vacuum     # 切换到 auto_vacuum=INCREMENTAL（整库 VACUUM，一次即可）
+    python -m backend.maintenance --sweep      # 清理过期缓存、按预算淘汰并压缩
+
+A full VACUUM rewrites the whole SQLite file and holds the write lock for the
+duration, so the server never runs it; its background maintainer only does
+incremental vacuum once the file is in INCREMENTAL mode.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+
+from backend.db import init_db
+from backend.services.cache_maintenance import cache_maintainer, ensure_incremental_vacuum, table_stats
+from backend.services.logs import configure_logging
+
+log = logging.getLogger("backend.maintenance")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.maintenance", description="SQLite cache maintenance (server stopped).")
+    parser.add_argument("--vacuum", action="store_true", help="switch to auto_vacuum=INCREMENTAL with one full VACUUM")
+    parser.add_argument("--sweep", action="store_true", help="purge expired rows, enforce the size budget, compact")
+    args = parser.parse_args(argv)
+    if not (args.vacuum or args.sweep):
+        parser.error("nothing to do: pass --vacuum and/or --sweep")
+
+    configure_logging()
+    init_db()
+    before = table_stats()
+    t0 = time.perf_counter()
+    if args.sweep:
+        cache_maintainer.run_once()
+    if args.vacuum:
+        ensure_incremental_vacuum()
+    log.info("maintenance finished", extra={"before": before, "after": table_stats(), "seconds": round(time.perf_counter() - t0, 1)})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import JSON, DateTime, Integer, String, Text
+from sqlalchemy import JSON, DateTime, Float, Index, Integer, LargeBinary, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from backend.db import Base
@@ -20,19 +20,59 @@ class Strategy(Base):
 
 class StrategyRun(Base):
     __tablename__ = "strategy_runs"
+    __table_args__ = (Index("ix_strategy_runs_strategy_created", "strategy_id", "created_at"),)
 
     id: Mapped[str] = mapped_column(String(64), primary_key=True)
     strategy_id: Mapped[str] = mapped_column(String(64), nullable=False)
     params: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # 只保存摘要；入选股票逐行存放在 strategy_run_items（旧数据的 items 在迁移时拆出）
     result: Mapped[dict] = mapped_column(JSON, nullable=False)
+    trade_date: Mapped[str | None] = mapped_column(String(8), nullable=True)
+    snapshot_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    item_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class StrategyRunItem(Base):
+    __tablename__ = "strategy_run_items"
+
+    run_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    rank: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts_code: Mapped[str] = mapped_column(String(16), nullable=False, index=True)
+    name: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    industry: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    close: Mapped[float | None] = mapped_column(Float, nullable=True)
+    pct_chg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    pe: Mapped[float | None] = mapped_column(Float, nullable=True)
+    mcap_yi: Mapped[float | None] = mapped_column(Float, nullable=True)
+    turnover_rate: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
 class CacheEntry(Base):
     __tablename__ = "cache"
 
     key: Mapped[str] = mapped_column(String(240), primary_key=True)
-    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
-    expires_at: Mapped[int] = mapped_column(Integer, nullable=False)  # epoch seconds
+    # 旧数据只有 payload(JSON)；新数据写入 blob，codec 记录编码方式（见 services/cache_codec.py）
+    payload: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    codec: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    blob: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    expires_at: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # epoch seconds
+    accessed_at: Mapped[int | None] = mapped_column(Integer, nullable=True)  # epoch seconds, for LRU eviction
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+
+
+class StockProfile(Base):
+    __tablename__ = "stock_profiles"
+
+    ts_code: Mapped[str] = mapped_column(String(16), primary_key=True)
+    code: Mapped[str] = mapped_column(String(12), nullable=False)
+    name: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    industry: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    area: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    market: Mapped[str] = mapped_column(String(16), nullable=False, default="")
+    list_date: Mapped[str] = mapped_column(String(8), nullable=False, default="")  # YYYYMMDD
+    total_shares: Mapped[float | None] = mapped_column(Float, nullable=True)
+    float_shares: Mapped[float | None] = mapped_column(Float, nullable=True)
+    updated_at: Mapped[int] = mapped_column(Integer, nullable=False, index=True)  # epoch seconds
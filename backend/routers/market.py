@@ -1,13 +1,25 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 
+from backend.services.executors import run_io
 from backend.services.market import market_overview
+from backend.services.market_stream import overview_stream
 
 router = APIRouter(tags=["market"])
 
 
 @router.get("/market/overview")
-def api_market_overview(date: str | None = Query(None, description="YYYYMMDD, default latest trade date")):
-    return market_overview(date)
+async def api_market_overview(date: str | None = Query(None, description="YYYYMMDD, default latest trade date")):
+    return await run_io(market_overview, date)
 
+
+@router.get("/market/overview/stream")
+async def api_market_overview_stream():
+    # Server-Sent Events：首条为 full，之后只推送变化字段（patch）
+    return StreamingResponse(
+        overview_stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,38 +1,78 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 
+from backend.services.bar_store import get_bar_store
+from backend.services.executors import run_cpu, run_io
+from backend.services.responses import json_response, make_etag, not_modified
 from backend.services.signals import compute_strategy_events
-from backend.services.stocks import get_kline, search_stocks, stock_profile
+from backend.services.spot_snapshot import get_spot_snapshot
+from backend.services.stocks import (
+    bars_to_columns,
+    bars_to_rows,
+    get_kline_array,
+    records_to_columns,
+    search_stocks,
+    stock_profile,
+)
 from backend.services.strategy_dsl import StrategyDSL
 
 router = APIRouter(tags=["stocks"])
 
+# format=columns：按列返回（struct-of-arrays），省去每行重复的键名
+FORMAT_QUERY = Query("rows", pattern="^(rows|columns)$")
+SEARCH_FIELDS = ("ts_code", "code", "name", "price", "pct_chg")
+
 
 @router.get("/stocks/search")
-def api_search_stocks(q: str = Query("", min_length=0, max_length=40)):
-    return {"items": search_stocks(q)}
+async def api_search_stocks(request: Request, q: str = Query("", min_length=0, max_length=40), format: str = FORMAT_QUERY):
+    snap = await run_io(get_spot_snapshot)
+    # 结果只取决于快照内容和查询词；版本号是进程内计数，重启/多 worker 时不能当 ETag
+    etag = make_etag("search", snap.digest, q, format)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    items = await run_cpu(search_stocks, q, snap)
+    if format == "columns":
+        items = records_to_columns(items, SEARCH_FIELDS)
+    return await json_response(request, {"items": items, "snapshot_version": snap.version, "format": format}, etag)
 
 
 @router.get("/stocks/{ts_code}/profile")
-def api_stock_profile(ts_code: str):
-    p = stock_profile(ts_code)
+async def api_stock_profile(ts_code: str):
+    snap = await run_io(get_spot_snapshot)
+    p = await run_cpu(stock_profile, ts_code, snap)
     if not p:
         raise HTTPException(status_code=404, detail="stock not found")
-    return p
+    return {**p, "snapshot_version": snap.version}
+
+
+def _kline_with_version(ts_code: str, start: str, end: str, adj: str):
+    # 版本号要读 meta 文件，和取数一起放在线程池里
+    bars = get_kline_array(ts_code, start, end, adj)
+    return bars, get_bar_store().version(ts_code, adj)
 
 
 @router.get("/stocks/{ts_code}/kline")
-def api_kline(
+async def api_kline(
+    request: Request,
     ts_code: str,
     start: str = Query(..., description="YYYYMMDD"),
     end: str = Query(..., description="YYYYMMDD"),
     adj: str = Query("qfq", pattern="^(qfq|none)$"),
+    format: str = FORMAT_QUERY,
 ):
-    return {"ts_code": ts_code, "adj": adj, "bars": get_kline(ts_code, start, end, adj)}
+    bars, version = await run_io(_kline_with_version, ts_code, start, end, adj)
+    # bar store 每次合并/替换都会递增版本：版本不变则区间内数据不变
+    etag = make_etag("kline", ts_code, adj, start, end, format, version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    body = await run_cpu(bars_to_columns if format == "columns" else bars_to_rows, bars)
+    return await json_response(request, {"ts_code": ts_code, "adj": adj, "format": format, "bars": body}, etag)
 
 
 @router.post("/stocks/{ts_code}/signals")
-def api_stock_signals(ts_code: str, dsl: StrategyDSL, days: int = 120):
-    return compute_strategy_events(ts_code, dsl, days)
+async def api_stock_signals(ts_code: str, dsl: StrategyDSL, days: int = 120):
+    return await run_io(compute_strategy_events, ts_code, dsl, days)
 
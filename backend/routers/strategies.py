@@ -1,42 +1,115 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 
-from backend.services.strategy_dsl import StrategyCreateRequest, StrategyDSL, StrategyNLParseRequest
+from backend.services.executors import run_cpu, run_io
+from backend.services.backtest import MAX_MA_WINDOW, run_backtest
+from backend.services.optimize import MAX_COMBINATIONS, run_grid_search
+from backend.services.responses import json_response
+from backend.services.strategy_dsl import (
+    BacktestRequest,
+    GridSearchRequest,
+    StrategyCreateRequest,
+    StrategyDSL,
+    StrategyNLParseRequest,
+)
 from backend.services.strategy_nlp import parse_nl_to_dsl
-from backend.services.strategy_store import create_strategy, list_strategies, run_dsl, run_strategy, strategy_runs
+from backend.services.strategy_batch import run_all_strategies, strategy_scheduler
+from backend.services.strategy_store import (
+    create_strategy,
+    diff_runs,
+    latest_strategy_run,
+    list_strategies,
+    run_dsl,
+    run_item_page,
+    run_strategy,
+    strategy_runs,
+)
 
 router = APIRouter(tags=["strategies"])
 
 
 @router.get("/strategies")
-def api_list_strategies():
-    return {"items": list_strategies()}
+async def api_list_strategies():
+    return {"items": await run_cpu(list_strategies)}
 
 
 @router.post("/strategies/parse_nl")
-def api_parse_nl(req: StrategyNLParseRequest):
+async def api_parse_nl(req: StrategyNLParseRequest):
     return parse_nl_to_dsl(req.text)
 
 
 @router.post("/strategies")
-def api_create_strategy(req: StrategyCreateRequest):
-    return create_strategy(req)
+async def api_create_strategy(req: StrategyCreateRequest):
+    return await run_cpu(create_strategy, req)
 
 @router.post("/strategies/run_draft")
-def api_run_draft(dsl: StrategyDSL):
-    return run_dsl(dsl)
+async def api_run_draft(request: Request, dsl: StrategyDSL, format: str = Query("rows", pattern="^(rows|columns)$")):
+    return await json_response(request, await run_io(run_dsl, dsl, format == "columns"))
+
+
+@router.post("/strategies/backtest")
+async def api_backtest(req: BacktestRequest):
+    # 计算在回测进程池中进行，这里只等待结果
+    return await run_io(run_backtest, req.dsl, req.ts_codes, req.start, req.end, req.adj, req.max_trades)
+
+
+@router.post("/strategies/optimize")
+async def api_grid_search(req: GridSearchRequest):
+    ma_entry = [w for w in req.maEntry if 2 <= w <= MAX_MA_WINDOW] or [5]
+    ma_exit = [w for w in req.maExit if 2 <= w <= MAX_MA_WINDOW] or [10]
+    # 先按 start/stop/step 算组合数再展开，避免极小 step 在事件循环里生成巨大列表
+    n = req.takeProfitPct.count() * req.stopLossPct.count() * len(ma_entry) * len(ma_exit)
+    if n > MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=f"grid too large: {n} > {MAX_COMBINATIONS}")
+    tp, sl = req.takeProfitPct.expand(), req.stopLossPct.expand()
+    return await run_io(
+        run_grid_search, req.dsl, tp, sl, ma_entry, ma_exit, req.ts_codes, req.start, req.end, req.adj, req.rank_by, req.top
+    )
+
+
+@router.post("/strategies/run_all")
+async def api_run_all_strategies():
+    return await run_io(run_all_strategies)
+
+
+@router.get("/strategies/schedule")
+async def api_strategy_schedule():
+    return strategy_scheduler.stats()
 
 
 @router.post("/strategies/{strategy_id}/run")
-def api_run_strategy(strategy_id: str):
+async def api_run_strategy(strategy_id: str):
     try:
-        return run_strategy(strategy_id)
+        return await run_io(run_strategy, strategy_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="strategy not found")
 
 
+@router.get("/strategies/runs/{run_id}/items")
+async def api_run_items(run_id: str, cursor: int = 0, limit: int = 50):
+    return await run_cpu(run_item_page, run_id, cursor, limit)
+
+
+@router.get("/strategies/runs/{run_id}/diff")
+async def api_run_diff(run_id: str, base: str | None = None):
+    try:
+        return await run_cpu(diff_runs, run_id, base)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="run not found")
+
+
 @router.get("/strategies/{strategy_id}/runs")
-def api_strategy_runs(strategy_id: str, limit: int = 20):
-    return {"items": strategy_runs(strategy_id, limit)}
+async def api_strategy_runs(strategy_id: str, limit: int = 20, cursor: str | None = None):
+    try:
+        return await run_cpu(strategy_runs, strategy_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
+@router.get("/strategies/{strategy_id}/latest")
+async def api_latest_strategy_run(strategy_id: str):
+    run = await run_cpu(latest_strategy_run, strategy_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="no runs yet")
+    return run
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from backend.db import engine
+from backend.services.cache import cache_stats
+from backend.services.cache_maintenance import cache_maintainer
+from backend.services.db_writer import db_writer
+from backend.services.executors import run_cpu
+from backend.services.market_stream import overview_stream
+from backend.services.metrics import registry
+from backend.services.profile_store import profile_refresher
+from backend.services.upstream import upstream_stats
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/system/cache")
+async def api_cache_stats():
+    return {"memory": cache_stats(), "sqlite": await run_cpu(cache_maintainer.stats)}
+
+
+@router.get("/system/upstream")
+async def api_upstream_stats():
+    return upstream_stats()
+
+
+@router.get("/system/profiles")
+async def api_profile_stats():
+    return await run_cpu(profile_refresher.stats)
+
+
+@router.get("/system/streams")
+async def api_stream_stats():
+    return {"market_overview": overview_stream.stats()}
+
+
+@router.get("/system/db")
+async def api_db_stats():
+    return {"writer": db_writer.stats(), "read_pool": engine.pool.status()}
+
+
+@router.get("/metrics")
+async def api_metrics():
+    """Prometheus text format. Counters live in each process: with several uvicorn workers a scrape sees one of them."""
+    return Response(await run_cpu(registry.render), media_type="text/plain; version=0.0.4; charset=utf-8")
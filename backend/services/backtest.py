@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from backend.services.bar_store import BarStore, get_bar_store, shift_day, today_int
+from backend.services.patterns import entry_mask, exit_pattern_mask
+from backend.services.strategy_dsl import StrategyDSL
+from backend.settings import get_settings
+
+# 均线窗口上限（交易日），网格搜索也按此校验
+MAX_MA_WINDOW = 60
+# 指标预热（自然日）：覆盖 MAX_MA_WINDOW 个交易日，含春节/国庆长假
+WARMUP_DAYS = MAX_MA_WINDOW * 7 // 5 + 30
+EXIT_REASONS = ("take_profit", "stop_loss", "pattern", "open")
+
+
+def load_shard(store: BarStore, ts_codes: list[str], adj: str, start: int, end: int):
+    """Concatenate the shard's bars into flat arrays plus per-bar symbol id and position."""
+    parts, sym = [], []
+    for i, code in enumerate(ts_codes):
+        b = store.slice(code, adj, shift_day(start, -WARMUP_DAYS), end)
+        if len(b):
+            parts.append(np.asarray(b))
+            sym.append(np.full(len(b), i, dtype=np.int32))
+    if not parts:
+        return None
+    bars = np.concatenate(parts)
+    sym_id = np.concatenate(sym)
+    starts = np.flatnonzero(np.diff(sym_id, prepend=-1))
+    lengths = np.diff(np.append(starts, len(sym_id)))
+    seg_pos = np.arange(len(sym_id)) - np.repeat(starts, lengths)
+    return bars, sym_id, seg_pos
+
+
+def scatter(values: np.ndarray, rows: np.ndarray, cols: np.ndarray, shape: tuple[int, int], fill) -> np.ndarray:
+    """Flat per-bar values -> dense symbols x dates matrix."""
+    out = np.full(shape, fill, dtype=values.dtype)
+    out[rows, cols] = values
+    return out
+
+
+def run_shard(ts_codes: list[str], dsl: dict, start: int, end: int, root: str, adj: str) -> dict:
+    """Backtest one shard of symbols (runs inside a worker process).
+
+    Signals are computed once over the concatenated bars; the position state
+    machine then steps through dates with every symbol of the shard as one
+    vector. Fills are at the close, like the signal engine.
+    """
+    d = StrategyDSL.model_validate(dsl)
+    loaded = load_shard(BarStore(root), ts_codes, adj, start, end)
+    if loaded is None:
+        return {"dates": np.zeros(0, np.int32), "ret_sum": np.zeros(0), "n_pos": np.zeros(0, np.int32), "trades": {}, "symbols": 0}
+    bars, sym_id, seg_pos = loaded
+    c = bars["c"].astype(float)
+    t = bars["t"]
+    valid = seg_pos >= 9
+    buy = entry_mask(c, seg_pos, d.filters.tech) & valid & (t >= start)
+    exit_pat = exit_pattern_mask(d.exits.exitPattern, bars["o"].astype(float), c, bars["v"].astype(float), seg_pos) & valid
+
+    # 散布到 symbols x dates 面板（停牌日为 NaN/False）
+    dates = np.unique(t[t >= start])
+    keep = t >= start
+    rows, cols = sym_id[keep], np.searchsorted(dates, t[keep])
+    n_sym, n_t = len(ts_codes), len(dates)
+    C = scatter(c[keep], rows, cols, (n_sym, n_t), np.nan)
+    B = scatter(buy[keep], rows, cols, (n_sym, n_t), False)
+    X = scatter(exit_pat[keep], rows, cols, (n_sym, n_t), False)
+    V = scatter(valid[keep], rows, cols, (n_sym, n_t), False)
+
+    tp, sl = d.exits.takeProfitPct, d.exits.stopLossPct
+    tp_k = np.inf if tp is None else 1 + float(tp) / 100.0
+    sl_k = -np.inf if sl is None else 1 + float(sl) / 100.0
+
+    in_pos = np.zeros(n_sym, dtype=bool)
+    entry_px = np.full(n_sym, np.nan)
+    entry_t = np.zeros(n_sym, dtype=np.int64)
+    last_c = np.full(n_sym, np.nan)
+    ret_sum = np.zeros(n_t)
+    n_pos = np.zeros(n_t, dtype=np.int32)
+    tr_sym, tr_in, tr_out, tr_px_in, tr_px_out, tr_reason = [], [], [], [], [], []
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for j in range(n_t):
+            c_j = C[:, j]
+            live = ~np.isnan(c_j)
+            held = in_pos & live
+            if held.any():
+                ret_sum[j] = np.sum(c_j[held] / last_c[held] - 1)
+                n_pos[j] = int(held.sum())
+            check = held & V[:, j]
+            tp_hit = check & (c_j >= entry_px * tp_k)
+            sl_hit = check & ~tp_hit & (c_j <= entry_px * sl_k)
+            pat_hit = check & ~tp_hit & ~sl_hit & X[:, j]
+            out = tp_hit | sl_hit | pat_hit
+            if out.any():
+                idx = np.flatnonzero(out)
+                tr_sym.append(idx)
+                tr_in.append(entry_t[idx])
+                tr_out.append(np.full(len(idx), j))
+                tr_px_in.append(entry_px[idx])
+                tr_px_out.append(c_j[idx])
+                tr_reason.append(np.where(tp_hit[idx], 0, np.where(sl_hit[idx], 1, 2)))
+                in_pos[idx] = False
+            # 与信号引擎一致：当日开始时空仓才检查买入，卖出当日不再买回
+            enter = ~in_pos & ~out & live & V[:, j] & B[:, j]
+            if enter.any():
+                in_pos[enter] = True
+                entry_px[enter] = c_j[enter]
+                entry_t[enter] = j
+            last_c[live] = c_j[live]
+
+    # 期末仍持仓的按最后收盘价记为未平仓交易
+    idx = np.flatnonzero(in_pos)
+    if len(idx):
+        last_j = n_t - 1 - np.argmax(~np.isnan(C[idx, ::-1]), axis=1)
+        tr_sym.append(idx)
+        tr_in.append(entry_t[idx])
+        tr_out.append(last_j)
+        tr_px_in.append(entry_px[idx])
+        tr_px_out.append(last_c[idx])
+        tr_reason.append(np.full(len(idx), 3))
+
+    def _cat(xs, dtype):
+        return np.concatenate(xs).astype(dtype) if xs else np.zeros(0, dtype=dtype)
+
+    trades = {
+        "ts_code": np.array(ts_codes, dtype=object)[_cat(tr_sym, np.int64)],
+        "entry_date": dates[_cat(tr_in, np.int64)],
+        "exit_date": dates[_cat(tr_out, np.int64)],
+        "entry_price": _cat(tr_px_in, float),
+        "exit_price": _cat(tr_px_out, float),
+        "reason": _cat(tr_reason, np.int8),
+    }
+    return {"dates": dates, "ret_sum": ret_sum, "n_pos": n_pos, "trades": trades, "symbols": int(len(np.unique(sym_id)))}
+
+
+def summarize(dates: np.ndarray, daily_ret: np.ndarray, trade_ret: np.ndarray, closed: np.ndarray) -> dict:
+    """Win rate over closed trades; drawdown, Sharpe (252-day annualised) and CAGR over the equity curve."""
+    equity = np.cumprod(1 + daily_ret) if len(daily_ret) else np.ones(0)
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    max_dd = float(np.max(1 - equity / peak)) if len(equity) else 0.0
+    std = float(np.std(daily_ret, ddof=1)) if len(daily_ret) > 1 else 0.0
+    sharpe = float(np.mean(daily_ret) / std * math.sqrt(252)) if std > 0 else None
+    years = len(daily_ret) / 252
+    total = float(equity[-1] - 1) if len(equity) else 0.0
+    done = trade_ret[closed]
+    return {
+        "trades": int(len(trade_ret)),
+        "closed_trades": int(closed.sum()),
+        "win_rate": round(float((done > 0).mean()), 4) if len(done) else None,
+        "avg_trade_return_pct": round(float(done.mean() * 100), 3) if len(done) else None,
+        "total_return_pct": round(total * 100, 2),
+        "cagr_pct": round(((1 + total) ** (1 / years) - 1) * 100, 2) if years > 0 and total > -1 else None,
+        "max_drawdown_pct": round(max_dd * 100, 2),
+        "sharpe": round(sharpe, 3) if sharpe is not None else None,
+        "start": int(dates[0]) if len(dates) else None,
+        "end": int(dates[-1]) if len(dates) else None,
+    }
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+pool_size = get_settings().backtest_workers or os.cpu_count() or 2
+
+
+def backtest_pool() -> ProcessPoolExecutor:
+    """Lazily started process pool (spawn: workers do not inherit the server's threads)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shard(items: list, n_shards: int) -> list[list]:
+    size = max(1, math.ceil(len(items) / max(1, n_shards)))
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def run_backtest(
+    dsl: StrategyDSL,
+    ts_codes: list[str] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    adj: str = "qfq",
+    max_trades: int = 500,
+) -> dict:
+    """Multi-symbol backtest over the local bar store, sharded by symbol across the process pool.
+
+    The portfolio holds every open signal with equal weight; days without a
+    position earn zero. Bars are not downloaded here: symbols missing from the
+    store are skipped (see ``symbols_with_data``).
+    """
+    t0 = time.perf_counter()
+    store = get_bar_store()
+    codes = sorted(set(ts_codes)) if ts_codes else store.symbols(adj)
+    end_i = int(end) if end else today_int()
+    start_i = int(start) if start else shift_day(end_i, -365 * 5)
+    pool = backtest_pool()
+    # 每个进程分到几个分片，避免个别分片（历史长的股票多）拖尾
+    n_shards = pool_size * 4
+    futures = [
+        pool.submit(run_shard, part, dsl.model_dump(), start_i, end_i, store.root, adj) for part in shard(codes, n_shards)
+    ]
+    results = [f.result() for f in futures]
+
+    # 各分片按日期汇总：组合日收益 = 当日所有持仓收益的等权平均
+    all_dates = np.unique(np.concatenate([r["dates"] for r in results])) if results else np.zeros(0, np.int32)
+    ret_sum = np.zeros(len(all_dates))
+    n_pos = np.zeros(len(all_dates))
+    for r in results:
+        pos = np.searchsorted(all_dates, r["dates"])
+        np.add.at(ret_sum, pos, r["ret_sum"])
+        np.add.at(n_pos, pos, r["n_pos"])
+    daily = np.divide(ret_sum, n_pos, out=np.zeros_like(ret_sum), where=n_pos > 0)
+
+    parts = [r["trades"] for r in results if r["trades"]]
+    tr = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]} if parts else None
+    if tr is None or not len(tr["ts_code"]):
+        trade_ret = np.zeros(0)
+        closed = np.zeros(0, dtype=bool)
+        trades: list[dict] = []
+    else:
+        trade_ret = tr["exit_price"] / tr["entry_price"] - 1
+        closed = tr["reason"] != EXIT_REASONS.index("open")
+        order = np.argsort(tr["exit_date"], kind="stable")[::-1][:max_trades]
+        trades = [
+            {
+                "ts_code": str(tr["ts_code"][i]),
+                "entry_date": int(tr["entry_date"][i]),
+                "exit_date": int(tr["exit_date"][i]),
+                "entry_price": round(float(tr["entry_price"][i]), 3),
+                "exit_price": round(float(tr["exit_price"][i]), 3),
+                "return_pct": round(float(trade_ret[i] * 100), 2),
+                "reason": EXIT_REASONS[int(tr["reason"][i])],
+            }
+            for i in order
+        ]
+
+    equity = np.cumprod(1 + daily)
+    return {
+        "params": {"start": start_i, "end": end_i, "adj": adj, "symbols": len(codes)},
+        "symbols_with_data": int(sum(r["symbols"] for r in results)),
+        "stats": summarize(all_dates, daily, trade_ret, closed),
+        "equity": {
+            "dates": all_dates.astype(int).tolist(),
+            "values": np.round(equity, 5).tolist(),
+            "positions": n_pos.astype(int).tolist(),
+        },
+        "trades": trades,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "computed_at": datetime.now().isoformat(timespec="seconds"),
+    }
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from backend.settings import get_settings
+
+
+# 每只股票、每种复权方式一个结构化数组文件，按交易日升序；t 为 YYYYMMDD 整数
+BAR_DTYPE = np.dtype(
+    [
+        ("t", "<i4"),
+        ("o", "<f8"),
+        ("h", "<f8"),
+        ("l", "<f8"),
+        ("c", "<f8"),
+        ("v", "<f8"),
+        ("a", "<f8"),
+    ]
+)
+
+
+def yyyymmdd_to_int(s: str) -> int:
+    return int(str(s).replace("-", "")[:8])
+
+
+def int_to_date(d: int) -> date:
+    return date(d // 10000, d // 100 % 100, d % 100)
+
+
+def shift_day(d: int, days: int) -> int:
+    x = int_to_date(d) + timedelta(days=days)
+    return x.year * 10000 + x.month * 100 + x.day
+
+
+def t_to_days(t: np.ndarray) -> np.ndarray:
+    """YYYYMMDD 整数数组 -> 自 1970-01-01 起的天数（int64）。"""
+    t = np.asarray(t, dtype=np.int64)
+    months = (t // 10000 - 1970) * 12 + (t // 100 % 100 - 1)
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + (t % 100 - 1)
+
+
+def today_int() -> int:
+    t = datetime.now()
+    return t.year * 10000 + t.month * 100 + t.day
+
+
+class BarStore:
+    """Persistent per-symbol OHLCV store.
+
+    Layout: ``{root}/{adj}/{ts_code}.json`` records the calendar range already
+    fetched from upstream (``start``/``end``), so ranges without trading days
+    are not fetched twice, and names the ``BAR_DTYPE`` array file
+    ``{ts_code}.v{version}.npy``. Arrays are opened memory-mapped and any date
+    window is answered by slicing. Every write goes to a new file, so a file is
+    never replaced while a reader still has it mapped (Windows refuses that).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+        # (ts_code, adj) -> (version, bars, meta)
+        self._open: dict[tuple[str, str], tuple[int, np.ndarray, dict]] = {}
+        # 删除失败的旧版本文件（仍被映射），之后的写入时再试
+        self._stale: set[str] = set()
+
+    def _paths(self, ts_code: str, adj: str, meta: dict | None = None) -> tuple[str, str]:
+        """(array path, meta path); the array path comes from ``meta["file"]`` (older stores: ``{ts_code}.npy``)."""
+        d = os.path.join(self.root, adj or "none")
+        name = (meta or {}).get("file") or f"{ts_code}.npy"
+        return os.path.join(d, name), os.path.join(d, f"{ts_code}.json")
+
+    def symbols(self, adj: str) -> list[str]:
+        """Every ts_code with stored bars for ``adj``, sorted."""
+        d = os.path.join(self.root, adj or "none")
+        try:
+            names = os.listdir(d)
+        except OSError:
+            return []
+        return sorted(n[: -len(".json")] for n in names if n.endswith(".json"))
+
+    def key_lock(self, ts_code: str, adj: str) -> threading.Lock:
+        with self._lock:
+            lk = self._key_locks.get((ts_code, adj))
+            if lk is None:
+                lk = self._key_locks[(ts_code, adj)] = threading.Lock()
+            return lk
+
+    def load(self, ts_code: str, adj: str) -> tuple[np.ndarray, dict | None]:
+        """Return (bars, meta); meta is None when nothing is stored yet."""
+        _, meta_path = self._paths(ts_code, adj)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return np.zeros(0, dtype=BAR_DTYPE), None
+        version = int(meta.get("version", 0))
+        opened = self._open.get((ts_code, adj))
+        if opened and opened[0] == version:
+            return opened[1], opened[2]
+        try:
+            bars = np.load(self._paths(ts_code, adj, meta)[0], mmap_mode="r")
+        except (OSError, ValueError):
+            return np.zeros(0, dtype=BAR_DTYPE), None
+        self._open[(ts_code, adj)] = (version, bars, meta)
+        return bars, meta
+
+    def version(self, ts_code: str, adj: str) -> int:
+        """Bumped on every merge/replace; 0 when nothing is stored (used for ETags)."""
+        _, meta = self.load(ts_code, adj)
+        return int((meta or {}).get("version", 0))
+
+    def slice(self, ts_code: str, adj: str, start: int, end: int) -> np.ndarray:
+        bars, _ = self.load(ts_code, adj)
+        if not len(bars):
+            return bars
+        t = bars["t"]
+        i = int(np.searchsorted(t, start, side="left"))
+        j = int(np.searchsorted(t, end, side="right"))
+        return bars[i:j]
+
+    def missing_ranges(self, ts_code: str, adj: str, start: int, end: int, live_ttl: int) -> list[tuple[int, int]]:
+        """Calendar ranges that still have to come from upstream to cover [start, end].
+
+        The stored coverage is a single contiguous range, so a gap is always
+        extended to join it: a window entirely before (after) the stored range
+        is fetched up to the day before it starts (from the day after it ends).
+        Today's bar is only considered fresh for ``live_ttl`` seconds since it may
+        still be forming during the session.
+        """
+        end = min(end, today_int())
+        if start > end:
+            return []
+        _, meta = self.load(ts_code, adj)
+        if meta is None:
+            return [(start, end)]
+        cs, ce = int(meta["start"]), int(meta["end"])
+        out: list[tuple[int, int]] = []
+        if start < cs:
+            out.append((start, shift_day(cs, -1)))
+        if end > ce:
+            out.append((shift_day(ce, 1), end))
+        elif end == ce == today_int() and time.time() - float(meta.get("refreshed_at", 0)) > live_ttl:
+            out.append((ce, end))
+        return out
+
+    def merge(self, ts_code: str, adj: str, new: np.ndarray, start: int, end: int) -> int:
+        """Merge freshly fetched bars for calendar range [start, end]; returns the new version.
+
+        Bars from ``new`` replace stored bars on the same date. [start, end] must
+        overlap or touch the stored coverage (see ``missing_ranges``), otherwise
+        the dates in between would be recorded as fetched. The caller must hold
+        ``key_lock(ts_code, adj)``.
+        """
+        bars, meta = self.load(ts_code, adj)
+        if len(bars):
+            keep = ~np.isin(bars["t"], new["t"])
+            merged = np.concatenate([np.asarray(bars[keep]), new])
+            merged = merged[np.argsort(merged["t"], kind="stable")]
+        else:
+            merged = np.sort(new, order="t")
+        if meta is None:
+            cs, ce = start, end
+        else:
+            cs, ce = int(meta["start"]), int(meta["end"])
+            if start > shift_day(ce, 1) or end < shift_day(cs, -1):
+                raise ValueError(f"{ts_code} {adj}: [{start}, {end}] does not touch stored coverage [{cs}, {ce}]")
+            cs, ce = min(cs, start), max(ce, end)
+        version = int((meta or {}).get("version", 0)) + 1
+        self._write(ts_code, adj, merged, {"start": cs, "end": ce, "version": version, "refreshed_at": time.time()})
+        return version
+
+    def replace(self, ts_code: str, adj: str, bars: np.ndarray, start: int, end: int) -> int:
+        """Drop whatever is stored and keep only ``bars`` for [start, end]."""
+        _, meta = self.load(ts_code, adj)
+        version = int((meta or {}).get("version", 0)) + 1
+        self._write(ts_code, adj, np.sort(bars, order="t"), {"start": start, "end": end, "version": version, "refreshed_at": time.time()})
+        return version
+
+    def _write(self, ts_code: str, adj: str, bars: np.ndarray, meta: dict) -> None:
+        _, old_meta = self.load(ts_code, adj)
+        old_npy = self._paths(ts_code, adj, old_meta)[0] if old_meta is not None else None
+        meta = {**meta, "file": f"{ts_code}.v{meta['version']}.npy"}
+        npy, meta_path = self._paths(ts_code, adj, meta)
+        os.makedirs(os.path.dirname(npy), exist_ok=True)
+        # 数组写到新文件名（不覆盖可能仍被 mmap 的旧文件），再原子替换 meta 指向它
+        tmp = f"{npy}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=BAR_DTYPE))
+        os.replace(tmp, npy)
+        tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+        self._open.pop((ts_code, adj), None)
+        if old_npy is not None and old_npy != npy:
+            self._stale.add(old_npy)
+        self._remove_stale()
+
+    def _remove_stale(self) -> None:
+        with self._lock:
+            paths = list(self._stale)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Windows：仍有读者映射着旧文件，下次再删
+                continue
+            with self._lock:
+                self._stale.discard(path)
+
+
+_store: BarStore | None = None
+
+
+def get_bar_store() -> BarStore:
+    global _store
+    if _store is None:
+        _store = BarStore(get_settings().bar_store_dir)
+    return _store
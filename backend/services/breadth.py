@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.services.profile_store import profile_store
+from backend.services.spot_snapshot import SpotSnapshot, spot_manager
+
+# 每个方向返回的板块数（涨幅榜、资金榜各取前 N，合并去重）
+SECTOR_TOP_N = 8
+
+
+def limit_pct(codes: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """涨跌停幅度：科创板/创业板 20%，北交所 30%，主板 ST 5%，其余 10%。"""
+    codes = codes.astype(str)
+    pct = np.full(len(codes), 0.10)
+    st = np.char.find(np.char.upper(names.astype(str)), "ST") >= 0
+    pct[st] = 0.05
+    star_gem = np.char.startswith(codes, "688") | np.char.startswith(codes, "689") | np.char.startswith(codes, "30")
+    pct[star_gem] = 0.20
+    bj = np.char.startswith(codes, "8") | np.char.startswith(codes, "4") | np.char.startswith(codes, "92")
+    pct[bj] = 0.30
+    return pct
+
+
+def limit_flags(close: np.ndarray, pre_close: np.ndarray, pct_chg: np.ndarray, lim: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Board-aware limit-up/down; limit prices are rounded to the tick like the exchange does."""
+    with np.errstate(invalid="ignore"):
+        has_pre = (pre_close > 0) & (close > 0)
+        up_price = np.round(pre_close * (1 + lim) + 1e-9, 2)
+        down_price = np.round(pre_close * (1 - lim) + 1e-9, 2)
+        # 价格到达涨跌停价；涨跌幅再做一次粗校验（低价股取整后可偏离 1 个百分点以内）
+        up = np.where(has_pre, close >= up_price - 1e-6, True) & (pct_chg >= lim * 100 - 1)
+        down = np.where(has_pre, close <= down_price + 1e-6, True) & (pct_chg <= -lim * 100 + 1)
+    return up & (close > 0), down & (close > 0)
+
+
+def _sectors(df: pd.DataFrame, industry: np.ndarray) -> list[dict]:
+    has = industry != ""
+    if not has.any():
+        return []
+    names, inv = np.unique(industry[has], return_inverse=True)
+    pct = df["pct_chg"].to_numpy()[has]
+    amount = np.nan_to_num(df["amount"].to_numpy()[has])
+    ok = ~np.isnan(pct)
+    count = np.bincount(inv, weights=ok.astype(float), minlength=len(names))
+    gain = np.bincount(inv, weights=np.where(ok, pct, 0.0), minlength=len(names)) / np.maximum(count, 1)
+    # 没有主力资金口径时，用“上涨成交额 - 下跌成交额”近似板块资金方向
+    money = np.bincount(inv, weights=amount * np.sign(np.nan_to_num(pct)), minlength=len(names)) / 1e8
+    top = np.argsort(-gain)[:SECTOR_TOP_N].tolist()
+    top += [i for i in np.argsort(-money)[:SECTOR_TOP_N].tolist() if i not in top]
+    return [
+        {"name": str(names[i]), "gain_pct": round(float(gain[i]), 2), "money_yi": round(float(money[i]), 1), "count": int(count[i])}
+        for i in top
+    ]
+
+
+def compute_breadth(snap: SpotSnapshot) -> dict:
+    """One vectorized pass over the spot table: breadth, limits, turnover and industry aggregates."""
+    df = snap.df
+    if df.empty:
+        return {}
+    pct = df["pct_chg"].to_numpy()
+    close = df["close"].to_numpy()
+    lim = limit_pct(df["code"].to_numpy(), df["name"].to_numpy())
+    up, down = limit_flags(close, df["pre_close"].to_numpy(), pct, lim)
+    amount = np.nan_to_num(df["amount"].to_numpy())
+    vol = np.nan_to_num(df["vol"].to_numpy())
+    ratio = df["volume_ratio"].to_numpy()
+    # 量比 = 当前成交量 / 过去5日同时段均量；按成交量加权得到全市场量能变化
+    with np.errstate(invalid="ignore", divide="ignore"):
+        base = np.where(ratio > 0, vol / ratio, 0.0)
+    vol_change = (vol[ratio > 0].sum() / base.sum() - 1) * 100 if base.sum() > 0 else None
+
+    prof = profile_store.frame()
+    industry = (
+        pd.Series(prof["industry"].to_numpy(), index=prof["ts_code"].to_numpy())
+        .reindex(df["ts_code"].to_numpy())
+        .fillna("")
+        .to_numpy(dtype=str)
+    )
+    return {
+        "adv": int((pct > 0).sum()),
+        "decl": int((pct < 0).sum()),
+        "flat": int((pct == 0).sum()),
+        "limit_up": int(up.sum()),
+        "limit_down": int(down.sum()),
+        "volume_change_pct": round(float(vol_change), 1) if vol_change is not None else None,
+        "turnover_yi": round(float(amount.sum()) / 1e8, 1),
+        "sectors": _sectors(df, industry),
+    }
+
+
+_memo: tuple[tuple[int, int], dict] | None = None
+_lock = threading.Lock()
+
+
+def get_breadth(snap: SpotSnapshot) -> dict:
+    """Breadth for ``snap``, computed once per (snapshot version, profile version)."""
+    global _memo
+    key = (snap.version, profile_store.version)
+    memo = _memo
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    with _lock:
+        if _memo is None or _memo[0] != key:
+            _memo = (key, compute_breadth(snap))
+        return _memo[1]
+
+
+# 快照刷新后立即预计算
+spot_manager.subscribe(get_breadth)
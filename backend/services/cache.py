@@ -1,39 +1,195 @@
 from __future__ import annotations
 
+import logging
+import sys
+import threading
 import time
+from collections import OrderedDict, defaultdict
 from typing import Any
 
-from sqlalchemy import select
+import pandas as pd
+from sqlalchemy import delete, select, update
 
 from backend.db import SessionLocal
 from backend.models import CacheEntry
+from backend.services.cache_codec import decode_payload, encode_payload
+from backend.services.db_writer import db_writer
+from backend.services.metrics import cache_payload_bytes, registry
+from backend.settings import get_settings
 
+log = logging.getLogger(__name__)
 
-def cache_get(key: str) -> dict | None:
+
+def key_family(key: str) -> str:
+    """`akshare:kline:v1:...` -> `akshare:kline`，用于按前缀统计。"""
+    return ":".join(key.split(":", 2)[:2])
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Rough in-memory footprint in bytes (good enough for a byte budget)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, dict):
+        n = sys.getsizeof(obj)
+        if _depth > 6:
+            return n
+        return n + sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        n = sys.getsizeof(obj)
+        if not obj or _depth > 6:
+            return n
+        # 长列表按前若干项抽样估算
+        sample = obj[:32]
+        per = sum(approx_size(x, _depth + 1) for x in sample) / len(sample)
+        return n + int(per * len(obj))
+    return sys.getsizeof(obj)
+
+
+class MemoryTier:
+    """Size-bounded in-process LRU holding decoded cache payloads.
+
+    Entries expire at the earlier of the SQLite row's ``expires_at`` and
+    ``max_ttl`` seconds after they were loaded, which bounds how long another
+    process's write to the SQLite tier can go unnoticed. Returned payloads are
+    shared objects and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int, max_ttl: int):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.bytes = 0
+        # key -> (value, memory expiry, size, row expires_at)
+        self._data: OrderedDict[str, tuple[Any, float, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"mem_hits": 0, "db_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "sets": 0}
+        )
+
+    def get(self, key: str, now: float) -> tuple[Any, float] | None:
+        """Return (value, row expires_at) or None."""
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            value, mem_exp, size, expires_at = hit
+            if mem_exp <= now:
+                del self._data[key]
+                self.bytes -= size
+                return None
+            self._data.move_to_end(key)
+            self.stats[key_family(key)]["mem_hits"] += 1
+            return value, expires_at
+
+    def put(self, key: str, value: Any, expires_at: float, now: float) -> None:
+        size = approx_size(value) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            self.discard(key)
+            return
+        exp = min(expires_at, now + self.max_ttl)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (value, exp, size, expires_at)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._data:
+                k, (_, _, s, _) = self._data.popitem(last=False)
+                self.bytes -= s
+                self.stats[key_family(k)]["evictions"] += 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def count(self, key: str, field: str) -> None:
+        with self._lock:
+            self.stats[key_family(key)][field] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "families": {k: dict(v) for k, v in self.stats.items()},
+            }
+
+
+_settings = get_settings()
+memory_tier = MemoryTier(max_bytes=_settings.cache_memory_max_bytes, max_ttl=_settings.cache_memory_max_ttl_seconds)
+
+
+def cache_get(key: str) -> Any | None:
+    hit = cache_peek(key)
+    return hit[0] if hit else None
+
+
+def cache_peek(key: str) -> tuple[Any, int] | None:
+    """Like cache_get but also returns the entry's expires_at (epoch seconds)."""
     now = int(time.time())
+    hit = memory_tier.get(key, time.time())
+    if hit is not None:
+        return hit
     with SessionLocal() as db:
         row = db.execute(select(CacheEntry).where(CacheEntry.key == key)).scalar_one_or_none()
         if not row:
+            memory_tier.count(key, "misses")
             return None
-        if row.expires_at <= now:
-            try:
-                db.delete(row)
-                db.commit()
-            except Exception:
-                db.rollback()
-            return None
-        return row.payload
+        codec, blob, legacy, expires_at, accessed_at = row.codec, row.blob, row.payload, row.expires_at, row.accessed_at
+    # 读路径不直接写库：过期删除、访问时间都交给写线程合并提交
+    if expires_at <= now:
+        db_writer.defer(lambda db: db.execute(delete(CacheEntry).where(CacheEntry.key == key, CacheEntry.expires_at <= now)), "cache expire")
+        memory_tier.count(key, "expired")
+        return None
+    try:
+        payload = decode_payload(codec, blob) if codec else legacy
+    except Exception as e:
+        log.warning("undecodable entry", extra={"key": key, "error": str(e)})
+        memory_tier.count(key, "misses")
+        return None
+    if (accessed_at or 0) < now - 60:
+        # 只在 SQLite 层命中时记录访问时间（节流到每分钟一次），供容量淘汰使用
+        db_writer.defer(lambda db: db.execute(update(CacheEntry).where(CacheEntry.key == key).values(accessed_at=now)), "cache touch")
+    memory_tier.count(key, "db_hits")
+    memory_tier.put(key, payload, expires_at, time.time())
+    return payload, expires_at
 
 
-def cache_set(key: str, payload: dict, ttl_seconds: int) -> None:
+def cache_set(key: str, payload: Any, ttl_seconds: int) -> None:
+    """payload: JSON-able dict, or a DataFrame / dict holding DataFrames (stored columnar)."""
     now = int(time.time())
     exp = now + max(1, ttl_seconds)
-    with SessionLocal() as db:
-        existing = db.execute(select(CacheEntry).where(CacheEntry.key == key)).scalar_one_or_none()
-        if existing:
-            existing.payload = payload
-            existing.expires_at = exp
-        else:
-            db.add(CacheEntry(key=key, payload=payload, expires_at=exp))
-        db.commit()
+    codec, blob = encode_payload(payload)
+
+    def _upsert(db) -> None:
+        db.merge(CacheEntry(key=key, payload=None, codec=codec, blob=blob, size_bytes=len(blob), expires_at=exp, accessed_at=now))
+
+    # 内存层立即可见；SQLite 行由写线程批量落盘
+    db_writer.defer(_upsert, "cache set")
+    memory_tier.count(key, "sets")
+    cache_payload_bytes.observe(len(blob), family=key_family(key))
+    memory_tier.put(key, payload, exp, time.time())
+
+
+def cache_stats() -> dict:
+    return memory_tier.snapshot()
+
+
+def _cache_event_samples():
+    # mem_hits / db_hits / misses / expired / evictions / sets，按键前缀分组
+    for family, counts in memory_tier.snapshot()["families"].items():
+        for event, n in counts.items():
+            yield {"family": family, "event": event}, n
+
+
+def _memory_tier_samples():
+    snap = memory_tier.snapshot()
+    yield {"stat": "bytes"}, snap["bytes"]
+    yield {"stat": "max_bytes"}, snap["max_bytes"]
+    yield {"stat": "entries"}, snap["entries"]
+
 
+registry.collect("stockanalysis_cache_events_total", "Cache lookups and writes per key family and outcome.", "counter", _cache_event_samples)
+registry.collect("stockanalysis_cache_memory", "In-process cache tier size.", "gauge", _memory_tier_samples)
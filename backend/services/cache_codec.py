@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+try:  # optional, faster than zlib
+    import zstandard as _zstd
+except ImportError:  # pragma: no cover - optional dependency
+    _zstd = None
+
+try:  # optional
+    import lz4.frame as _lz4
+except ImportError:  # pragma: no cover - optional dependency
+    _lz4 = None
+
+
+# JSON 小于该字节数时不压缩
+SMALL_JSON_BYTES = 1024
+
+_FRAME_MAGIC = b"SAF1"
+
+
+# ---- compressors ----
+
+_COMPRESSORS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "zlib": (lambda b: zlib.compress(b, 1), zlib.decompress),
+}
+if _lz4 is not None:
+    _COMPRESSORS["lz4"] = (_lz4.compress, _lz4.decompress)
+if _zstd is not None:
+    _COMPRESSORS["zstd"] = (_zstd.ZstdCompressor(level=3).compress, lambda b: _zstd.ZstdDecompressor().decompress(b))
+
+DEFAULT_COMPRESSION = "zstd" if "zstd" in _COMPRESSORS else "lz4" if "lz4" in _COMPRESSORS else "zlib"
+
+
+# ---- columnar DataFrame encoding ----
+
+
+def _encode_frame(df: pd.DataFrame, buffers: list[bytes], offset: int) -> tuple[dict, int]:
+    """Append column buffers for ``df``; returns (spec, new offset). Index is not kept."""
+    cols = []
+    for name in df.columns:
+        s = df[name]
+        arr = s.to_numpy()
+        if arr.dtype.kind in "biufcmM":
+            data = np.ascontiguousarray(arr).tobytes()
+            cols.append({"name": name, "kind": "num", "dtype": arr.dtype.str, "offset": offset, "nbytes": len(data)})
+            buffers.append(data)
+            offset += len(data)
+            continue
+        # 文本/对象列：定长 UTF-32 数组（解码时由 NumPy 一次性转为 str）+ 空值掩码
+        null = s.isna().to_numpy()
+        text = np.array(["" if n else str(v) for v, n in zip(arr.tolist(), null.tolist())], dtype=str)
+        if text.dtype.itemsize == 0:
+            text = text.astype("<U1")
+        data = text.astype(text.dtype.newbyteorder("<")).tobytes()
+        mask = np.packbits(null).tobytes()
+        buffers.extend([data, mask])
+        cols.append({"name": name, "kind": "str", "dtype": text.dtype.newbyteorder("<").str, "offset": offset, "nbytes": [len(data), len(mask)]})
+        offset += len(data) + len(mask)
+    return {"nrows": len(df), "columns": cols}, offset
+
+
+def _decode_frame(spec: dict, body: memoryview) -> pd.DataFrame:
+    n = spec["nrows"]
+    data: dict[str, Any] = {}
+    for c in spec["columns"]:
+        off = c["offset"]
+        if c["kind"] == "num":
+            data[c["name"]] = np.frombuffer(body[off : off + c["nbytes"]], dtype=np.dtype(c["dtype"])).copy()
+            continue
+        n_text, n_null = c["nbytes"]
+        values = np.frombuffer(body[off : off + n_text], dtype=np.dtype(c["dtype"])).astype(object)
+        null = np.unpackbits(np.frombuffer(body[off + n_text : off + n_text + n_null], dtype=np.uint8))[:n].astype(bool)
+        if null.any():
+            values[null] = None
+        data[c["name"]] = values
+    return pd.DataFrame(data, columns=[c["name"] for c in spec["columns"]])
+
+
+def _has_frame(obj: Any) -> bool:
+    return isinstance(obj, pd.DataFrame) or (isinstance(obj, dict) and any(isinstance(v, pd.DataFrame) for v in obj.values()))
+
+
+def _encode_frames(obj: Any) -> bytes:
+    buffers: list[bytes] = []
+    offset = 0
+    frames: list[dict] = []
+    if isinstance(obj, pd.DataFrame):
+        spec, offset = _encode_frame(obj, buffers, offset)
+        frames.append(spec)
+        meta: Any = {"__frame__": 0}
+    else:
+        meta = {}
+        for k, v in obj.items():
+            if isinstance(v, pd.DataFrame):
+                spec, offset = _encode_frame(v, buffers, offset)
+                meta[k] = {"__frame__": len(frames)}
+                frames.append(spec)
+            else:
+                meta[k] = v
+    header = json.dumps({"meta": meta, "frames": frames}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _FRAME_MAGIC + struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+def _decode_frames(raw: bytes) -> Any:
+    if raw[:4] != _FRAME_MAGIC:
+        raise ValueError("not a frame payload")
+    (hlen,) = struct.unpack("<I", raw[4:8])
+    header = json.loads(raw[8 : 8 + hlen])
+    body = memoryview(raw)[8 + hlen :]
+    frames = [_decode_frame(spec, body) for spec in header["frames"]]
+    meta = header["meta"]
+    if isinstance(meta, dict) and set(meta) == {"__frame__"}:
+        return frames[meta["__frame__"]]
+    return {k: frames[v["__frame__"]] if isinstance(v, dict) and set(v) == {"__frame__"} else v for k, v in meta.items()}
+
+
+# ---- codec registry; codec names are stored per cache row, e.g. "frame+zstd" ----
+
+_CODECS: dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (
+        lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"),
+        json.loads,
+    ),
+    "frame": (_encode_frames, _decode_frames),
+}
+
+
+def encode_payload(obj: Any, compression: str | None = None) -> tuple[str, bytes]:
+    """Pick a codec for ``obj``: columnar frames for DataFrame payloads, JSON otherwise."""
+    name = "frame" if _has_frame(obj) else "json"
+    raw = _CODECS[name][0](obj)
+    if name == "json" and len(raw) < SMALL_JSON_BYTES:
+        return name, raw
+    comp = compression or DEFAULT_COMPRESSION
+    return f"{name}+{comp}", _COMPRESSORS[comp][0](raw)
+
+
+def decode_payload(codec: str, blob: bytes) -> Any:
+    name, _, comp = codec.partition("+")
+    if comp:
+        if comp not in _COMPRESSORS:
+            raise ValueError(f"compression {comp!r} not available")
+        blob = _COMPRESSORS[comp][1](blob)
+    return _CODECS[name][1](blob)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import delete, func, select, text
+
+from backend.db import SessionLocal, engine
+from backend.models import CacheEntry
+from backend.services.cache import memory_tier
+from backend.services.db_writer import db_writer
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+def _entry_bytes():
+    # 旧行没有 size_bytes，按 payload/blob 长度估算
+    return func.coalesce(CacheEntry.size_bytes, func.length(CacheEntry.blob), func.length(CacheEntry.payload), 0)
+
+
+def sweep_expired(batch_size: int = 500, now: int | None = None) -> int:
+    """Bulk-delete expired rows in batches (through the writer thread); returns the number of rows removed."""
+    now = int(time.time()) if now is None else now
+    total = 0
+
+    def _batch(db) -> int:
+        keys = select(CacheEntry.key).where(CacheEntry.expires_at <= now).limit(batch_size).scalar_subquery()
+        return db.execute(delete(CacheEntry).where(CacheEntry.key.in_(keys))).rowcount
+
+    while True:
+        n = db_writer.write(_batch)
+        total += n
+        if n < batch_size:
+            return total
+
+
+def enforce_budget(max_bytes: int, batch_size: int = 500) -> int:
+    """Evict least-recently-accessed (then soonest-expiring) rows until the table fits ``max_bytes``."""
+    evicted = 0
+    with SessionLocal() as db:
+        used = int(db.execute(select(func.sum(_entry_bytes()))).scalar() or 0)
+    while used > max_bytes:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(CacheEntry.key, _entry_bytes())
+                .order_by(func.coalesce(CacheEntry.accessed_at, 0), CacheEntry.expires_at)
+                .limit(batch_size)
+            ).all()
+        if not rows:
+            break
+        victims: list[str] = []
+        for key, size in rows:
+            victims.append(key)
+            used -= int(size or 0)
+            if used <= max_bytes:
+                break
+        # 只读查询走普通连接，删除交给写线程（不和它抢 SQLite 写锁）
+        db_writer.write(lambda db: db.execute(delete(CacheEntry).where(CacheEntry.key.in_(victims))))
+        for key in victims:
+            memory_tier.discard(key)
+        evicted += len(victims)
+    return evicted
+
+
+def incremental_vacuum_enabled() -> bool:
+    if engine.dialect.name != "sqlite":
+        return True
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+
+
+def ensure_incremental_vacuum() -> None:
+    """Switch the SQLite file to auto_vacuum=INCREMENTAL (needs one full VACUUM the first time).
+
+    The VACUUM locks the whole database while it rewrites the file: only run
+    it from ``python -m backend.maintenance --vacuum`` with the server stopped.
+    """
+    if incremental_vacuum_enabled():
+        return
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+
+
+def compact(pages: int = 2000) -> None:
+    """Release free pages back to the OS and checkpoint the WAL (no-op when not in WAL mode)."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect() as conn:
+        conn.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        conn.commit()
+
+
+def table_stats() -> dict:
+    with SessionLocal() as db:
+        rows, used = db.execute(select(func.count(), func.sum(_entry_bytes())).select_from(CacheEntry)).one()
+    db_path = engine.url.database
+    file_bytes = os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None
+    return {"rows": int(rows or 0), "bytes": int(used or 0), "file_bytes": file_bytes}
+
+
+class CacheMaintainer:
+    """Periodic sweeper: expiry purge every ``sweep_interval``, budget eviction, and compaction every ``vacuum_interval``."""
+
+    def __init__(self, max_bytes: int, sweep_interval: float, vacuum_interval: float, batch_size: int):
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.vacuum_interval = vacuum_interval
+        self.batch_size = batch_size
+        self.last_sweep_at: float | None = None
+        self.last_sweep_seconds: float | None = None
+        self.last_expired = 0
+        self.last_evicted = 0
+        self.last_compact_at: float | None = None
+        self.total_expired = 0
+        self.total_evicted = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> None:
+        t0 = time.perf_counter()
+        self.last_expired = sweep_expired(self.batch_size)
+        self.last_evicted = enforce_budget(self.max_bytes, self.batch_size)
+        self.total_expired += self.last_expired
+        self.total_evicted += self.last_evicted
+        if self.last_compact_at is None or time.time() - self.last_compact_at >= self.vacuum_interval:
+            compact()
+            self.last_compact_at = time.time()
+        self.last_sweep_at = time.time()
+        self.last_sweep_seconds = round(time.perf_counter() - t0, 4)
+        log.info("sweep finished", extra={"expired": self.last_expired, "evicted": self.last_evicted, "seconds": self.last_sweep_seconds})
+
+    def _run(self) -> None:
+        try:
+            if not incremental_vacuum_enabled():
+                # 整库 VACUUM 会在服务期间锁库，这里只提示，由维护命令离线执行
+                log.warning("auto_vacuum is not INCREMENTAL; freed pages are not returned until `python -m backend.maintenance --vacuum`")
+        except Exception as e:
+            log.warning("auto_vacuum check failed", extra={"error": str(e)})
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("sweep failed")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            **table_stats(),
+            "max_bytes": self.max_bytes,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "last_expired": self.last_expired,
+            "last_evicted": self.last_evicted,
+            "total_expired": self.total_expired,
+            "total_evicted": self.total_evicted,
+            "last_compact_at": self.last_compact_at,
+        }
+
+
+_settings = get_settings()
+cache_maintainer = CacheMaintainer(
+    max_bytes=_settings.cache_db_max_bytes,
+    sweep_interval=_settings.cache_sweep_interval_seconds,
+    vacuum_interval=_settings.cache_vacuum_interval_seconds,
+    batch_size=_settings.cache_sweep_batch,
+)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+from backend.services.metrics import registry
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+WriteFn = Callable[[Session], Any]
+
+
+def _is_busy(e: OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class DbWriter:
+    """Single writer thread applying queued writes in group commits.
+
+    ``submit(fn)`` enqueues ``fn(session)`` and returns a Future; the thread
+    drains up to ``batch_size`` queued writes (waiting at most ``max_delay``
+    seconds for more to arrive) and commits them in one transaction, so a
+    burst of cache/run writes costs one commit instead of one each. A batch
+    that fails is retried write by write so one bad write cannot sink the
+    others. ``SQLITE_BUSY`` is retried with backoff. When the thread is not
+    running (scripts, tests, startup, after ``stop``) writes are applied inline.
+    """
+
+    def __init__(self, batch_size: int, max_delay: float, retries: int = 5):
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.retries = retries
+        self.batches = 0
+        self.writes = 0
+        self.errors = 0
+        self.busy_retries = 0
+        self.max_batch = 0
+        self.last_commit_ms: float | None = None
+        self.max_commit_ms = 0.0
+        self._commit_ms_total = 0.0
+        self._queue: queue.Queue[tuple[WriteFn, Future] | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        # 入队和停止互斥：stop 放下哨兵之后不会再有写入进队列
+        self._lock = threading.Lock()
+        self._accepting = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, fn: WriteFn) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._accepting and self.running:
+                self._queue.put((fn, fut))
+                return fut
+        self._apply([(fn, fut)])
+        return fut
+
+    def write(self, fn: WriteFn, timeout: float | None = 30.0) -> Any:
+        """Submit and wait for the commit; re-raises the write's exception."""
+        return self.submit(fn).result(timeout=timeout)
+
+    def defer(self, fn: WriteFn, label: str = "write") -> None:
+        """Fire-and-forget write (cache rows, access times); failures are only logged."""
+        fut = self.submit(fn)
+
+        def _log(f: Future) -> None:
+            if f.exception() is not None:
+                log.warning("deferred write failed", extra={"label": label, "error": str(f.exception())})
+
+        fut.add_done_callback(_log)
+
+    def _commit(self, jobs: list[tuple[WriteFn, Future]]) -> list[Any]:
+        for attempt in range(self.retries + 1):
+            try:
+                with SessionLocal() as db:
+                    results = [fn(db) for fn, _ in jobs]
+                    db.commit()
+                return results
+            except OperationalError as e:
+                if not _is_busy(e) or attempt == self.retries:
+                    raise
+                self.busy_retries += 1
+                time.sleep(0.05 * 2**attempt)
+        raise AssertionError("unreachable")
+
+    def _apply(self, jobs: list[tuple[WriteFn, Future]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            results = self._commit(jobs)
+        except Exception as e:
+            if len(jobs) == 1:
+                self.errors += 1
+                jobs[0][1].set_exception(e)
+                return
+            # 整批失败：逐条重试，把错误只留给出错的那一条
+            for job in jobs:
+                self._apply([job])
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        self.batches += 1
+        self.writes += len(jobs)
+        self.max_batch = max(self.max_batch, len(jobs))
+        self.last_commit_ms = round(ms, 3)
+        self.max_commit_ms = max(self.max_commit_ms, ms)
+        self._commit_ms_total += ms
+        for (_, fut), result in zip(jobs, results):
+            fut.set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            jobs = [job]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(jobs) < self.batch_size:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                jobs.append(nxt)
+            self._apply(jobs)
+            if stop:
+                return
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+            self._accepting = True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain the queue, commit what is left, then stop the thread; later writes apply inline."""
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            self._queue.put(None)
+            thread = self._thread
+        # 哨兵之前的写入都由写线程提交
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "errors": self.errors,
+            "busy_retries": self.busy_retries,
+            "max_batch": self.max_batch,
+            "last_commit_ms": self.last_commit_ms,
+            "avg_commit_ms": round(self._commit_ms_total / self.batches, 3) if self.batches else None,
+            "max_commit_ms": round(self.max_commit_ms, 3),
+        }
+
+
+_settings = get_settings()
+db_writer = DbWriter(batch_size=_settings.db_write_batch, max_delay=_settings.db_write_delay_ms / 1000)
+
+
+def _writer_samples():
+    st = db_writer.stats()
+    for stat in ("queue_depth", "batches", "writes", "errors", "busy_retries", "max_batch", "max_commit_ms"):
+        yield {"stat": stat}, st[stat]
+
+
+registry.collect("stockanalysis_db_writer", "SQLite writer thread: queue depth, commit counters, slowest commit (ms).", "gauge", _writer_samples)
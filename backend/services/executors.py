@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from backend.settings import get_settings
+
+T = TypeVar("T")
+
+_settings = get_settings()
+
+# 三个线程池分开限流：
+# - upstream_executor：真正执行 AkShare 网络请求，并发数即对上游的最大并发
+# - io_executor：可能等待上游结果的请求处理（等待中的线程很廉价，可以开大）
+# - cpu_executor：只读本地数据的 pandas/NumPy/SQLite 计算
+# 慢的上游最多占满前两个池，不会拖住只走本地缓存的快接口
+upstream_executor = ThreadPoolExecutor(max_workers=_settings.upstream_workers, thread_name_prefix="upstream")
+io_executor = ThreadPoolExecutor(max_workers=_settings.io_workers, thread_name_prefix="io-wait")
+cpu_executor = ThreadPoolExecutor(
+    max_workers=_settings.analytics_workers or min(16, (os.cpu_count() or 2) + 4),
+    thread_name_prefix="analytics",
+)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run service code that may wait on upstream calls off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run local pandas/NumPy/SQLite work off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import logging
+import sys
+import time
+
+from backend.settings import get_settings
+
+
+# LogRecord 自带的属性；其余的（通过 extra= 传入的）都当作结构化字段输出
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+    """``2024-01-02 15:04:05 INFO backend.services.stocks hist fetched ts_code=600519.SH rows=240``"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        extra = " ".join(f"{k}={v}" for k, v in fields(record).items())
+        line = f"{ts} {record.levelname} {record.name} {record.getMessage()}" + (f" {extra}" if extra else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus the ``extra=`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+        out.update(fields(record))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+def configure_logging() -> None:
+    """Attach one stderr handler to the ``backend`` logger (LOG_LEVEL / LOG_FORMAT); idempotent."""
+    settings = get_settings()
+    logger = logging.getLogger("backend")
+    logger.setLevel(settings.log_level)
+    # uvicorn 自己配置 root/uvicorn 日志，这里不往上传，避免重复输出
+    logger.propagate = False
+    formatter = JsonFormatter() if settings.log_format == "json" else TextFormatter()
+    for h in logger.handlers:
+        if getattr(h, "_backend_handler", False):
+            h.setFormatter(formatter)
+            return
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(formatter)
+    handler._backend_handler = True
+    logger.addHandler(handler)
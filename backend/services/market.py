@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import logging
 import math
 
-import akshare as ak
-
-from backend.services.cache import cache_get, cache_set
+from backend.services import upstream
+from backend.services.cache import cache_set
+from backend.services.breadth import get_breadth
+from backend.services.spot_snapshot import SpotSnapshot, get_spot_snapshot
 from backend.settings import get_settings
 
+log = logging.getLogger(__name__)
+
 
 # 上证指数、深成指、创业板指在东方财富的代码
 INDEX_CODES = [
@@ -16,20 +20,57 @@ INDEX_CODES = [
 ]
 
 
-def market_overview(date: str | None):
+def market_overview(date: str | None, live: bool = False):
+    """``live``: rebuild the index part now instead of serving the (long-TTL) cached one (SSE poller)."""
+    payload = live_index_overview() if live and date is None else _index_overview(date)
+    return _with_breadth(payload, get_spot_snapshot())
+
+
+def _with_breadth(payload: dict, snap: SpotSnapshot) -> dict:
+    """涨跌家数、涨跌停、成交额与行业板块取自全市场快照（每个快照版本只算一次）。"""
+    b = get_breadth(snap)
+    if not b:
+        return {**payload, "snapshot_version": snap.version}
+    sentiment = {**payload["sentiment"], **{k: b[k] for k in ("adv", "decl", "limit_up", "limit_down", "volume_change_pct")}}
+    out = {**payload, "sentiment": sentiment, "turnover_yi": b["turnover_yi"], "snapshot_version": snap.version}
+    # 行业资料尚未抓取时仍使用示例板块
+    if b["sectors"]:
+        out["sectors"] = b["sectors"]
+    return out
+
+
+def _overview_key(date: str | None) -> str:
     # 这里 date 仅用于 cache key，不直接参与 AkShare 实时指数查询
-    key = f"akshare:market_overview:v1:{date or 'latest'}"
-    cached = cache_get(key)
-    if cached:
-        return cached
+    return f"akshare:market_overview:v1:{date or 'latest'}"
+
+
+def _index_overview(date: str | None) -> dict:
+    key = _overview_key(date)
+    ttl = get_settings().cache_default_ttl_seconds
+    # 临近过期时后台提前刷新，避免 TTL 边界上的并发击穿
+    return upstream.cached_call(key, lambda: _build_index_overview(date), ttl_seconds=ttl, refresh_ahead=min(60, ttl / 5))
+
+
+def live_index_overview() -> dict:
+    """Fresh index quotes for the SSE poller, which already runs once per interval.
+
+    A real result also refreshes the cached entry for ``/market/overview``; when
+    the upstream fails, the last cached (possibly real) payload is kept instead
+    of flapping to the mock.
+    """
+    payload = _build_index_overview(None)
+    if payload["mock"]:
+        return _index_overview(None)
+    cache_set(_overview_key(None), payload, ttl_seconds=get_settings().cache_default_ttl_seconds)
+    return payload
+
 
-    print("[market_overview] fetching indices via AkShare…")
+def _build_index_overview(date: str | None) -> dict:
     indices: list[dict] = []
     try:
-        df = ak.stock_zh_index_spot_em()
-        print(f"[market_overview] stock_zh_index_spot_em rows={len(df)}")
+        df = upstream.call("stock_zh_index_spot_em")
     except Exception as e:
-        print(f"[market_overview] AkShare index fetch error: {e}")
+        log.warning("index fetch failed", extra={"error": str(e)})
         df = None
 
     if df is not None:
@@ -86,8 +127,7 @@ def market_overview(date: str | None):
         "mock": df is None,
     }
 
-    cache_set(key, payload, ttl_seconds=get_settings().cache_default_ttl_seconds)
-    print(f"[market_overview] payload indices={len(indices)} mock={payload['mock']}")
+    log.info("overview built", extra={"indices": len(indices), "mock": payload["mock"]})
     return payload
 
 
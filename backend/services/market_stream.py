@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from typing import AsyncIterator
+
+from backend.services.market import market_overview
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def diff_payload(old: dict, new: dict) -> dict:
+    """Fields of ``new`` that differ from ``old``; nested dicts recurse, lists and scalars are replaced whole."""
+    out: dict = {}
+    for k, v in new.items():
+        o = old.get(k, _MISSING)
+        if isinstance(v, dict) and isinstance(o, dict):
+            d = diff_payload(o, v)
+            if d:
+                out[k] = d
+        elif o != v:
+            out[k] = v
+    for k in old.keys() - new.keys():
+        out[k] = None
+    return out
+
+
+def _sse(kind: str, version: int, data: dict) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {version}\nevent: {kind}\ndata: {body}\n\n".encode("utf-8")
+
+
+class OverviewStream:
+    """One background poller for the market overview, fanned out to SSE clients.
+
+    The poller builds the payload once per tick and encodes both the full
+    message and the patch against the previous tick; every client gets the
+    same bytes, so upstream calls and per-tick work do not grow with the
+    number of connections. A client that is exactly one version behind gets
+    the patch, anything else (first message, missed ticks) gets the full
+    payload.
+    """
+
+    def __init__(self, interval: float, heartbeat: float = 15.0):
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.clients = 0
+        self.ticks = 0
+        self.published = 0
+        self._payload: dict | None = None
+        # (version, full, patch)：整体替换，读者无需加锁
+        self._state: tuple[int, bytes, bytes] = (0, b"", b"")
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed: asyncio.Event | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def tick(self) -> bool:
+        """Poll once; returns True when something changed and was published."""
+        # 指数绕过 15 分钟的接口缓存，按推送间隔重取
+        payload = market_overview(None, live=True)
+        self.ticks += 1
+        prev = self._payload
+        patch = diff_payload(prev, payload) if prev is not None else None
+        if prev is not None and not patch:
+            return False
+        version = self._state[0] + 1
+        full = _sse("full", version, payload)
+        self._payload = payload
+        self._state = (version, full, _sse("patch", version, patch) if patch else full)
+        self.published += 1
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._notify)
+        return True
+
+    def _notify(self) -> None:
+        ev, self._changed = self._changed, asyncio.Event()
+        if ev is not None:
+            ev.set()
+
+    async def events(self) -> AsyncIterator[bytes]:
+        """SSE byte stream for one client."""
+        if self._changed is None or self._loop is not asyncio.get_running_loop():
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+        self.clients += 1
+        if self._state[0] == 0:
+            # 还没有数据：立即唤醒轮询线程
+            self._wake.set()
+        seen = 0
+        try:
+            while True:
+                version, full, patch = self._state
+                if version > seen:
+                    yield patch if seen and version == seen + 1 else full
+                    seen = version
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # 注释行保活，防止代理断开空闲连接
+                    yield b": ping\n\n"
+        finally:
+            self.clients -= 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # 没有订阅者时不轮询
+            if self.clients:
+                try:
+                    self.tick()
+                except Exception:
+                    log.exception("tick failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="market-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "clients": self.clients,
+            "version": self._state[0],
+            "ticks": self.ticks,
+            "published": self.published,
+            "interval": self.interval,
+        }
+
+
+overview_stream = OverviewStream(interval=get_settings().market_stream_interval_seconds)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable
+
+from starlette.routing import Route
+
+# 延迟桶（秒）：覆盖内存命中（亚毫秒）到上游超时（十几秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 5000, 10000, 50000)
+
+Sample = tuple[str, dict, float]
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: dict) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs.items()) + "}"
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Sample]: ...
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{_labels(labels)} {_num(value)}" for name, labels, value in self.samples()]
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield self.name, dict(zip(self.labelnames, key)), v
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram (``_bucket{le=...}``, ``_sum``, ``_count``) per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            v[0][i] += 1
+            v[1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            acc = 0
+            for le, n in zip((*self.buckets, float("inf")), counts):
+                acc += n
+                yield f"{self.name}_bucket", {**labels, "le": _num(le)}, acc
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, acc
+
+
+class Collected(Metric):
+    """Gauge/counter whose samples are read at scrape time from existing stats (``fn`` -> [(labels, value)])."""
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Iterable[tuple[dict, float]]]):
+        super().__init__(name, help)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self.fn():
+            yield self.name, labels, value
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # 模块重复导入（如 reload）时沿用已注册的实例
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collect(self, name: str, help: str, kind: str, fn: Callable[[], Iterable[tuple[dict, float]]]) -> Collected:
+        return self.register(Collected(name, help, kind, fn))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for m in metrics:
+            try:
+                lines += m.render()
+            except Exception as e:
+                # 某个采集函数出错不影响其它指标
+                lines.append(f"# {m.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_latency = registry.histogram(
+    "stockanalysis_http_request_duration_seconds", "Time to response headers per route template.", ("method", "route")
+)
+http_requests = registry.counter("stockanalysis_http_requests_total", "HTTP responses per route and status.", ("method", "route", "status"))
+http_response_bytes = registry.histogram(
+    "stockanalysis_http_response_size_bytes", "Response body bytes as sent (after compression).", ("method", "route"), SIZE_BUCKETS
+)
+upstream_latency = registry.histogram(
+    "stockanalysis_upstream_call_duration_seconds", "Upstream (provider) call time including executor queueing.", ("func",)
+)
+upstream_calls = registry.counter(
+    "stockanalysis_upstream_calls_total", "Upstream calls by outcome (ok|error|timeout|circuit_open|saturated).", ("func", "outcome")
+)
+upstream_rows = registry.histogram("stockanalysis_upstream_rows", "Rows returned per upstream call.", ("func",), ROW_BUCKETS)
+cache_payload_bytes = registry.histogram(
+    "stockanalysis_cache_payload_bytes", "Encoded size of payloads written to the cache.", ("family",), SIZE_BUCKETS
+)
+
+
+def route_template(scope: dict) -> str:
+    """``/api/stocks/600519.SH/kline`` -> ``/api/stocks/{ts_code}/kline`` for a matched API route, else ``other``.
+
+    Rebuilt from the request path and its path params: route objects of
+    included routers don't carry the include prefix on every FastAPI version.
+    Static files and 404s share ``other`` so label values stay bounded.
+    """
+    if not isinstance(scope.get("route"), Route):
+        return "other"
+    names = {str(v): k for k, v in (scope.get("path_params") or {}).items()}
+    return "/".join(f"{{{names[seg]}}}" if seg in names else seg for seg in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency to response start, status and body size per route template.
+
+    Routes are labelled by path template (see ``route_template``). Latency is
+    taken when headers go out, which for streaming endpoints (SSE) measures
+    setup rather than the stream lifetime.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        method = scope["method"]
+        state = {"status": 500, "bytes": 0, "started": False}
+
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                state["started"] = True
+                http_latency.observe(time.perf_counter() - t0, method=method, route=route_template(scope))
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    http_response_bytes.observe(state["bytes"], method=method, route=route_template(scope))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped)
+        finally:
+            if not state["started"]:
+                http_latency.observe(time.perf_counter() - t0, method=method, route=route_template(scope))
+            http_requests.inc(method=method, route=route_template(scope), status=state["status"])
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import as_completed
+import math
+import time
+
+import numpy as np
+
+from backend.services.backtest import backtest_pool, load_shard, pool_size, scatter, shard
+from backend.services.bar_store import BarStore, get_bar_store, shift_day, today_int
+from backend.services.patterns import entry_mask, exit_pattern_mask
+from backend.services.strategy_dsl import StrategyDSL
+
+# 每个分片的 symbols x 组合 状态矩阵上限（控制单进程内存）
+SHARD_CELLS = 400_000
+# 单次网格搜索的组合数上限
+MAX_COMBINATIONS = 5000
+
+
+def grid_shard(
+    ts_codes: list[str],
+    dsl: dict,
+    grid: dict,
+    start: int,
+    end: int,
+    root: str,
+    adj: str,
+) -> dict:
+    """Evaluate every grid combination for one shard of symbols (runs inside a worker process).
+
+    ``grid`` holds equal-length per-combination arrays (tp_k, sl_k, entry/exit
+    MA window indices). Price panels are built once and the position state is
+    an (symbols x combinations) matrix, so every day of the simulation is a
+    handful of broadcast operations regardless of grid size.
+    """
+    d = StrategyDSL.model_validate(dsl)
+    n_g = len(grid["tp_k"])
+    loaded = load_shard(BarStore(root), ts_codes, adj, start, end)
+    empty = {"dates": np.zeros(0, np.int32), "ret_sum": np.zeros((0, n_g)), "n_pos": np.zeros((0, n_g)),
+             "trades": np.zeros(n_g), "wins": np.zeros(n_g), "trade_ret": np.zeros(n_g)}
+    if loaded is None:
+        return empty
+    bars, sym_id, seg_pos = loaded
+    c = bars["c"].astype(float)
+    o, v, t = bars["o"].astype(float), bars["v"].astype(float), bars["t"]
+    keep = t >= start
+    dates = np.unique(t[keep])
+    if not len(dates):
+        return empty
+    rows, cols = sym_id[keep], np.searchsorted(dates, t[keep])
+    shape = (len(ts_codes), len(dates))
+
+    # 每个均线窗口只算一次，组合之间共享
+    B = np.stack([scatter((entry_mask(c, seg_pos, d.filters.tech, w) & (t >= start))[keep], rows, cols, shape, False) for w in grid["ma_entry"]], axis=1)
+    X = np.stack([scatter(exit_pattern_mask(d.exits.exitPattern, o, c, v, seg_pos, w)[keep], rows, cols, shape, False) for w in grid["ma_exit"]], axis=1)
+    C = scatter(c[keep], rows, cols, shape, np.nan)
+    SP = scatter(seg_pos[keep], rows, cols, shape, -1)
+
+    tp_k, sl_k = grid["tp_k"][None, :], grid["sl_k"][None, :]
+    e_idx, x_idx, need = grid["entry_idx"], grid["exit_idx"], grid["warmup"][None, :]
+    n_sym, n_t = shape
+    in_pos = np.zeros((n_sym, n_g), dtype=bool)
+    entry_px = np.full((n_sym, n_g), np.nan)
+    last_c = np.full(n_sym, np.nan)
+    ret_sum = np.zeros((n_t, n_g))
+    n_pos = np.zeros((n_t, n_g))
+    trades = np.zeros(n_g)
+    wins = np.zeros(n_g)
+    trade_ret = np.zeros(n_g)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for j in range(n_t):
+            c_j = C[:, j]
+            live = ~np.isnan(c_j)
+            cc = c_j[:, None]
+            held = in_pos & live[:, None]
+            if held.any():
+                r = (c_j / last_c - 1)[:, None]
+                ret_sum[j] = np.where(held, r, 0.0).sum(axis=0)
+                n_pos[j] = held.sum(axis=0)
+                check = held & (SP[:, j][:, None] >= need)
+                tp_hit = check & (cc >= entry_px * tp_k)
+                sl_hit = check & ~tp_hit & (cc <= entry_px * sl_k)
+                out = tp_hit | sl_hit | (check & X[:, x_idx, j])
+                if out.any():
+                    gain = np.where(out, cc / entry_px - 1, 0.0)
+                    trades += out.sum(axis=0)
+                    wins += (gain > 0).sum(axis=0)
+                    trade_ret += gain.sum(axis=0)
+                    in_pos &= ~out
+            else:
+                out = np.zeros((n_sym, n_g), dtype=bool)
+            enter = ~in_pos & ~out & live[:, None] & (SP[:, j][:, None] >= need) & B[:, e_idx, j]
+            if enter.any():
+                in_pos |= enter
+                entry_px = np.where(enter, cc, entry_px)
+            last_c[live] = c_j[live]
+
+    return {"dates": dates, "ret_sum": ret_sum, "n_pos": n_pos, "trades": trades, "wins": wins, "trade_ret": trade_ret}
+
+
+def grid_stats(daily: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-column equity statistics of a (dates x combinations) daily-return matrix."""
+    n = daily.shape[0]
+    if not n:
+        z = np.zeros(daily.shape[1])
+        return {"total_return_pct": z, "cagr_pct": z, "max_drawdown_pct": z, "sharpe": np.full_like(z, np.nan)}
+    equity = np.cumprod(1 + daily, axis=0)
+    dd = 1 - equity / np.maximum.accumulate(equity, axis=0)
+    std = daily.std(axis=0, ddof=1) if n > 1 else np.zeros(daily.shape[1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = np.where(std > 0, daily.mean(axis=0) / std * math.sqrt(252), np.nan)
+        total = equity[-1] - 1
+        cagr = np.where(total > -1, (1 + total) ** (252 / n) - 1, np.nan)
+    return {"total_return_pct": total * 100, "cagr_pct": cagr * 100, "max_drawdown_pct": dd.max(axis=0) * 100, "sharpe": sharpe}
+
+
+def _regrid(m: np.ndarray, pos: np.ndarray, n: int) -> np.ndarray:
+    out = np.zeros((n, m.shape[1]))
+    out[pos] = m
+    return out
+
+
+def _clean(x: float, digits: int):
+    return None if x is None or not np.isfinite(x) else round(float(x), digits)
+
+
+def run_grid_search(
+    dsl: StrategyDSL,
+    take_profit: list[float | None],
+    stop_loss: list[float | None],
+    ma_entry: list[int],
+    ma_exit: list[int],
+    ts_codes: list[str] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    adj: str = "qfq",
+    rank_by: str = "sharpe",
+    top: int = 50,
+) -> dict:
+    """Evaluate the TP x SL x MA-window grid in one pass per symbol shard.
+
+    Portfolio construction and fills are the same as ``run_backtest``, so a
+    single combination reproduces the backtest of that DSL.
+    """
+    t0 = time.perf_counter()
+    combos = list(itertools.product(range(len(take_profit)), range(len(stop_loss)), range(len(ma_entry)), range(len(ma_exit))))
+    ti, si, ei, xi = (np.array(a, dtype=np.int64) for a in zip(*combos))
+    tp_k = np.array([np.inf if v is None else 1 + v / 100.0 for v in take_profit])[ti]
+    sl_k = np.array([-np.inf if v is None else 1 + v / 100.0 for v in stop_loss])[si]
+    warmup = np.maximum(np.array(ma_entry)[ei], np.array(ma_exit)[xi]) - 1
+    grid = {"tp_k": tp_k, "sl_k": sl_k, "entry_idx": ei, "exit_idx": xi, "warmup": warmup, "ma_entry": list(ma_entry), "ma_exit": list(ma_exit)}
+
+    store = get_bar_store()
+    codes = sorted(set(ts_codes)) if ts_codes else store.symbols(adj)
+    end_i = int(end) if end else today_int()
+    start_i = int(start) if start else shift_day(end_i, -365 * 5)
+    n_shards = max(pool_size * 4, math.ceil(len(codes) * len(combos) / SHARD_CELLS))
+    pool = backtest_pool()
+    futures = [pool.submit(grid_shard, part, dsl.model_dump(), grid, start_i, end_i, store.root, adj) for part in shard(codes, n_shards)]
+
+    # 分片结果到达即累加后丢弃，内存只保留一份 (dates x combinations) 汇总
+    dates = np.zeros(0, np.int32)
+    ret_sum = np.zeros((0, len(combos)))
+    n_pos = np.zeros((0, len(combos)))
+    n_trades, wins, trade_ret = np.zeros(len(combos)), np.zeros(len(combos)), np.zeros(len(combos))
+    for f in as_completed(futures):
+        r = f.result()
+        if len(np.setdiff1d(r["dates"], dates, assume_unique=True)):
+            merged = np.union1d(dates, r["dates"])
+            pos = np.searchsorted(merged, dates)
+            ret_sum, n_pos = _regrid(ret_sum, pos, len(merged)), _regrid(n_pos, pos, len(merged))
+            dates = merged
+        pos = np.searchsorted(dates, r["dates"])
+        ret_sum[pos] += r["ret_sum"]
+        n_pos[pos] += r["n_pos"]
+        n_trades += r["trades"]
+        wins += r["wins"]
+        trade_ret += r["trade_ret"]
+        del r
+    daily = np.divide(ret_sum, n_pos, out=np.zeros_like(ret_sum), where=n_pos > 0)
+    stats = grid_stats(daily)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats["win_rate"] = np.where(n_trades > 0, wins / n_trades, np.nan)
+        avg_ret = np.where(n_trades > 0, trade_ret / n_trades * 100, np.nan)
+
+    # 回撤越小越好，其余指标越大越好；NaN 排在最后
+    score = -stats[rank_by] if rank_by == "max_drawdown_pct" else stats[rank_by]
+    order = np.lexsort((np.arange(len(score)), -np.nan_to_num(score, nan=-np.inf)))
+    rows = [
+        {
+            "rank": rank + 1,
+            "take_profit_pct": take_profit[ti[g]],
+            "stop_loss_pct": stop_loss[si[g]],
+            "ma_entry": ma_entry[ei[g]],
+            "ma_exit": ma_exit[xi[g]],
+            "trades": int(n_trades[g]),
+            "win_rate": _clean(stats["win_rate"][g], 4),
+            "avg_trade_return_pct": _clean(avg_ret[g], 3),
+            "total_return_pct": _clean(stats["total_return_pct"][g], 2),
+            "cagr_pct": _clean(stats["cagr_pct"][g], 2),
+            "max_drawdown_pct": _clean(stats["max_drawdown_pct"][g], 2),
+            "sharpe": _clean(stats["sharpe"][g], 3),
+        }
+        for rank, g in enumerate(order[:top])
+    ]
+
+    # 热力图：固定排名第一的均线组合，TP x SL 的指标矩阵
+    best = order[0] if len(order) else 0
+    z = np.full((len(take_profit), len(stop_loss)), np.nan)
+    sel = (ei == ei[best]) & (xi == xi[best])
+    z[ti[sel], si[sel]] = stats[rank_by][sel]
+    return {
+        "params": {"start": start_i, "end": end_i, "adj": adj, "symbols": len(codes), "combinations": len(combos), "rank_by": rank_by},
+        "ranked": rows,
+        "heatmap": {
+            "metric": rank_by,
+            "ma_entry": ma_entry[ei[best]],
+            "ma_exit": ma_exit[xi[best]],
+            "take_profit_pct": take_profit,
+            "stop_loss_pct": stop_loss,
+            "z": [[_clean(x, 4) for x in row] for row in z],
+        },
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+# 入场/出场条件的数组实现，单只股票（信号）和多只股票首尾拼接（回测）共用。
+# seg_pos 是每根K线在所属股票序列中的位置；窗口在每只股票的第一根K线处截断，
+# 因此拼接数组里不会跨股票取值。窗口统计用 pandas rolling，和单只股票
+# 单独计算的结果逐位一致（信号引擎的事件列表不能变）。
+
+
+class _SegmentWindow(BaseIndexer):
+    """Rolling bounds clipped to the current symbol: ``window`` values ending ``lag`` bars before each position."""
+
+    def __init__(self, seg_pos: np.ndarray, window: int, lag: int):
+        super().__init__(window_size=window)
+        self.seg_pos = np.asarray(seg_pos, dtype=np.int64)
+        self.lag = lag
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(num_values, dtype=np.int64) + 1 - self.lag
+        start = end - np.minimum(self.seg_pos + 1 - self.lag, self.window_size)
+        return start, end
+
+
+def shift(x: np.ndarray) -> np.ndarray:
+    return np.concatenate(([np.nan], x[:-1])) if len(x) else x.astype(float)
+
+
+def rolling_mean(x: np.ndarray, window: int, seg_pos: np.ndarray) -> np.ndarray:
+    """Mean of the last ``window`` values including the current one; NaN until the window is full."""
+    return pd.Series(x, dtype=float).rolling(_SegmentWindow(seg_pos, window, 0), min_periods=window).mean().to_numpy()
+
+
+def prev_window(x: np.ndarray, window: int, seg_pos: np.ndarray, reduce: str, min_periods: int | None = None) -> np.ndarray:
+    """``reduce`` (max/min/mean) over up to ``window`` values before each position; NaN with fewer than ``min_periods``."""
+    r = pd.Series(x, dtype=float).rolling(_SegmentWindow(seg_pos, window, 1), min_periods=window if min_periods is None else min_periods)
+    return getattr(r, reduce)().to_numpy()
+
+
+def entry_mask(c: np.ndarray, seg_pos: np.ndarray, tech: str, ma_window: int = 5) -> np.ndarray:
+    """Buy: close crosses above a rising MA (MA5 by default); break_20d / rsi_oversold add their momentum approximations."""
+    ma = rolling_mean(c, ma_window, seg_pos)
+    prev_c, prev_ma = shift(c), shift(ma)
+    with np.errstate(invalid="ignore"):
+        buy = (prev_c <= prev_ma) & (c > ma) & (ma - prev_ma > 0)
+        if tech == "break_20d":
+            buy |= c >= prev_window(c, 20, seg_pos, "max", 10)
+        if tech == "rsi_oversold":
+            buy |= (c > prev_c) & (c >= prev_window(c, 10, seg_pos, "min", 8) * 1.03)
+    return buy
+
+
+def exit_pattern_mask(
+    pattern: str, o: np.ndarray, c: np.ndarray, v: np.ndarray, seg_pos: np.ndarray, ma_window: int = 10
+) -> np.ndarray:
+    """Pattern exits: close_below_ma10, bearish_engulfing, volume_breakdown (``ma_window`` replaces the 10)."""
+    prev_c = shift(c)
+    with np.errstate(invalid="ignore"):
+        if pattern == "close_below_ma10":
+            ma = rolling_mean(c, ma_window, seg_pos)
+            return (prev_c >= shift(ma)) & (c < ma)
+        if pattern == "bearish_engulfing":
+            # 昨日阳线，今日阴线实体完全吞没昨日实体
+            prev_o = shift(o)
+            return (seg_pos >= 1) & (prev_c > prev_o) & (c < o) & (o >= prev_c) & (c <= prev_o)
+        if pattern == "volume_breakdown":
+            # 放量（不低于前5日均量2倍）下跌且收在MA10下方
+            ma = rolling_mean(c, ma_window, seg_pos)
+            vol5 = prev_window(v, 5, seg_pos, "mean")
+            return (v >= 2 * vol5) & (c < prev_c) & (c < ma)
+    return np.zeros(len(c), dtype=bool)
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.services.bar_store import get_bar_store, shift_day, today_int
+from backend.services.trade_calendar import sessions_between
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+# 面板保留的交易日数：覆盖 20 日突破与 RSI(14) 的预热
+PANEL_DAYS = 60
+RSI_PERIOD = 14
+RSI_OVERSOLD = 30.0
+
+_versions = itertools.count(1)
+
+
+class PricePanel:
+    """Dense symbols x dates close/volume matrices for full-market screening.
+
+    Rows follow ``codes``, columns follow ascending ``dates`` (YYYYMMDD ints);
+    missing bars (suspension, no local history) are NaN. Panels are never
+    mutated; every instance gets a new process-wide ``version`` (cache key).
+    """
+
+    def __init__(self, codes: np.ndarray, dates: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.version = next(_versions)
+        self.codes = codes
+        self.dates = dates
+        self.close = close
+        self.volume = volume
+        self.index = pd.Index(codes)
+
+    @property
+    def last_date(self) -> int:
+        return int(self.dates[-1]) if len(self.dates) else 0
+
+    def rows_for(self, ts_codes) -> np.ndarray:
+        """Row index per ts_code, -1 for symbols not in the panel."""
+        return self.index.get_indexer(pd.Index(ts_codes))
+
+    def history_matrix(self, ts_codes, session: int, live_close: np.ndarray) -> np.ndarray:
+        """Closes for ``ts_codes`` through ``session`` (a trading day), ``live_close`` being that session's close.
+
+        When the panel already holds ``session`` the stored closes win and
+        ``live_close`` only fills their gaps; otherwise it is appended as a
+        new last column. Never two columns for one session.
+        """
+        rows = self.rows_for(ts_codes)
+        n_hist = int(np.searchsorted(self.dates, session, side="right"))
+        hist = np.full((len(rows), n_hist), np.nan)
+        ok = rows >= 0
+        if n_hist and ok.any():
+            hist[ok] = self.close[rows[ok], :n_hist]
+        live = np.asarray(live_close, dtype=float)
+        if n_hist and self.dates[n_hist - 1] == session:
+            hist[:, -1] = np.where(np.isnan(hist[:, -1]), live, hist[:, -1])
+            return hist
+        return np.column_stack([hist, live])
+
+    def with_day(self, trade_date: int, ts_codes, close, volume) -> "PricePanel":
+        """Return a panel with ``trade_date`` set from spot values (appending a column if new)."""
+        return self.with_days(
+            [trade_date], ts_codes, np.asarray(close, dtype=float)[:, None], np.asarray(volume, dtype=float)[:, None]
+        )
+
+    def with_days(self, days, ts_codes, close: np.ndarray, volume: np.ndarray) -> "PricePanel":
+        """Return a panel with the ``days`` columns set from ``ts_codes`` x ``days`` matrices.
+
+        Days may be new (inserted in date order) or already present; unknown
+        codes add rows. Only the latest ``PANEL_DAYS`` dates are kept.
+        """
+        days = np.asarray(days, dtype=np.int32)
+        rows = self.rows_for(ts_codes)
+        new_codes = pd.Index(ts_codes)[rows < 0]
+        codes = np.concatenate([self.codes, new_codes.to_numpy(dtype=object)]) if len(new_codes) else self.codes
+        dates = np.union1d(self.dates, days).astype(np.int32)[-PANEL_DAYS:]
+        kept = np.isin(days, dates)
+        if not kept.any():
+            # 比面板窗口更早的日期不处理
+            return self
+        c = np.full((len(codes), len(dates)), np.nan)
+        v = np.full((len(codes), len(dates)), np.nan)
+        old = np.isin(self.dates, dates)
+        old_cols = np.searchsorted(dates, self.dates[old])
+        c[: len(self.codes), old_cols] = self.close[:, old]
+        v[: len(self.codes), old_cols] = self.volume[:, old]
+        idx = pd.Index(codes).get_indexer(pd.Index(ts_codes))
+        cols = np.searchsorted(dates, days[kept])
+        c[np.ix_(idx, cols)] = np.asarray(close, dtype=float)[:, kept]
+        v[np.ix_(idx, cols)] = np.asarray(volume, dtype=float)[:, kept]
+        return PricePanel(codes, dates, c, v)
+
+
+def _panel_path() -> str:
+    return os.path.join(get_settings().bar_store_dir, "panel.npz")
+
+
+def build_panel_from_store(adj: str = "qfq") -> PricePanel:
+    """Assemble the panel from every symbol held in the local bar store (no upstream calls)."""
+    store = get_bar_store()
+    tails: dict[str, np.ndarray] = {}
+    for ts_code in store.symbols(adj):
+        bars, _ = store.load(ts_code, adj)
+        if len(bars):
+            tails[ts_code] = np.asarray(bars[-PANEL_DAYS:])
+    if not tails:
+        empty = np.zeros((0, 0))
+        return PricePanel(np.array([], dtype=object), np.array([], dtype=np.int32), empty, empty)
+    dates = np.unique(np.concatenate([b["t"] for b in tails.values()]))[-PANEL_DAYS:].astype(np.int32)
+    codes = np.array(sorted(tails), dtype=object)
+    close = np.full((len(codes), len(dates)), np.nan)
+    volume = np.full((len(codes), len(dates)), np.nan)
+    for i, code in enumerate(codes):
+        b = tails[code]
+        b = b[b["t"] >= dates[0]]
+        cols = np.searchsorted(dates, b["t"])
+        close[i, cols] = b["c"]
+        volume[i, cols] = b["v"]
+    log.info("built from store", extra={"symbols": len(codes), "dates": len(dates)})
+    return PricePanel(codes, dates, close, volume)
+
+
+def backfill_from_store(panel: PricePanel, through: int, adj: str = "qfq") -> PricePanel:
+    """Add trading days after the panel's first date, up to ``through``, that it lacks but the bar store holds.
+
+    The panel only gains a column when the post-close batch records one;
+    days it missed (process down, scheduler off) would otherwise stay gaps
+    in every MA/RSI/breakout window.
+    """
+    if not len(panel.dates):
+        return panel
+    have = set(panel.dates.tolist())
+    missing = np.array([d for d in sessions_between(int(panel.dates[0]), through) if d not in have][-PANEL_DAYS:], dtype=np.int32)
+    if not len(missing):
+        return panel
+    store = get_bar_store()
+    codes, close, volume = [], [], []
+    for ts_code in store.symbols(adj):
+        b = store.slice(ts_code, adj, int(missing[0]), int(missing[-1]))
+        b = b[np.isin(b["t"], missing)]
+        if not len(b):
+            continue
+        cols = np.searchsorted(missing, b["t"])
+        c = np.full(len(missing), np.nan)
+        v = np.full(len(missing), np.nan)
+        c[cols], v[cols] = b["c"], b["v"]
+        codes.append(ts_code)
+        close.append(c)
+        volume.append(v)
+    if not codes:
+        return panel
+    close, volume = np.vstack(close), np.vstack(volume)
+    found = ~np.isnan(close).all(axis=0)
+    log.info("backfilled from store", extra={"dates": int(found.sum()), "missing": len(missing)})
+    return panel.with_days(missing[found], codes, close[:, found], volume[:, found])
+
+
+def save_panel(panel: PricePanel) -> None:
+    path = _panel_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    np.savez(tmp, codes=panel.codes.astype(str), dates=panel.dates, close=panel.close, volume=panel.volume)
+    os.replace(tmp, path)
+
+
+def _load_panel() -> PricePanel | None:
+    try:
+        with np.load(_panel_path(), allow_pickle=False) as z:
+            return PricePanel(z["codes"].astype(object), z["dates"], z["close"], z["volume"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+_panel: PricePanel | None = None
+# 面板文件的 mtime：其它 worker 进程写入当日数据后，这里重新加载
+_panel_mtime: float | None = None
+_panel_lock = threading.Lock()
+
+
+def _file_mtime() -> float | None:
+    try:
+        return os.stat(_panel_path()).st_mtime
+    except OSError:
+        return None
+
+
+def get_price_panel() -> PricePanel:
+    global _panel, _panel_mtime
+    mtime = _file_mtime()
+    if _panel is None or mtime != _panel_mtime:
+        with _panel_lock:
+            mtime = _file_mtime()
+            if _panel is None or mtime != _panel_mtime:
+                loaded = _load_panel()
+                panel = loaded if loaded is not None else (_panel if _panel is not None else build_panel_from_store())
+                # 当天的列只由收盘后的 record_day 写入；之前漏掉的交易日从 bar store 补
+                filled = backfill_from_store(panel, shift_day(today_int(), -1))
+                if len(filled.codes) and (filled is not panel or mtime is None):
+                    save_panel(filled)
+                    mtime = _file_mtime()
+                _panel, _panel_mtime = filled, mtime
+    return _panel
+
+
+def record_day(trade_date: int, ts_codes, close, volume) -> None:
+    """每日增量：把一个交易日的收盘/成交量写入面板并落盘（由收盘后的策略调度器在交易日调用）。"""
+    global _panel, _panel_mtime
+    with _panel_lock:
+        panel = _panel or _load_panel() or build_panel_from_store()
+        filled = backfill_from_store(panel, shift_day(trade_date, -1))
+        updated = filled.with_day(trade_date, ts_codes, close, volume)
+        if updated is not panel:
+            save_panel(updated)
+        _panel, _panel_mtime = updated, _file_mtime()
+
+
+def rebuild_panel() -> PricePanel:
+    global _panel, _panel_mtime
+    panel = build_panel_from_store()
+    with _panel_lock:
+        save_panel(panel)
+        _panel, _panel_mtime = panel, _file_mtime()
+    return panel
+
+
+# ---- vectorized indicators over a (symbols x dates) close matrix; last column is "today" ----
+
+
+def ma_up(close: np.ndarray, window: int = 5) -> np.ndarray:
+    """MA(window) today above MA(window) yesterday."""
+    if close.shape[1] < window + 1:
+        return np.zeros(close.shape[0], dtype=bool)
+    ma_now = close[:, -window:].mean(axis=1)
+    ma_prev = close[:, -window - 1 : -1].mean(axis=1)
+    return ma_now > ma_prev
+
+
+def breakout(close: np.ndarray, window: int = 20, min_periods: int = 10) -> np.ndarray:
+    """Today's close at or above the max of the previous ``window`` closes (at least ``min_periods`` of them, as in ``patterns.entry_mask``)."""
+    prev = close[:, -window - 1 : -1]
+    if prev.shape[1] < min_periods:
+        return np.zeros(close.shape[0], dtype=bool)
+    enough = np.count_nonzero(~np.isnan(prev), axis=1) >= min_periods
+    prev_max = np.nanmax(np.where(enough[:, None], prev, -np.inf), axis=1)
+    return enough & (close[:, -1] >= prev_max)
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Wilder RSI of the last column; NaN when history is too short."""
+    n_sym, n = close.shape
+    out = np.full(n_sym, np.nan)
+    if n < period + 1:
+        return out
+    delta = np.diff(close, axis=1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    # 缺失K线（停牌等）不计入涨跌
+    miss = np.isnan(delta)
+    gain[miss] = 0.0
+    loss[miss] = 0.0
+    avg_gain = gain[:, :period].mean(axis=1)
+    avg_loss = loss[:, :period].mean(axis=1)
+    for j in range(period, delta.shape[1]):
+        avg_gain = (avg_gain * (period - 1) + gain[:, j]) / period
+        avg_loss = (avg_loss * (period - 1) + loss[:, j]) / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out = np.where((avg_loss == 0) & (avg_gain > 0), 100.0, out)
+    valid = np.count_nonzero(~np.isnan(close), axis=1) >= period + 1
+    return np.where(valid & ~np.isnan(close[:, -1]), out, np.nan)
+
+
+def has_history(close: np.ndarray) -> np.ndarray:
+    """Rows of a ``history_matrix`` with any stored close before the session."""
+    return np.isfinite(close[:, :-1]).any(axis=1)
+
+
+def tech_mask(close: np.ndarray, tech: str) -> np.ndarray:
+    if tech == "ma_up_5":
+        return ma_up(close, 5)
+    if tech == "break_20d":
+        return breakout(close, 20, 10)
+    if tech == "rsi_oversold":
+        with np.errstate(invalid="ignore"):
+            return rsi(close) <= RSI_OVERSOLD
+    return np.ones(close.shape[0], dtype=bool)
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import select
+
+from backend.db import SessionLocal
+from backend.models import StockProfile
+from backend.services import upstream
+from backend.services.db_writer import db_writer
+from backend.services.spot_snapshot import spot_manager
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+PROFILE_FIELDS = ("ts_code", "code", "name", "industry", "area", "market", "list_date", "total_shares", "float_shares", "updated_at")
+
+
+def market_of(code: str) -> str:
+    """按代码前缀推断板块。"""
+    code = str(code)
+    if code.startswith("688") or code.startswith("689"):
+        return "科创板"
+    if code.startswith("30"):
+        return "创业板"
+    if code.startswith("6") or code.startswith("00"):
+        return "主板"
+    if code.startswith(("8", "4", "92")):
+        return "北交所"
+    return ""
+
+
+def _to_float(v) -> float | None:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_profile(ts_code: str) -> dict | None:
+    """Pull one profile from AkShare; None when the upstream has nothing."""
+    symbol = ts_code.split(".")[0]
+    info = upstream.call("stock_individual_info_em", symbol=symbol)
+    if info is None or info.empty:
+        return None
+    mapping = dict(zip(info["item"].tolist(), info["value"].tolist()))
+    list_date = str(mapping.get("上市时间", "") or "")
+    return {
+        "ts_code": ts_code,
+        "code": symbol,
+        "name": str(mapping.get("股票简称", "") or mapping.get("名称", "") or ""),
+        "industry": str(mapping.get("行业", "") or ""),
+        "area": "",
+        "market": market_of(symbol),
+        "list_date": list_date if list_date.isdigit() else "",
+        "total_shares": _to_float(mapping.get("总股本")),
+        "float_shares": _to_float(mapping.get("流通股")),
+        "updated_at": int(time.time()),
+    }
+
+
+class ProfileStore:
+    """``stock_profiles`` table mirrored in a dict; all reads are local.
+
+    The dict is copy-on-write: ``upsert_many`` swaps in a new one, so readers
+    iterate a snapshot that is never mutated under them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._map: dict[str, dict] | None = None
+        self.version = 0
+        self._frame: tuple[int, pd.DataFrame] | None = None
+
+    def _loaded(self) -> dict[str, dict]:
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    with SessionLocal() as db:
+                        rows = db.execute(select(StockProfile)).scalars().all()
+                        self._map = {r.ts_code: {f: getattr(r, f) for f in PROFILE_FIELDS} for r in rows}
+        return self._map
+
+    def get(self, ts_code: str) -> dict | None:
+        return self._loaded().get(ts_code)
+
+    def updated_at(self) -> dict[str, int]:
+        return {k: v["updated_at"] for k, v in self._loaded().items()}
+
+    def __len__(self) -> int:
+        return len(self._loaded())
+
+    def upsert_many(self, profiles: list[dict]) -> None:
+        if not profiles:
+            return
+
+        def _merge(db) -> None:
+            for p in profiles:
+                db.merge(StockProfile(**p))
+
+        db_writer.write(_merge)
+        self._loaded()
+        with self._lock:
+            m = dict(self._map)
+            for p in profiles:
+                m[p["ts_code"]] = dict(p)
+            self._map = m
+            self.version += 1
+
+    def frame(self) -> pd.DataFrame:
+        """ts_code/industry/market 表，供 universe 按列合并（按版本缓存）。"""
+        self._loaded()
+        with self._lock:
+            m, version = self._map, self.version
+        cached = self._frame
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        df = pd.DataFrame(
+            {
+                "ts_code": list(m.keys()),
+                "industry": [p["industry"] for p in m.values()],
+                "market": [p["market"] for p in m.values()],
+            }
+        )
+        self._frame = (version, df)
+        return df
+
+
+profile_store = ProfileStore()
+
+
+class ProfileRefresher:
+    """Background job walking the spot universe under a rate limit.
+
+    Symbols without a profile go first, then the oldest beyond ``max_age``.
+    Symbols whose fetch fails or comes back empty are skipped for an
+    exponentially growing backoff (capped at ``max_age``) so a delisted code
+    doesn't stay at the head of the queue. ``request()`` puts a symbol at the
+    front of the queue (e.g. on a cache miss from the profile endpoint).
+    """
+
+    def __init__(self, max_age: float, rate_per_second: float, batch_size: int = 50, retry_after: float = 3600):
+        self.max_age = max_age
+        self.interval = 1.0 / max(rate_per_second, 0.01)
+        self.batch_size = batch_size
+        self.retry_after = retry_after
+        self.fetched = 0
+        self.failed = 0
+        self._priority: list[str] = []
+        # ts_code -> (连续失败次数, 下次可重试的时间)
+        self._backoff: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def request(self, ts_code: str) -> None:
+        with self._lock:
+            if ts_code not in self._priority:
+                self._priority.append(ts_code)
+        self._wake.set()
+
+    def due(self) -> list[str]:
+        snap = spot_manager.current
+        if snap.empty:
+            return []
+        updated = profile_store.updated_at()
+        now = time.time()
+        cutoff = now - self.max_age
+        with self._lock:
+            held = {c for c, (_, until) in self._backoff.items() if until > now}
+        codes = [c for c in snap.df["ts_code"].tolist() if c not in held]
+        missing = [c for c in codes if c not in updated]
+        stale = sorted((updated[c], c) for c in codes if c in updated and updated[c] < cutoff)
+        return missing + [c for _, c in stale]
+
+    def _next_batch(self) -> list[str]:
+        with self._lock:
+            batch, self._priority = self._priority[: self.batch_size], self._priority[self.batch_size :]
+        if len(batch) < self.batch_size:
+            batch += [c for c in self.due() if c not in batch][: self.batch_size - len(batch)]
+        return batch
+
+    def _record(self, ts_code: str, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._backoff.pop(ts_code, None)
+                return
+            n = self._backoff.get(ts_code, (0, 0.0))[0] + 1
+            self._backoff[ts_code] = (n, time.time() + min(self.max_age, self.retry_after * 2 ** (n - 1)))
+
+    def run_batch(self) -> int:
+        batch = self._next_batch()
+        out: list[dict] = []
+        for ts_code in batch:
+            if self._stop.is_set():
+                break
+            t0 = time.monotonic()
+            try:
+                p = fetch_profile(ts_code)
+            except Exception as e:
+                self.failed += 1
+                log.warning("profile fetch failed", extra={"ts_code": ts_code, "error": str(e)})
+                p = None
+            if p is not None:
+                out.append(p)
+                self.fetched += 1
+            self._record(ts_code, p is not None)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - t0)))
+        profile_store.upsert_many(out)
+        return len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                n = self.run_batch()
+            except Exception:
+                log.exception("refresh batch failed")
+                n = 0
+            if n == 0:
+                # 全部新鲜：等待按需请求或一段时间后再检查
+                self._wake.wait(600)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # 快照首次到达（或刷新）时唤醒，检查是否有新上市/过期的股票
+        spot_manager.subscribe(lambda snap: self._wake.set())
+        self._thread = threading.Thread(target=self._run, name="profile-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "profiles": len(profile_store),
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "queued": len(self._priority),
+            "backing_off": len(self._backoff),
+        }
+
+
+_settings = get_settings()
+profile_refresher = ProfileRefresher(
+    max_age=_settings.profile_max_age_days * 86400,
+    rate_per_second=_settings.profile_fetch_rate,
+)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+import pandas as pd
+
+from backend.services.cache_codec import decode_payload, encode_payload
+from backend.services.synthetic_market import SyntheticMarket
+from backend.settings import Settings, get_settings
+
+log = logging.getLogger(__name__)
+
+
+class FixtureMissing(LookupError):
+    """Replay has no recording for this call."""
+
+
+def fixture_key(func_name: str, kwargs: dict) -> str:
+    raw = json.dumps(kwargs, sort_keys=True, default=str)
+    return hashlib.sha1(f"{func_name}:{raw}".encode()).hexdigest()[:20]
+
+
+class Provider(ABC):
+    """Source of the AkShare-shaped tables; ``upstream.call`` goes through ``fetch``."""
+
+    name = "base"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+
+    def _delay(self) -> None:
+        # 注入的延迟：固定部分 + 可复现的随机抖动
+        if self.latency <= 0 and self.jitter <= 0:
+            return
+        with self._rng_lock:
+            extra = self._rng.uniform(0, self.jitter) if self.jitter > 0 else 0.0
+        time.sleep(self.latency + extra)
+
+    def fetch(self, func_name: str, **kwargs: Any) -> pd.DataFrame:
+        self.calls += 1
+        self._delay()
+        return self._fetch(func_name, kwargs)
+
+    @abstractmethod
+    def _fetch(self, func_name: str, kwargs: dict) -> pd.DataFrame: ...
+
+    def stats(self) -> dict:
+        return {"provider": self.name, "calls": self.calls, "latency_ms": self.latency * 1000, "jitter_ms": self.jitter * 1000}
+
+
+class AkShareProvider(Provider):
+    """Live data: ``ak.<func_name>(**kwargs)``."""
+
+    name = "akshare"
+
+    def __init__(self) -> None:
+        super().__init__()
+        # 延迟导入：离线回放/合成数据模式下不需要安装 akshare
+        import akshare
+
+        self._ak = akshare
+
+    def _fetch(self, func_name: str, kwargs: dict) -> pd.DataFrame:
+        return getattr(self._ak, func_name)(**kwargs)
+
+
+class FixtureStore:
+    """On-disk recordings: ``{root}/{func_name}/{key}.bin`` (cache codec, columnar + compressed) and ``{key}.json`` (kwargs, codec)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._index: dict[str, list[dict]] | None = None
+
+    def _paths(self, func_name: str, key: str) -> tuple[str, str]:
+        d = os.path.join(self.root, func_name)
+        return os.path.join(d, f"{key}.bin"), os.path.join(d, f"{key}.json")
+
+    def write(self, func_name: str, kwargs: dict, df: pd.DataFrame) -> None:
+        key = fixture_key(func_name, kwargs)
+        codec, blob = encode_payload({"frame": df})
+        bin_path, meta_path = self._paths(func_name, key)
+        os.makedirs(os.path.dirname(bin_path), exist_ok=True)
+        meta = {"func": func_name, "kwargs": kwargs, "codec": codec, "rows": len(df), "recorded_at": time.time()}
+        for path, data in ((bin_path, blob), (meta_path, json.dumps(meta, ensure_ascii=False, default=str).encode())):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            if self._index is not None and func_name in self._index:
+                entries = [m for m in self._index[func_name] if m["key"] != key]
+                self._index[func_name] = entries + [{**meta, "key": key}]
+
+    def read(self, func_name: str, key: str) -> pd.DataFrame | None:
+        bin_path, meta_path = self._paths(func_name, key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(bin_path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        return decode_payload(meta["codec"], blob)["frame"]
+
+    def entries(self, func_name: str) -> list[dict]:
+        with self._lock:
+            if self._index is None:
+                self._index = {}
+            if func_name not in self._index:
+                d = os.path.join(self.root, func_name)
+                metas = []
+                for n in sorted(os.listdir(d)) if os.path.isdir(d) else []:
+                    if n.endswith(".json"):
+                        with open(os.path.join(d, n), encoding="utf-8") as f:
+                            metas.append({**json.load(f), "key": n[: -len(".json")]})
+                self._index[func_name] = metas
+            return list(self._index[func_name])
+
+
+class RecordingProvider(Provider):
+    """Passes calls through to ``inner`` and writes every response to the fixture store."""
+
+    name = "record"
+
+    def __init__(self, inner: Provider, fixtures: FixtureStore):
+        super().__init__()
+        self.inner = inner
+        self.fixtures = fixtures
+        self.recorded = 0
+
+    def _fetch(self, func_name: str, kwargs: dict) -> pd.DataFrame:
+        df = self.inner.fetch(func_name, **kwargs)
+        try:
+            self.fixtures.write(func_name, kwargs, df)
+            self.recorded += 1
+        except Exception as e:
+            log.warning("recording failed", extra={"func": func_name, "error": str(e)})
+        return df
+
+    def stats(self) -> dict:
+        return {**super().stats(), "inner": self.inner.name, "recorded": self.recorded, "fixture_dir": self.fixtures.root}
+
+
+class ReplayProvider(Provider):
+    """Serves recorded responses with injected latency; never touches the network.
+
+    ``stock_zh_a_hist`` calls with a date range that was never recorded are
+    answered from a recording of the same symbol/period/adjust whose range
+    covers the requested one, filtered to the requested dates. Anything else
+    unrecorded raises ``FixtureMissing``.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures: FixtureStore, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        super().__init__(latency_ms, jitter_ms, seed)
+        self.fixtures = fixtures
+        self.hits = 0
+        self.misses = 0
+
+    def _fetch(self, func_name: str, kwargs: dict) -> pd.DataFrame:
+        df = self.fixtures.read(func_name, fixture_key(func_name, kwargs))
+        if df is None and func_name == "stock_zh_a_hist":
+            df = self._hist_from_wider(kwargs)
+        if df is not None:
+            self.hits += 1
+            return df
+        self.misses += 1
+        raise FixtureMissing(f"no recording for {func_name}({kwargs})")
+
+    def _hist_from_wider(self, kwargs: dict) -> pd.DataFrame | None:
+        start, end = str(kwargs.get("start_date", "0")), str(kwargs.get("end_date", "99999999"))
+        # 只用区间完整覆盖请求的录制；否则会静默少返回数据
+        covering = [
+            m
+            for m in self.fixtures.entries("stock_zh_a_hist")
+            if all(m["kwargs"].get(k) == kwargs.get(k) for k in ("symbol", "period", "adjust"))
+            and str(m["kwargs"].get("start_date", "0")) <= start
+            and str(m["kwargs"].get("end_date", "99999999")) >= end
+        ]
+        if not covering:
+            return None
+        best = min(covering, key=lambda m: m["rows"])
+        df = self.fixtures.read("stock_zh_a_hist", best["key"])
+        if df is None or df.empty:
+            return df
+        day = df["日期"].astype(str).str.replace("-", "", regex=False).str[:8]
+        keep = (day >= start) & (day <= end)
+        return df[keep.to_numpy()].reset_index(drop=True)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "hits": self.hits, "misses": self.misses, "fixture_dir": self.fixtures.root}
+
+
+class SyntheticProvider(Provider):
+    """Generated market (see ``synthetic_market``): deterministic for a given seed and day."""
+
+    name = "synthetic"
+
+    def __init__(self, n_symbols: int, seed: int, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        super().__init__(latency_ms, jitter_ms, seed)
+        self.market = SyntheticMarket(n_symbols, seed)
+
+    def _fetch(self, func_name: str, kwargs: dict) -> pd.DataFrame:
+        m = self.market
+        if func_name == "stock_zh_a_spot_em":
+            return m.spot()
+        if func_name == "stock_zh_a_hist":
+            return m.hist(**kwargs)
+        if func_name == "stock_zh_index_spot_em":
+            return m.index_spot(**kwargs)
+        if func_name == "stock_individual_info_em":
+            return m.info(**kwargs)
+        if func_name == "tool_trade_date_hist_sina":
+            return m.trade_dates(**kwargs)
+        raise FixtureMissing(f"synthetic market has no {func_name}")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "symbols": self.market.n, "seed": self.market.seed}
+
+
+def build_provider(settings: Settings) -> Provider:
+    """MARKET_PROVIDER: akshare（默认）| record | replay | synthetic。"""
+    kind = settings.market_provider
+    if kind == "akshare":
+        return AkShareProvider()
+    if kind == "record":
+        return RecordingProvider(AkShareProvider(), FixtureStore(settings.fixture_dir))
+    if kind == "replay":
+        return ReplayProvider(
+            FixtureStore(settings.fixture_dir), settings.provider_latency_ms, settings.provider_jitter_ms, settings.synthetic_seed
+        )
+    if kind == "synthetic":
+        return SyntheticProvider(
+            settings.synthetic_symbols, settings.synthetic_seed, settings.provider_latency_ms, settings.provider_jitter_ms
+        )
+    raise ValueError(f"unknown MARKET_PROVIDER {kind!r}")
+
+
+_provider: Provider | None = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> Provider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider(get_settings())
+    return _provider
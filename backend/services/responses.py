@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from typing import Any
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from backend.services.executors import run_cpu
+
+try:  # optional: ~5x faster encoding, serializes NumPy arrays without building lists
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - optional dependency
+    _orjson = None
+
+try:  # optional: brotli (~15% smaller than gzip on kline JSON)
+    import brotli as _brotli
+except ImportError:  # pragma: no cover - optional dependency
+    _brotli = None
+
+
+# 小于此大小的响应不压缩（压缩头开销比省下的字节多）
+MIN_COMPRESS_BYTES = 1024
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """JSON bytes; NumPy arrays go out as lists, NaN as null."""
+    if _orjson is not None:
+        return _orjson.dumps(payload, default=_default, option=_orjson.OPT_SERIALIZE_NUMPY | _orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_nan_to_none(payload), default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _nan_to_none(obj: Any) -> Any:
+    # 标准库 json 会输出非法的 NaN 字面量
+    if isinstance(obj, float) and obj != obj:
+        return None
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == "f":
+        return [None if v != v else v for v in obj.tolist()]
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+def column(values: np.ndarray) -> np.ndarray | list:
+    """One struct-of-arrays column: numeric arrays are passed through (contiguous), others as lists."""
+    values = np.asarray(values)
+    if values.dtype.kind in "biuf" and _orjson is not None:
+        return np.ascontiguousarray(values)
+    return values.tolist()
+
+
+def make_etag(*parts: Any) -> str:
+    return 'W/"' + hashlib.blake2b(repr(parts).encode(), digest_size=10).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # 弱比较：W/"x" 与 "x" 视为同一个
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+def _negotiate(request: Request) -> str | None:
+    accepted = {p.split(";")[0].strip().lower() for p in request.headers.get("accept-encoding", "").split(",")}
+    if _brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def not_modified(request: Request, etag: str | None) -> Response | None:
+    """304 when the client already holds ``etag`` (check this before doing the work)."""
+    if etag is not None and _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def encode_body(payload: Any, encoding: str | None) -> tuple[bytes, str | None]:
+    """JSON bytes compressed with ``encoding`` (None when the body is too small to bother)."""
+    body = dumps(payload)
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == "br":
+        return _brotli.compress(body, quality=5), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), encoding
+    return body, None
+
+
+async def json_response(request: Request, payload: Any, etag: str | None = None) -> Response:
+    """Serialize ``payload`` once, honour If-None-Match, and compress per Accept-Encoding.
+
+    Encoding and compression run on the CPU pool, not the event loop.
+    ``Cache-Control: no-cache`` makes browsers revalidate every time, so an
+    unchanged reload costs one 304 with no body.
+    """
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    body, encoding = await run_cpu(encode_body, payload, _negotiate(request))
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
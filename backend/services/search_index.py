@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from backend.services.spot_snapshot import SpotSnapshot, spot_manager
+
+try:  # optional: full pinyin coverage (polyphones, GB2312 level-2 characters)
+    from pypinyin import Style as _PinyinStyle
+    from pypinyin import lazy_pinyin as _lazy_pinyin
+except ImportError:  # pragma: no cover - optional dependency
+    _lazy_pinyin = None
+
+
+# GB2312 一级汉字按拼音排序：每个声母区间的起始编码
+_GB2312_INITIALS = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"), (0xB7A2, "f"),
+    (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"), (0xC0AC, "l"), (0xC2E8, "m"),
+    (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"), (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"),
+    (0xCBFA, "t"), (0xCDDA, "w"), (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+]
+_GB2312_STARTS = [c for c, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+# 股票简称里常见、但不在 GB2312 一级字库（或为繁体）的字
+_INITIAL_OVERRIDES = {
+    "晟": "s", "璞": "p", "铧": "h", "邕": "y", "珀": "p", "鑫": "x", "垚": "y", "淼": "m",
+    "昇": "s", "锂": "l", "钛": "t", "钴": "g", "钼": "m", "昊": "h", "琦": "q", "瑞": "r",
+    "迦": "j", "埃": "a", "圳": "z", "濮": "p", "亳": "b", "浔": "x", "鲲": "k",
+}
+
+
+def _char_initial(ch: str) -> str:
+    if ch.isascii():
+        return ch.lower() if ch.isalnum() else ""
+    if ch in _INITIAL_OVERRIDES:
+        return _INITIAL_OVERRIDES[ch]
+    try:
+        code = int.from_bytes(ch.encode("gb2312"), "big")
+    except UnicodeEncodeError:
+        return ""
+    if not (_GB2312_STARTS[0] <= code <= _GB2312_LEVEL1_END):
+        return ""
+    return _GB2312_INITIALS[bisect_left(_GB2312_STARTS, code + 1) - 1][1]
+
+
+def pinyin_initials(name: str) -> str:
+    """贵州茅台 -> gzmt；字母数字原样保留（小写），其余符号忽略。"""
+    if _lazy_pinyin is not None:
+        parts = _lazy_pinyin(name, style=_PinyinStyle.FIRST_LETTER, errors=lambda s: [c for c in s])
+        return "".join(p[:1].lower() for p in parts if p and p[:1].isalnum())
+    return "".join(_char_initial(ch) for ch in name)
+
+
+def _clean(v):
+    return None if isinstance(v, float) and math.isnan(v) else v
+
+
+class SearchIndex:
+    """Immutable in-memory index over one spot snapshot.
+
+    Exact and prefix matches on code / ts_code / name / pinyin initials come
+    from sorted key lists (binary search); substrings from a uni/bi-gram
+    posting index. Ranking: exact code > code prefix > name or pinyin prefix >
+    substring, then snapshot order.
+    """
+
+    def __init__(self, snap: SpotSnapshot):
+        df = snap.df
+        self.version = snap.version
+        self.records = [
+            {"ts_code": t, "code": c, "name": n, "price": _clean(p), "pct_chg": _clean(g)}
+            for t, c, n, p, g in zip(
+                df["ts_code"].tolist(), df["code"].tolist(), df["name"].tolist(), df["close"].tolist(), df["pct_chg"].tolist()
+            )
+        ]
+        codes = [r["code"].lower() for r in self.records]
+        ts_codes = [r["ts_code"].lower() for r in self.records]
+        names = [r["name"].lower() for r in self.records]
+        initials = [pinyin_initials(r["name"]) for r in self.records]
+        self._codes = codes
+        self._ts_codes = ts_codes
+
+        self._code_keys = self._sorted_keys(codes, ts_codes)
+        self._name_keys = self._sorted_keys(names, initials)
+
+        self._text = [f"{t}\x00{n}\x00{i}" for t, n, i in zip(ts_codes, names, initials)]
+        grams: dict[str, list[int]] = defaultdict(list)
+        for idx, text in enumerate(self._text):
+            seen = set(text)
+            seen.update(text[k : k + 2] for k in range(len(text) - 1))
+            for g in seen:
+                grams[g].append(idx)
+        self._grams = dict(grams)
+
+    @staticmethod
+    def _sorted_keys(*columns: list[str]) -> tuple[list[str], list[int]]:
+        pairs = sorted((key, idx) for col in columns for idx, key in enumerate(col) if key)
+        return [k for k, _ in pairs], [i for _, i in pairs]
+
+    @staticmethod
+    def _prefix(keys: tuple[list[str], list[int]], q: str) -> list[int]:
+        ks, ids = keys
+        out = []
+        j = bisect_left(ks, q)
+        while j < len(ks) and ks[j].startswith(q):
+            out.append(ids[j])
+            j += 1
+        return out
+
+    def search(self, q: str, limit: int = 50) -> list[dict]:
+        q = (q or "").strip().lower()
+        if not q:
+            return self.records[:limit]
+        tiers: list[list[int]] = [[], [], [], []]
+        for idx in self._prefix(self._code_keys, q):
+            exact = self._codes[idx] == q or self._ts_codes[idx] == q
+            tiers[0 if exact else 1].append(idx)
+        tiers[2] = self._prefix(self._name_keys, q)
+        if "\x00" not in q:
+            grams = [q[k : k + 2] for k in range(len(q) - 1)] or [q]
+            postings = min((self._grams.get(g, ()) for g in grams), key=len)
+            tiers[3] = [idx for idx in postings if q in self._text[idx]]
+        out: list[dict] = []
+        seen: set[int] = set()
+        for tier in tiers:
+            for idx in sorted(tier):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                out.append(self.records[idx])
+                if len(out) >= limit:
+                    return out
+        return out
+
+
+_index: SearchIndex | None = None
+_lock = threading.Lock()
+
+
+def get_search_index(snap: SpotSnapshot) -> SearchIndex:
+    """Index for ``snap``, rebuilt once per snapshot version."""
+    global _index
+    idx = _index
+    if idx is not None and idx.version == snap.version:
+        return idx
+    with _lock:
+        if _index is None or _index.version != snap.version:
+            _index = SearchIndex(snap)
+        return _index
+
+
+# 快照刷新后立即预建索引，避免第一次搜索承担构建开销
+spot_manager.subscribe(get_search_index)
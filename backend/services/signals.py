@@ -3,12 +3,21 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
-import pandas as pd
+import numpy as np
 
-from backend.services.stocks import get_kline
+from backend.services.bar_store import t_to_days
+from backend.services.patterns import entry_mask, exit_pattern_mask, rolling_mean
+from backend.services.stocks import get_kline_array
 from backend.services.strategy_dsl import StrategyDSL
 
 
+PATTERN_DESC = {
+    "close_below_ma10": "收盘跌破MA10。",
+    "bearish_engulfing": "出现看跌吞没形态。",
+    "volume_breakdown": "放量下破MA10。",
+}
+
+
 def _yyyymmdd(d: datetime) -> str:
     return d.strftime("%Y%m%d")
 
@@ -23,121 +32,84 @@ def compute_strategy_events(ts_code: str, dsl: StrategyDSL, days: int) -> dict:
     days = max(20, min(400, int(days)))
     end = datetime.now()
     start = end - timedelta(days=int(days * 1.8))
-    bars = get_kline(ts_code, _yyyymmdd(start), _yyyymmdd(end), adj="qfq")
-    if not bars:
+    bars = get_kline_array(ts_code, _yyyymmdd(start), _yyyymmdd(end), adj="qfq")
+    if not len(bars):
         return {"ts_code": ts_code, "events": []}
 
-    df = pd.DataFrame(bars)
-    df["date"] = pd.to_datetime(df["t"])
-    df = df.sort_values("date")
-    df["close"] = df["c"].astype(float)
-    df["ma5"] = df["close"].rolling(5).mean()
-    df["ma10"] = df["close"].rolling(10).mean()
-    df["ma5_slope"] = df["ma5"].diff()
+    close = bars["c"].astype(float)
+    n = len(close)
+    # t 为 YYYYMMDD 整数；转成自然日序号用于持仓天数计算
+    day = t_to_days(bars["t"]).tolist()
+
+    # 所有逐日条件一次性按数组算好，循环里只剩持仓状态机；
+    # 入场/出场条件与回测共用 patterns 中的实现（pandas rolling，与原逐行引擎逐位一致）
+    pos = np.arange(n)
+    ma5 = rolling_mean(close, 5, pos)
+    ma10 = rolling_mean(close, 10, pos)
+    valid = ~np.isnan(ma5) & ~np.isnan(ma10)
+    valid[:1] = False
+
+    buy = entry_mask(close, pos, dsl.filters.tech)
+    pattern = dsl.exits.exitPattern
+    exit_pat = exit_pattern_mask(pattern, bars["o"].astype(float), close, bars["v"].astype(float), pos)
 
     events: list[dict] = []
     entry_price: float | None = None
-    entry_date: datetime | None = None
+    entry_day = 0
 
     tp = dsl.exits.takeProfitPct
     sl = dsl.exits.stopLossPct
+    tp_k = None if tp is None else 1 + float(tp) / 100.0
+    sl_k = None if sl is None else 1 + float(sl) / 100.0
+
+    closes = close.tolist()
+    t_list = bars["t"].tolist()
+    valid_l = valid.tolist()
+    buy_l = buy.tolist()
+    exit_l = exit_pat.tolist()
+
+    def _event(i: int, typ: str, title: str, desc: str) -> dict:
+        t = t_list[i]
+        return {
+            "type": typ,
+            "date": f"{t // 10000:04d}-{t // 100 % 100:02d}-{t % 100:02d}",
+            "price": round(closes[i], 3),
+            "title": title,
+            "desc": desc,
+        }
+
+    for i in range(1, n):
+        if not valid_l[i]:
+            continue
+        close1 = closes[i]
+
+        if entry_price is None:
+            if buy_l[i]:
+                entry_price = close1
+                entry_day = day[i]
+                events.append(_event(i, "buy", "买入触发", "价格上穿MA5且MA5上行（或技术触发近似）。"))
+            continue
 
-    for i in range(1, len(df)):
-        r0 = df.iloc[i - 1]
-        r1 = df.iloc[i]
-        if pd.isna(r1["ma5"]) or pd.isna(r1["ma10"]):
+        # Take profit / stop loss
+        if tp_k is not None and close1 >= entry_price * tp_k:
+            events.append(_event(i, "sell", "止盈触发", f"达到止盈 {tp}%。"))
+            entry_price = None
+            continue
+        if sl_k is not None and close1 <= entry_price * sl_k:
+            events.append(_event(i, "sell", "止损触发", f"达到止损 {sl}%。"))
+            entry_price = None
             continue
 
-        date = r1["date"]
-        close0 = float(r0["close"])
-        close1 = float(r1["close"])
-
-        # Buy trigger
-        cross_up_ma5 = close0 <= float(r0["ma5"]) and close1 > float(r1["ma5"])
-        buy_ok = cross_up_ma5 and float(r1["ma5_slope"] or 0) > 0
-
-        # Tech override: break_20d or rsi_oversold are approximated by price momentum
-        if dsl.filters.tech == "break_20d":
-            window = df.iloc[max(0, i - 20) : i]
-            if len(window) >= 10 and close1 >= float(window["close"].max()):
-                buy_ok = True
-        if dsl.filters.tech == "rsi_oversold":
-            # Approx: 3-day rebound after 10-day drawdown
-            window = df.iloc[max(0, i - 10) : i]
-            if len(window) >= 8 and close1 > close0 and close1 >= float(window["close"].min()) * 1.03:
-                buy_ok = True
-
-        if entry_price is None and buy_ok:
-            entry_price = close1
-            entry_date = date
-            events.append(
-                {
-                    "type": "buy",
-                    "date": date.strftime("%Y-%m-%d"),
-                    "price": round(close1, 3),
-                    "title": "买入触发",
-                    "desc": "价格上穿MA5且MA5上行（或技术触发近似）。",
-                }
-            )
+        # Exit pattern: close below MA10 / bearish engulfing / volume breakdown
+        if exit_l[i]:
+            events.append(_event(i, "sell", "形态退出", PATTERN_DESC[pattern]))
+            entry_price = None
             continue
 
-        if entry_price is not None:
-            # Take profit / stop loss
-            if tp is not None and close1 >= entry_price * (1 + float(tp) / 100.0):
-                events.append(
-                    {
-                        "type": "sell",
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(close1, 3),
-                        "title": "止盈触发",
-                        "desc": f"达到止盈 {tp}%。",
-                    }
-                )
-                entry_price = None
-                entry_date = None
-                continue
-            if sl is not None and close1 <= entry_price * (1 + float(sl) / 100.0):
-                events.append(
-                    {
-                        "type": "sell",
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(close1, 3),
-                        "title": "止损触发",
-                        "desc": f"达到止损 {sl}%。",
-                    }
-                )
-                entry_price = None
-                entry_date = None
-                continue
-
-            # Exit pattern: close below MA10
-            exit_by_ma10 = close0 >= float(r0["ma10"]) and close1 < float(r1["ma10"])
-            if dsl.exits.exitPattern == "close_below_ma10" and exit_by_ma10:
-                events.append(
-                    {
-                        "type": "sell",
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(close1, 3),
-                        "title": "形态退出",
-                        "desc": "收盘跌破MA10。",
-                    }
-                )
-                entry_price = None
-                entry_date = None
-                continue
-
-            # Default light note
-            if (date - (entry_date or date)).days >= 15:
-                events.append(
-                    {
-                        "type": "note",
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(close1, 3),
-                        "title": "持仓观察",
-                        "desc": "持仓超过两周，关注趋势延续与量能。",
-                    }
-                )
-                entry_date = date  # throttle notes
+        # Default light note
+        if day[i] - entry_day >= 15:
+            events.append(_event(i, "note", "持仓观察", "持仓超过两周，关注趋势延续与量能。"))
+            entry_day = day[i]  # throttle notes
 
     # keep only last ~30 events
     events = events[-30:]
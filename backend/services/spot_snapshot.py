@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.services import upstream
+from backend.services.cache import cache_get, cache_set
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+# AkShare stock_zh_a_spot_em 中文列 -> 内部统一列名
+SPOT_COLUMNS = {
+    "代码": "code",
+    "名称": "name",
+    "最新价": "close",
+    "涨跌幅": "pct_chg",
+    "涨跌额": "change",
+    "成交量": "vol",
+    "成交额": "amount",
+    "振幅": "amplitude",
+    "最高": "high",
+    "最低": "low",
+    "今开": "open",
+    "昨收": "pre_close",
+    "量比": "volume_ratio",
+    "换手率": "turnover_rate",
+    "市盈率-动态": "pe",
+    "市净率": "pb",
+    "总市值": "total_mv",
+    "流通市值": "circ_mv",
+}
+SPOT_TEXT_COLUMNS = ("ts_code", "code", "name")
+SPOT_NUMERIC_COLUMNS = tuple(v for v in SPOT_COLUMNS.values() if v not in SPOT_TEXT_COLUMNS)
+
+SPOT_CACHE_KEY = "akshare:stock_zh_a_spot_em:v3"
+
+
+def codes_to_ts(codes: pd.Series) -> pd.Series:
+    """Vectorized stocks._code_to_ts: 6xxxxx -> .SH, 0/3xxxxx -> .SZ, 8/4/92xxxx -> .BJ, others unchanged."""
+    codes = codes.astype(str)
+    six = codes.str.len() == 6
+    suffix = np.select(
+        [six & codes.str.startswith("6"), six & codes.str[:1].isin(["0", "3"]), six & codes.str.startswith(("8", "4", "92"))],
+        [".SH", ".SZ", ".BJ"],
+        "",
+    )
+    return codes + suffix
+
+
+def typed_spot(raw: pd.DataFrame) -> pd.DataFrame:
+    """Rename the upstream table and coerce every column to a fixed dtype."""
+    df = raw.rename(columns=SPOT_COLUMNS)
+    out = pd.DataFrame(index=range(len(df)))
+    out["code"] = df["code"].astype(str).to_numpy() if "code" in df else ""
+    out["ts_code"] = codes_to_ts(out["code"])
+    out["name"] = df["name"].astype(str).to_numpy() if "name" in df else ""
+    for col in SPOT_NUMERIC_COLUMNS:
+        out[col] = pd.to_numeric(df[col], errors="coerce").astype("float64").to_numpy() if col in df else np.nan
+    out["mcap_yi"] = out["total_mv"] / 1e8
+    return out
+
+
+def empty_spot() -> pd.DataFrame:
+    return typed_spot(pd.DataFrame(columns=list(SPOT_COLUMNS)))
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of a spot table: equal across processes for equal data (ETags)."""
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(rows.tobytes(), digest_size=10).hexdigest()
+
+
+@dataclass(frozen=True)
+class SpotSnapshot:
+    """One immutable full-market spot table.
+
+    ``version`` increases on every refresh of this process (in-process cache
+    keys); ``digest`` identifies the content and is the same in every worker.
+    """
+
+    version: int
+    fetched_at: float
+    df: pd.DataFrame = field(repr=False)
+    digest: str = ""
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at if self.fetched_at else float("inf")
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+
+def _is_trading_hours(now: datetime) -> bool:
+    if now.weekday() >= 5:
+        return False
+    hm = now.hour * 100 + now.minute
+    return 915 <= hm <= 1135 or 1255 <= hm <= 1505
+
+
+class SnapshotManager:
+    """Owns the latest spot snapshot for the whole process.
+
+    Readers get the current snapshot when it is fresh enough; when it is stale,
+    concurrent readers coalesce onto a single upstream refresh (single-flight).
+    A background thread keeps it warm during trading hours.
+    """
+
+    def __init__(self, max_age: float, refresh_interval: float, error_backoff: float = 5.0):
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.error_backoff = error_backoff
+        self._snap = SpotSnapshot(version=0, fetched_at=0.0, df=empty_spot())
+        self._lock = threading.Lock()
+        self._inflight: threading.Event | None = None
+        self._retry_after = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._listeners: list = []
+
+    def subscribe(self, fn) -> None:
+        """Call ``fn(snapshot)`` after every successful refresh (to precompute derived data)."""
+        self._listeners.append(fn)
+
+    @property
+    def current(self) -> SpotSnapshot:
+        return self._snap
+
+    def get(self, max_age: float | None = None) -> SpotSnapshot:
+        max_age = self.max_age if max_age is None else max_age
+        snap = self._snap
+        if not snap.empty and snap.age <= max_age:
+            return snap
+        return self.refresh(if_older_than=max_age)
+
+    def refresh(self, if_older_than: float = 0.0) -> SpotSnapshot:
+        with self._lock:
+            snap = self._snap
+            if not snap.empty and snap.age <= if_older_than:
+                return snap
+            if time.time() < self._retry_after:
+                # 上游刚失败过，退避期内直接返回旧快照
+                return snap
+            ev = self._inflight
+            leader = ev is None
+            if leader:
+                ev = self._inflight = threading.Event()
+        if not leader:
+            ev.wait(timeout=60)
+            return self._snap
+        fresh = None
+        try:
+            loaded = self._load(if_older_than)
+            digest = frame_digest(loaded[0]) if loaded is not None else ""
+            with self._lock:
+                if loaded is not None:
+                    df, fetched_at = loaded
+                    fresh = self._snap = SpotSnapshot(version=self._snap.version + 1, fetched_at=fetched_at, df=df, digest=digest)
+                else:
+                    self._retry_after = time.time() + self.error_backoff
+        finally:
+            with self._lock:
+                self._inflight = None
+            ev.set()
+        if fresh is not None:
+            for fn in self._listeners:
+                try:
+                    fn(fresh)
+                except Exception:
+                    log.exception("listener failed")
+        return self._snap
+
+    def _load(self, max_age: float) -> tuple[pd.DataFrame, float] | None:
+        """(frame, fetch time) from the shared cache when fresh enough, else from upstream; None on failure."""
+        # 多进程部署时其它 worker 可能刚写过缓存；沿用它的抓取时间，快照年龄才准确
+        cached = cache_get(SPOT_CACHE_KEY)
+        if cached and "frame" in cached and not cached["frame"].empty:
+            fetched_at = float(cached.get("fetched_at") or 0.0)
+            if time.time() - fetched_at <= max_age:
+                return cached["frame"], fetched_at
+        try:
+            raw = upstream.call("stock_zh_a_spot_em")
+        except Exception as e:
+            log.warning("spot fetch failed", extra={"error": str(e)})
+            return None
+        df = typed_spot(raw)
+        if df.empty:
+            # 空表当作失败：走 error_backoff，而不是每个请求都打上游
+            log.warning("spot fetch returned no rows")
+            return None
+        fetched_at = time.time()
+        # 列式二进制编码，读回时直接得到同样 dtype 的 DataFrame
+        cache_set(SPOT_CACHE_KEY, {"frame": df, "fetched_at": fetched_at}, ttl_seconds=int(self.max_age))
+        return df, fetched_at
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            # 非交易时段行情不变，降低刷新频率
+            max_age = self.refresh_interval if _is_trading_hours(datetime.now()) else 30 * 60
+            try:
+                self.get(max_age=max_age)
+            except Exception:
+                log.exception("background refresh failed")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spot-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_settings = get_settings()
+spot_manager = SnapshotManager(
+    max_age=_settings.spot_max_age_seconds,
+    refresh_interval=_settings.spot_refresh_interval_seconds,
+)
+
+
+def get_spot_snapshot(max_age: float | None = None) -> SpotSnapshot:
+    return spot_manager.get(max_age)
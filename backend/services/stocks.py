@@ -1,112 +1,185 @@
 from __future__ import annotations
 
-import akshare as ak
+import logging
+from datetime import datetime
+from typing import Callable
+
+import numpy as np
 import pandas as pd
 
+from backend.services import upstream
+from backend.services.bar_store import BAR_DTYPE, get_bar_store, yyyymmdd_to_int
 from backend.services.cache import cache_get, cache_set
+from backend.services.profile_store import market_of, profile_refresher, profile_store
+from backend.services.responses import column
+from backend.services.search_index import get_search_index
+from backend.services.spot_snapshot import SpotSnapshot, get_spot_snapshot
 from backend.settings import get_settings
 
+log = logging.getLogger(__name__)
+
 
 def _cache_ttl() -> int:
     return get_settings().cache_default_ttl_seconds
 
 
-def _spot_cached() -> pd.DataFrame:
-    """缓存 AkShare 实时行情，用于搜索和基础信息。"""
-    key = "akshare:stock_zh_a_spot_em:v1"
-    cached = cache_get(key)
-    if cached and "rows" in cached:
-        return pd.DataFrame(cached["rows"])
-
-    try:
-        df = ak.stock_zh_a_spot_em()
-        print(f"[stocks._spot_cached] fetched rows={len(df)}")
-    except Exception as e:
-        print(f"[stocks._spot_cached] AkShare spot error: {e}")
-        return pd.DataFrame(
-            columns=["代码", "名称", "最新价", "涨跌幅", "成交量", "成交额", "换手率", "市盈率-动态", "总市值"]
-        )
-    rows = df.to_dict(orient="records")
-    cache_set(key, {"rows": rows}, ttl_seconds=30)
-    return df
-
-
 def _code_to_ts(code: str) -> str:
     code = str(code)
     if len(code) == 6 and code.startswith("6"):
         return f"{code}.SH"
     if len(code) == 6 and (code.startswith("0") or code.startswith("3")):
         return f"{code}.SZ"
+    # 北交所：8/4 开头（老代码）和 92 开头（新代码）
+    if len(code) == 6 and code.startswith(("8", "4", "92")):
+        return f"{code}.BJ"
     return code
 
 
-def search_stocks(q: str) -> list[dict]:
-    q = (q or "").strip().lower()
-    df = _spot_cached()
-    if df.empty:
-        return []
-    df = df.rename(columns={"代码": "code", "名称": "name", "最新价": "price", "涨跌幅": "pct_chg"})
-    df["ts_code"] = df["code"].apply(_code_to_ts)
-    if q:
-        mask = (
-            df["ts_code"].str.lower().str.contains(q)
-            | df["code"].astype(str).str.lower().str.contains(q)
-            | df["name"].astype(str).str.lower().str.contains(q)
-        )
-        df = df[mask]
-    df = df.head(50)
-    return df[["ts_code", "code", "name", "price", "pct_chg"]].to_dict(orient="records")
+def search_stocks(q: str, snap: SpotSnapshot | None = None) -> list[dict]:
+    """代码/简称/拼音首字母搜索；索引按快照版本构建一次，查询不经过 pandas。"""
+    return get_search_index(snap or get_spot_snapshot()).search(q, limit=50)
 
 
-def stock_profile(ts_code: str) -> dict | None:
-    try:
-        symbol = ts_code.split(".")[0]
-    except Exception:
-        symbol = ts_code
-    try:
-        info = ak.stock_individual_info_em(symbol=symbol)
-    except Exception:
-        info = None
-    base = {"ts_code": ts_code, "code": symbol, "name": "", "industry": "", "area": "", "market": ""}
-    if info is not None and not info.empty:
-        mapping = {row["item"]: row["value"] for _, row in info.iterrows()}
-        base["name"] = mapping.get("股票简称", "") or mapping.get("名称", "")
-        base["industry"] = mapping.get("行业", "") or ""
-    return base
+def records_to_columns(items: list[dict], fields: tuple[str, ...]) -> dict:
+    return {f: [r.get(f) for r in items] for f in fields}
 
 
-def get_kline(ts_code: str, start: str, end: str, adj: str) -> list[dict]:
-    key = f"akshare:kline:v1:{ts_code}:{start}:{end}:{adj}"
-    cached = cache_get(key)
-    if cached and "bars" in cached:
-        return cached["bars"]
+def stock_profile(ts_code: str, snap: SpotSnapshot | None = None) -> dict | None:
+    """本地查询：stock_profiles 表（后台任务批量维护），缺失时用快照补名称并排队抓取。"""
+    symbol = ts_code.split(".")[0]
+    p = profile_store.get(ts_code)
+    if p is not None:
+        return {k: p[k] for k in ("ts_code", "code", "name", "industry", "area", "market", "list_date", "updated_at")}
+    profile_refresher.request(ts_code)
+    base = {"ts_code": ts_code, "code": symbol, "name": "", "industry": "", "area": "", "market": market_of(symbol), "list_date": "", "updated_at": None}
+    df = (snap or get_spot_snapshot()).df
+    hit = df.loc[df["ts_code"] == ts_code, "name"]
+    if not hit.empty:
+        base["name"] = str(hit.iloc[0])
+    return base
 
+
+def _hist_to_bars(df: pd.DataFrame | None) -> np.ndarray:
+    if df is None or df.empty:
+        return np.zeros(0, dtype=BAR_DTYPE)
+    out = np.zeros(len(df), dtype=BAR_DTYPE)
+    out["t"] = df["日期"].astype(str).str.replace("-", "", regex=False).str[:8].astype(int).to_numpy()
+    out["o"] = df["开盘"].astype(float).to_numpy()
+    out["h"] = df["最高"].astype(float).to_numpy()
+    out["l"] = df["最低"].astype(float).to_numpy()
+    out["c"] = df["收盘"].astype(float).to_numpy()
+    for col, src in (("v", "成交量"), ("a", "成交额")):
+        if src in df.columns:
+            out[col] = df[src].astype(float).fillna(0.0).to_numpy()
+    return np.sort(out, order="t")
+
+
+def _fetch_hist(ts_code: str, start: int, end: int, adj: str, limiter: Callable[[], None] | None = None) -> np.ndarray | None:
     symbol = ts_code.split(".")[0]
+    if limiter is not None:
+        limiter()
     adjust = "qfq" if adj == "qfq" else ""
     try:
-        df = ak.stock_zh_a_hist(symbol=symbol, period="daily", start_date=start, end_date=end, adjust=adjust)
-        print(f"[stocks.get_kline] {ts_code} hist rows={len(df)}")
+        df = upstream.call(
+            "stock_zh_a_hist", symbol=symbol, period="daily", start_date=str(start), end_date=str(end), adjust=adjust
+        )
+        log.info("hist fetched", extra={"ts_code": ts_code, "start": start, "end": end, "rows": len(df)})
     except Exception as e:
-        print(f"[stocks.get_kline] AkShare hist error: {e}")
-        df = None
-    if df is None or df.empty:
-        bars: list[dict] = []
-        cache_set(key, {"bars": bars}, ttl_seconds=60)
-        return bars
-
-    df = df.sort_values("日期")
-    bars = [
-        {
-            "t": row["日期"].replace("-", ""),
-            "o": float(row["开盘"]),
-            "h": float(row["最高"]),
-            "l": float(row["最低"]),
-            "c": float(row["收盘"]),
-            "v": float(row.get("成交量", 0) or 0.0),
-            "a": float(row.get("成交额", 0) or 0.0),
-        }
-        for _, row in df.iterrows()
+        # 批量导入（带 limiter）遇到熔断/超时要整体暂停，而不是把后面的股票都记为失败
+        if limiter is not None and isinstance(e, upstream.UpstreamUnavailable):
+            raise
+        log.warning("hist fetch failed", extra={"ts_code": ts_code, "error": str(e)})
+        return None
+    return _hist_to_bars(df)
+
+
+# 上游出错后这段时间内不再重试同一只股票，直接用本地已有数据（与旧版 K 线缓存的 60 秒空结果一致）
+HIST_ERROR_TTL = 60
+
+
+def _hist_error_key(ts_code: str, adj: str) -> str:
+    return f"akshare:hist_error:v1:{ts_code}:{adj}"
+
+
+def _settled(t: int, refreshed_at: float) -> bool:
+    """Whether bar ``t`` was stored after that day's close (a bar fetched mid-session is still forming)."""
+    at = datetime.fromtimestamp(refreshed_at)
+    day = at.year * 10000 + at.month * 100 + at.day
+    return day > t or (day == t and at.hour >= 15)
+
+
+def sync_bars(ts_code: str, start: int, end: int, adj: str, limiter: Callable[[], None] | None = None) -> bool:
+    """把本地 bar store 补齐到 [start, end]，只向上游请求缺失的首尾区间。
+
+    ``limiter`` is called before every upstream request (bulk ingestion uses
+    it for a global rate limit and manages its own retries); with it,
+    ``UpstreamUnavailable`` propagates so the caller can back off. Without it,
+    a failed fetch is remembered for ``HIST_ERROR_TTL`` seconds and not retried.
+    Returns False if any request failed.
+    """
+    store = get_bar_store()
+    ttl = _cache_ttl()
+    if not store.missing_ranges(ts_code, adj, start, end, ttl):
+        return True
+    if limiter is None and cache_get(_hist_error_key(ts_code, adj)) is not None:
+        return False
+    ok = True
+    with store.key_lock(ts_code, adj):
+        for gs, ge in store.missing_ranges(ts_code, adj, start, end, ttl):
+            bars, meta = store.load(ts_code, adj)
+            # 尾部补数时从已存最后一根K线开始取：盘中取到的那根可能还没收盘，需要覆盖；
+            # 前复权还要用重叠的那根校验复权因子是否变化
+            overlap = None
+            if meta is not None and len(bars) and gs > int(bars["t"][-1]):
+                overlap = bars[-1]
+                gs = int(overlap["t"])
+            new = _fetch_hist(ts_code, gs, ge, adj, limiter)
+            if new is None:
+                ok = False
+                if limiter is None:
+                    cache_set(_hist_error_key(ts_code, adj), {"start": gs, "end": ge}, ttl_seconds=HIST_ERROR_TTL)
+                continue
+            if overlap is not None and adj == "qfq" and _settled(int(overlap["t"]), float(meta.get("refreshed_at", 0))):
+                hit = new[new["t"] == overlap["t"]]
+                if len(hit) and not np.isclose(hit["c"][0], overlap["c"], rtol=1e-6):
+                    # 除权除息后历史前复权价整体变化：丢弃旧数据，按覆盖范围整段重取
+                    full_start = min(int(meta["start"]), start)
+                    full = _fetch_hist(ts_code, full_start, ge, adj, limiter)
+                    if full is not None:
+                        store.replace(ts_code, adj, full, full_start, max(ge, int(meta["end"])))
+                    else:
+                        ok = False
+                    continue
+            store.merge(ts_code, adj, new, gs, ge)
+    return ok
+
+
+def get_kline_array(ts_code: str, start: str, end: str, adj: str) -> np.ndarray:
+    """同 get_kline，但直接返回 BAR_DTYPE 结构化数组（供分析计算使用）。"""
+    s, e = yyyymmdd_to_int(start), yyyymmdd_to_int(end)
+    sync_bars(ts_code, s, e, adj)
+    return get_bar_store().slice(ts_code, adj, s, e)
+
+
+def bars_to_rows(bars: np.ndarray) -> list[dict]:
+    return [
+        {"t": str(t), "o": o, "h": h, "l": l, "c": c, "v": v, "a": a}
+        for t, o, h, l, c, v, a in zip(
+            bars["t"].tolist(),
+            bars["o"].tolist(),
+            bars["h"].tolist(),
+            bars["l"].tolist(),
+            bars["c"].tolist(),
+            bars["v"].tolist(),
+            bars["a"].tolist(),
+        )
     ]
-    cache_set(key, {"bars": bars}, ttl_seconds=_cache_ttl())
-    return bars
 
+
+def bars_to_columns(bars: np.ndarray) -> dict:
+    """列式（struct-of-arrays）：{"t": [20240102, ...], "o": [...], ...}；t 为整数 YYYYMMDD。"""
+    return {name: column(bars[name]) for name in BAR_DTYPE.names}
+
+
+def get_kline(ts_code: str, start: str, end: str, adj: str) -> list[dict]:
+    return bars_to_rows(get_kline_array(ts_code, start, end, adj))
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db import SessionLocal
+from backend.models import CacheEntry, Strategy, StrategyRun
+from backend.services.db_writer import db_writer
+from backend.services.price_panel import record_day
+from backend.services.spot_snapshot import get_spot_snapshot
+from backend.services.strategy_dsl import StrategyDSL
+from backend.services.strategy_plan import compile_dsl
+from backend.services.strategy_store import StrategyContext, run_items, save_runs
+from backend.services.trade_calendar import is_trading_day
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+def run_all_strategies(trade_date: str | None = None, strategy_ids: list[str] | None = None, scheduled: bool = False) -> dict:
+    """Screen every saved strategy (or ``strategy_ids``) against one snapshot in one pass.
+
+    All strategies share the columnar frame, and identical predicates
+    (e.g. the same ``peMax``) are evaluated once. One run (plus its item
+    rows) is written per strategy in a single transaction; ``scheduled`` marks
+    the runs as the day's after-close batch (see ``batch_exists``).
+    """
+    t0 = time.perf_counter()
+    trade_date = trade_date or datetime.now().strftime("%Y%m%d")
+    with SessionLocal() as db:
+        q = select(Strategy.id, Strategy.dsl)
+        if strategy_ids:
+            q = q.where(Strategy.id.in_(strategy_ids))
+        strategies = db.execute(q).all()
+
+    ctx = StrategyContext(trade_date=trade_date)
+    frame = ctx.screen_frame()
+    shared: dict = {}
+    batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+    runs: list[tuple[str, dict, dict, list[dict]]] = []
+    failed: dict[str, str] = {}
+    for strategy_id, dsl in strategies:
+        try:
+            plan = compile_dsl(StrategyDSL.model_validate(dsl))
+            df = frame.df.iloc[plan.select(frame, int(trade_date), limit=100, shared=shared)]
+        except Exception as e:
+            failed[strategy_id] = str(e)
+            log.warning("strategy failed", extra={"strategy_id": strategy_id, "error": str(e)})
+            continue
+        items = run_items(df)
+        summary = {"trade_date": trade_date, "snapshot_version": ctx.snapshot.version, "count": len(items)}
+        params = {"trade_date": trade_date, "batch_id": batch_id, **({"scheduled": True} if scheduled else {})}
+        runs.append((strategy_id, params, summary, items))
+    run_ids = dict(zip((r[0] for r in runs), save_runs(runs)))
+    took = round(time.perf_counter() - t0, 4)
+    log.info(
+        "batch finished",
+        extra={"batch_id": batch_id, "strategies": len(runs), "predicates": len(shared), "failed": len(failed), "seconds": took},
+    )
+    return {
+        "batch_id": batch_id,
+        "trade_date": trade_date,
+        "snapshot_version": ctx.snapshot.version,
+        "runs": run_ids,
+        "failed": failed,
+        "shared_predicates": len(shared),
+        "seconds": took,
+    }
+
+
+def batch_exists(trade_date: str) -> bool:
+    """Whether the scheduler already wrote runs for ``trade_date`` (survives restarts)."""
+    with SessionLocal() as db:
+        q = select(StrategyRun.id).where(StrategyRun.trade_date == trade_date, StrategyRun.params["scheduled"].as_boolean())
+        return db.execute(q.limit(1)).first() is not None
+
+
+# 多个 worker 同时到点时只有抢到这行的那个执行；执行失败会释放，崩溃则在过期后释放
+_CLAIM_TTL = 900
+
+
+def _claim(trade_date: str) -> bool:
+    key = f"strategy_batch:claim:{trade_date}"
+
+    def _insert(db) -> bool:
+        now = int(time.time())
+        db.execute(delete(CacheEntry).where(CacheEntry.key == key, CacheEntry.expires_at < now))
+        stmt = sqlite_insert(CacheEntry).values(key=key, expires_at=now + _CLAIM_TTL, accessed_at=now)
+        return db.execute(stmt.on_conflict_do_nothing(index_elements=["key"])).rowcount == 1
+
+    return db_writer.write(_insert)
+
+
+def _release(trade_date: str) -> None:
+    key = f"strategy_batch:claim:{trade_date}"
+    db_writer.write(lambda db: db.execute(delete(CacheEntry).where(CacheEntry.key == key)))
+
+
+class StrategyScheduler:
+    """Runs ``run_all_strategies`` once per trading day at ``at`` (HH:MM, local time).
+
+    Trading days come from the exchange calendar (``trade_calendar``). Whether
+    the day's batch already ran is read back from ``strategy_runs``, so
+    restarts, ``--reload`` and several workers don't run it again; a process
+    started after the scheduled time catches up immediately. An empty spot
+    snapshot is not written as a result; the run is retried on the next check.
+    After the batch, the day's closes are appended to the price panel (the
+    only place it grows, so holidays never become panel columns).
+    """
+
+    def __init__(self, at: str, check_interval: float = 30.0):
+        hh, mm = at.split(":")
+        self.at = int(hh) * 100 + int(mm)
+        self.check_interval = check_interval
+        self.last_date: str | None = None
+        self.last_result: dict | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def due(self, now: datetime) -> bool:
+        day = now.strftime("%Y%m%d")
+        if now.hour * 100 + now.minute < self.at or self.last_date == day or not is_trading_day(day):
+            return False
+        if batch_exists(day):
+            self.last_date = day
+            return False
+        return True
+
+    def run_once(self, now: datetime | None = None) -> dict | None:
+        """Run the day's batch; None when another worker holds it or the snapshot is empty."""
+        day = (now or datetime.now()).strftime("%Y%m%d")
+        if not _claim(day):
+            return None
+        try:
+            # 抢到时另一个 worker 可能刚跑完并释放
+            if batch_exists(day):
+                self.last_date = day
+                return None
+            # 收盘后强制取一次新快照，保证是当日收盘数据
+            snap = get_spot_snapshot(max_age=60)
+            if snap.empty:
+                log.warning("spot snapshot empty, batch skipped", extra={"trade_date": day})
+                return None
+            self.last_result = run_all_strategies(day, scheduled=True)
+            self.last_date = day
+            # 当日收盘写入价格面板，供之后交易日的技术筛选使用
+            try:
+                record_day(int(day), snap.df["ts_code"], snap.df["close"], snap.df["vol"])
+            except Exception as e:
+                log.warning("price panel update failed", extra={"trade_date": day, "error": str(e)})
+            return self.last_result
+        finally:
+            _release(day)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            now = datetime.now()
+            if not self.due(now):
+                continue
+            try:
+                self.run_once(now)
+            except Exception:
+                log.exception("scheduled run failed")
+                # 出错后等下一个检查周期重试
+                continue
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="strategy-batch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"at": f"{self.at // 100:02d}:{self.at % 100:02d}", "last_date": self.last_date, "last_result": self.last_result}
+
+
+strategy_scheduler = StrategyScheduler(at=get_settings().strategy_batch_at)
@@ -38,3 +38,50 @@ class StrategyCreateRequest(BaseModel):
     name: str
     dsl: StrategyDSL
 
+
+
+class BacktestRequest(BaseModel):
+    dsl: StrategyDSL
+    ts_codes: list[str] | None = None
+    start: str | None = None
+    end: str | None = None
+    adj: Literal["qfq", "none"] = "qfq"
+    max_trades: int = Field(500, ge=0, le=5000)
+
+
+class ParamRange(BaseModel):
+    """Inclusive numeric range; ``values`` wins when given."""
+
+    start: float | None = None
+    stop: float | None = None
+    step: float | None = None
+    values: list[float | None] | None = None
+
+    def count(self) -> int:
+        """Number of values ``expand`` yields, computed without building the list."""
+        if self.values is not None:
+            return len(self.values)
+        if self.start is None or self.stop is None or not self.step:
+            return 1
+        return max(1, int(round((self.stop - self.start) / self.step)) + 1)
+
+    def expand(self) -> list[float | None]:
+        if self.values is not None:
+            return list(self.values)
+        if self.start is None:
+            return [None]
+        return [round(self.start + i * (self.step or 0), 6) for i in range(self.count())]
+
+
+class GridSearchRequest(BaseModel):
+    dsl: StrategyDSL
+    takeProfitPct: ParamRange = Field(default_factory=lambda: ParamRange(start=5, stop=30, step=5))
+    stopLossPct: ParamRange = Field(default_factory=lambda: ParamRange(start=-3, stop=-15, step=-3))
+    maEntry: list[int] = Field(default_factory=lambda: [5])
+    maExit: list[int] = Field(default_factory=lambda: [10])
+    ts_codes: list[str] | None = None
+    start: str | None = None
+    end: str | None = None
+    adj: Literal["qfq", "none"] = "qfq"
+    rank_by: Literal["sharpe", "total_return_pct", "cagr_pct", "win_rate", "max_drawdown_pct"] = "sharpe"
+    top: int = Field(50, ge=1, le=1000)
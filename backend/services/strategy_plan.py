@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from backend.services.price_panel import get_price_panel, has_history, tech_mask
+from backend.services.profile_store import profile_store
+from backend.services.spot_snapshot import SpotSnapshot
+from backend.services.strategy_dsl import StrategyDSL, StrategyFilters
+from backend.services.trade_calendar import spot_session
+
+# 与 strategy_codegen 生成的 screen() 保持一致：按换手率降序取前 200
+SCREEN_SORT_COLUMN = "turnover_rate"
+SCREEN_TOP_K = 200
+
+
+@dataclass(frozen=True)
+class ScreenFrame:
+    """Spot table merged with industry/market once per (snapshot, profile) version, plus float columns."""
+
+    key: tuple[int, int]
+    df: pd.DataFrame = field(repr=False)
+    cols: dict[str, np.ndarray] = field(repr=False)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.cols[name]
+
+
+def build_screen_frame(snap: SpotSnapshot) -> ScreenFrame:
+    df = snap.df.merge(profile_store.frame(), on="ts_code", how="left")
+    df["industry"] = df["industry"].fillna("")
+    df["market"] = df["market"].fillna("")
+    cols = {c: df[c].to_numpy(dtype=float) for c in df.columns if df[c].dtype.kind == "f"}
+    return ScreenFrame((snap.version, profile_store.version), df, cols)
+
+
+_frame: ScreenFrame | None = None
+_frame_lock = threading.Lock()
+
+
+def get_screen_frame(snap: SpotSnapshot) -> ScreenFrame:
+    global _frame
+    key = (snap.version, profile_store.version)
+    f = _frame
+    if f is not None and f.key == key:
+        return f
+    with _frame_lock:
+        if _frame is None or _frame.key != key:
+            _frame = build_screen_frame(snap)
+        return _frame
+
+
+def approx_tech_mask(pct_chg: np.ndarray, turnover: np.ndarray, tech: str) -> np.ndarray:
+    """没有历史K线时的近似技术条件（分位数取自传入的候选集合）。"""
+    with np.errstate(invalid="ignore"):
+        if tech == "ma_up_5":
+            # 近似：当日涨幅为正且换手较高
+            med = np.nanmedian(turnover) if np.isfinite(turnover).any() else np.nan
+            return (pct_chg > 0) & (turnover >= med)
+        if tech == "break_20d":
+            # 近似：涨幅较强
+            q = np.nanquantile(pct_chg, 0.75) if np.isfinite(pct_chg).any() else np.nan
+            return pct_chg >= q
+        if tech == "rsi_oversold":
+            # 近似：跌后反弹（pct_chg 小幅为正但 close 偏低无法直接取；先用低涨幅）
+            return (pct_chg > 0) & (pct_chg < 2)
+    return np.ones(len(pct_chg), dtype=bool)
+
+
+def fill_without_history(keep: np.ndarray, hist: np.ndarray, pct_chg: np.ndarray, turnover: np.ndarray, tech: str) -> np.ndarray:
+    """Rows with no panel history (new listings, never synced) use approx_tech_mask over those rows instead of failing."""
+    miss = ~hist
+    if not miss.any():
+        return keep
+    keep = keep.copy()
+    keep[miss] = approx_tech_mask(pct_chg[miss], turnover[miss], tech)
+    return keep
+
+
+# 全市场技术条件掩码：面板（版本 + 日期范围）、快照版本、交易时段不变时复用
+_tech_cache: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+_tech_lock = threading.Lock()
+
+
+def _panel_tech_mask(frame: ScreenFrame, trade_date: int, tech: str) -> tuple[np.ndarray, np.ndarray]:
+    """(mask, has-history) for every row of ``frame``."""
+    panel = get_price_panel()
+    # 周末/节假日/开盘前的快照仍是上一交易日收盘，不能当作新的一天追加
+    session = spot_session(trade_date)
+    dates = (int(panel.dates[0]), panel.last_date, len(panel.dates)) if len(panel.dates) else ()
+    key = (panel.version, dates, frame.key, session, tech)
+    hit = _tech_cache.get(key)
+    if hit is None:
+        close = panel.history_matrix(frame.df["ts_code"], session, frame.column("close"))
+        hit = (tech_mask(close, tech), has_history(close))
+        with _tech_lock:
+            if len(_tech_cache) >= 16:
+                _tech_cache.clear()
+            _tech_cache[key] = hit
+    return hit
+
+
+def tech_rows(frame: ScreenFrame, rows: np.ndarray, trade_date: int, tech: str) -> np.ndarray:
+    """Subset of ``rows`` (positions in ``frame``) passing ``tech``; same rules as StrategyContext.apply_tech_filter."""
+    if not tech or not len(rows):
+        return rows
+    pct_chg, turnover = frame.column("pct_chg")[rows], frame.column("turnover_rate")[rows]
+    if not len(get_price_panel().codes):
+        return rows[approx_tech_mask(pct_chg, turnover, tech)]
+    mask, hist = _panel_tech_mask(frame, trade_date, tech)
+    return rows[fill_without_history(mask[rows], hist[rows], pct_chg, turnover, tech)]
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` largest values, descending, NaN last, ties in input order (partial selection)."""
+    key = np.where(np.isnan(values), -np.inf, values)
+    n = len(key)
+    if k < n:
+        part = np.argpartition(-key, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.lexsort((part, -key[part]))]
+
+
+def _predicate(frame: ScreenFrame, pred: tuple[str, str, float], out: np.ndarray) -> np.ndarray:
+    col, op, value = pred
+    if op == "le":
+        return np.less_equal(frame.column(col), value, out=out)
+    return np.greater_equal(frame.column(col), value, out=out)
+
+
+@dataclass(frozen=True)
+class ScreenPlan:
+    """Compiled StrategyDSL filters: column predicates fused into one mask, then tech filter and top-k."""
+
+    predicates: tuple[tuple[str, str, float], ...]
+    tech: str
+    sort_column: str = SCREEN_SORT_COLUMN
+    k: int = SCREEN_TOP_K
+
+    def mask(self, frame: ScreenFrame, shared: dict | None = None) -> np.ndarray:
+        """Fused predicate mask; ``shared`` memoizes single-predicate masks across plans on the same frame."""
+        n = len(frame.df)
+        m = np.ones(n, dtype=bool)
+        tmp = np.empty(n, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for pred in self.predicates:
+                if shared is not None:
+                    sub = shared.get(pred)
+                    if sub is None:
+                        sub = shared[pred] = _predicate(frame, pred, np.empty(n, dtype=bool))
+                    m &= sub
+                else:
+                    m &= _predicate(frame, pred, tmp)
+        return m
+
+    def select(self, frame: ScreenFrame, trade_date: int, limit: int | None = None, shared: dict | None = None) -> np.ndarray:
+        """Row positions of the result in ``frame``, already ranked."""
+        rows = np.flatnonzero(self.mask(frame, shared))
+        rows = tech_rows(frame, rows, trade_date, self.tech)
+        k = self.k if limit is None else min(self.k, limit)
+        return rows[top_k(frame.column(self.sort_column)[rows], k)]
+
+    def run(self, frame: ScreenFrame, trade_date: int, limit: int | None = None) -> pd.DataFrame:
+        return frame.df.iloc[self.select(frame, trade_date, limit)]
+
+
+@lru_cache(maxsize=256)
+def _compile(filters_json: str) -> ScreenPlan:
+    f = StrategyFilters.model_validate_json(filters_json)
+    preds: list[tuple[str, str, float]] = []
+    if f.peMax is not None:
+        preds.append(("pe", "le", float(f.peMax)))
+    if f.mcapMaxYi is not None:
+        preds.append(("mcap_yi", "le", float(f.mcapMaxYi)))
+    if f.turnMinPct is not None:
+        preds.append(("turnover_rate", "ge", float(f.turnMinPct)))
+    return ScreenPlan(tuple(preds), f.tech)
+
+
+def compile_dsl(dsl: StrategyDSL) -> ScreenPlan:
+    """StrategyDSL -> ScreenPlan; plans are cached by the canonical JSON of the filters."""
+    return _compile(dsl.filters.model_dump_json())
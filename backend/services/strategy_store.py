@@ -1,17 +1,24 @@
 from __future__ import annotations
 
-import time
+import base64
+import json
 import uuid
-from dataclasses import dataclass
+from datetime import datetime
 
-import akshare as ak
 import pandas as pd
-from sqlalchemy import select
+from sqlalchemy import and_, insert, or_, select
 
 from backend.db import SessionLocal
-from backend.models import Strategy, StrategyRun
+from backend.models import Strategy, StrategyRun, StrategyRunItem
+from backend.services.db_writer import db_writer
+from backend.services.profile_store import profile_store
+from backend.services.price_panel import get_price_panel, has_history, tech_mask
+from backend.services.responses import column
+from backend.services.spot_snapshot import SpotSnapshot, get_spot_snapshot
 from backend.services.strategy_codegen import generate_python_code
 from backend.services.strategy_dsl import StrategyCreateRequest, StrategyDSL
+from backend.services.strategy_plan import ScreenFrame, approx_tech_mask, compile_dsl, fill_without_history, get_screen_frame
+from backend.services.trade_calendar import spot_session
 
 
 def _uid(prefix: str) -> str:
@@ -31,66 +38,115 @@ def create_strategy(req: StrategyCreateRequest) -> dict:
     strategy_id = _uid("stg")
     dsl: StrategyDSL = req.dsl
     py = generate_python_code(req.name, dsl)
-    with SessionLocal() as db:
-        db.add(Strategy(id=strategy_id, name=req.name, dsl=dsl.model_dump(), python_code=py))
-        db.commit()
+    db_writer.write(lambda db: db.add(Strategy(id=strategy_id, name=req.name, dsl=dsl.model_dump(), python_code=py)))
     return {"id": strategy_id, "name": req.name, "dsl": dsl.model_dump(), "python_code": py}
 
 
 class StrategyContext:
-    def __init__(self, trade_date: str):
+    def __init__(self, trade_date: str, snapshot: SpotSnapshot | None = None):
         self.trade_date = trade_date
-        # AkShare 实时接口无需显式客户端
+        # 一次选股内 universe 与 daily_basic 读取同一版本的全市场快照
+        self.snapshot = snapshot or get_spot_snapshot()
 
     def universe(self) -> pd.DataFrame:
-        try:
-            df = ak.stock_zh_a_spot_em()
-        except Exception:
+        df = self.snapshot.df
+        if df.empty:
             return pd.DataFrame(columns=["ts_code", "name", "industry", "market"])
-        df = df.rename(columns={"代码": "code", "名称": "name"})
-        df["ts_code"] = df["code"].apply(lambda c: f"{c}.SH" if str(c).startswith("6") else f"{c}.SZ")
-        df["industry"] = ""
-        df["market"] = ""
-        return df[["ts_code", "name", "industry", "market"]]
+        # 行业/板块来自本地 stock_profiles 表
+        df = df[["ts_code", "name"]].merge(profile_store.frame(), on="ts_code", how="left")
+        df["industry"] = df["industry"].fillna("")
+        df["market"] = df["market"].fillna("")
+        return df
 
     def latest_daily_basic(self, universe: pd.DataFrame) -> pd.DataFrame:
-        """使用 AkShare 实时行情近似 daily_basic。"""
-        try:
-            spot = ak.stock_zh_a_spot_em()
-        except Exception:
-            spot = None
-        if spot is None or spot.empty:
+        """使用 AkShare 实时行情快照近似 daily_basic。"""
+        spot = self.snapshot.df
+        if spot.empty:
             return pd.DataFrame(columns=["ts_code", "pe", "total_mv", "turnover_rate", "close", "pct_chg", "mcap_yi"])
-        spot = spot.rename(
-            columns={
-                "代码": "code",
-                "名称": "name",
-                "最新价": "close",
-                "涨跌幅": "pct_chg",
-                "换手率": "turnover_rate",
-                "市盈率-动态": "pe",
-                "总市值": "total_mv",
-            }
-        )
-        spot["ts_code"] = spot["code"].apply(lambda c: f"{c}.SH" if str(c).startswith("6") else f"{c}.SZ")
-        out = spot.merge(universe[["ts_code", "name", "industry", "market"]], on="ts_code", how="left", suffixes=("", "_u"))
-        out["mcap_yi"] = out["total_mv"].astype(float) / 1e8
-        return out
+        return spot.merge(universe[["ts_code", "name", "industry", "market"]], on="ts_code", how="left", suffixes=("", "_u"))
+
+    def screen_frame(self) -> ScreenFrame:
+        """编译后的选股计划使用的列式数据（按快照版本复用）。"""
+        return get_screen_frame(self.snapshot)
 
     def apply_tech_filter(self, df: pd.DataFrame, tech: str) -> pd.DataFrame:
-        # Demo: 技术条件用简化近似（避免对全市场逐只拉K线，后续可加批量缓存/分层筛选）
-        if df.empty:
+        """技术条件：基于本地 symbols x dates 价格面板一次性向量化计算（不逐只拉K线）。
+
+        df 通常已经过 pe/市值/换手 等基本面条件筛选，这里只对幸存者取面板行。
+        """
+        if df.empty or not tech:
             return df
-        if tech == "ma_up_5":
-            # 近似：当日涨幅为正且换手较高
-            return df[(df["pct_chg"] > 0) & (df["turnover_rate"] >= df["turnover_rate"].median())]
-        if tech == "break_20d":
-            # 近似：涨幅较强
-            return df[df["pct_chg"] >= df["pct_chg"].quantile(0.75)]
-        if tech == "rsi_oversold":
-            # 近似：跌后反弹（pct_chg 小幅为正但 close 偏低无法直接取；先用低涨幅）
-            return df[(df["pct_chg"] > 0) & (df["pct_chg"] < 2)]
-        return df
+        panel = get_price_panel()
+        if not len(panel.codes):
+            # 本地还没有任何历史K线时退回到当日涨跌幅近似
+            return self._approx_tech_filter(df, tech)
+        close = panel.history_matrix(df["ts_code"], spot_session(self.trade_date), df["close"].astype(float).to_numpy())
+        pct_chg, turnover = df["pct_chg"].to_numpy(dtype=float), df["turnover_rate"].to_numpy(dtype=float)
+        return df[fill_without_history(tech_mask(close, tech), has_history(close), pct_chg, turnover, tech)]
+
+    def _approx_tech_filter(self, df: pd.DataFrame, tech: str) -> pd.DataFrame:
+        return df[approx_tech_mask(df["pct_chg"].to_numpy(dtype=float), df["turnover_rate"].to_numpy(dtype=float), tech)]
+
+
+# 运行结果逐行入库的字段（也是前端结果表用到的列）
+RUN_ITEM_FIELDS = ("ts_code", "name", "industry", "close", "pct_chg", "pe", "mcap_yi", "turnover_rate")
+
+
+def run_items(df: pd.DataFrame) -> list[dict]:
+    """选股结果 DataFrame -> 按名次排列的精简行（NaN 转 None）。"""
+    cols = [df[f].tolist() if f in df else [None] * len(df) for f in RUN_ITEM_FIELDS]
+    out = []
+    for rank, values in enumerate(zip(*cols), start=1):
+        row = {"rank": rank}
+        for f, v in zip(RUN_ITEM_FIELDS, values):
+            row[f] = None if isinstance(v, float) and v != v else v
+        out.append(row)
+    return out
+
+
+def save_runs(runs: list[tuple[str, dict, dict, list[dict]]]) -> list[str]:
+    """Write (strategy_id, params, summary, items) runs and their item rows in one transaction."""
+    now = datetime.utcnow()
+    run_rows: list[dict] = []
+    item_rows: list[dict] = []
+    for strategy_id, params, summary, items in runs:
+        run_id = _uid("run")
+        run_rows.append(
+            {
+                "id": run_id,
+                "strategy_id": strategy_id,
+                "params": params,
+                "result": summary,
+                "trade_date": summary.get("trade_date"),
+                "snapshot_version": summary.get("snapshot_version"),
+                "item_count": len(items),
+                "created_at": now,
+            }
+        )
+        item_rows.extend({"run_id": run_id, **it} for it in items)
+
+    def _insert(db) -> None:
+        if run_rows:
+            db.execute(insert(StrategyRun), run_rows)
+        if item_rows:
+            db.execute(insert(StrategyRunItem), item_rows)
+
+    db_writer.write(_insert)
+    return [r["id"] for r in run_rows]
+
+
+def run_columns(df: pd.DataFrame) -> dict:
+    """同 run_items，但按列返回（数值列直接序列化 NumPy 数组，不逐行建 dict）。"""
+    out: dict = {"rank": list(range(1, len(df) + 1))}
+    for f in RUN_ITEM_FIELDS:
+        out[f] = column(df[f].to_numpy()) if f in df else [None] * len(df)
+    return out
+
+
+def _screen(dsl: StrategyDSL, trade_date: str) -> tuple[StrategyContext, pd.DataFrame]:
+    # 编译后的计划：融合掩码 + 部分选择取前 N；生成的 Python 代码只作审计留档，不再 exec
+    ctx = StrategyContext(trade_date=trade_date)
+    return ctx, compile_dsl(dsl).run(ctx.screen_frame(), int(trade_date), limit=100)
 
 
 def run_strategy(strategy_id: str) -> dict:
@@ -99,71 +155,182 @@ def run_strategy(strategy_id: str) -> dict:
         if not stg:
             raise KeyError("not found")
 
-    from datetime import datetime
+    trade_date = datetime.now().strftime("%Y%m%d")
+    ctx, df = _screen(StrategyDSL.model_validate(stg.dsl), trade_date)
+    items = run_items(df)
+    summary = {"trade_date": trade_date, "snapshot_version": ctx.snapshot.version, "count": len(items)}
+    (run_id,) = save_runs([(strategy_id, {"trade_date": trade_date}, summary, items)])
+    return {"run_id": run_id, "result": {**summary, "items": items}}
+
 
+def run_dsl(dsl: StrategyDSL, columnar: bool = False) -> dict:
     trade_date = datetime.now().strftime("%Y%m%d")
+    ctx, df = _screen(dsl, trade_date)
+    items = run_columns(df) if columnar else run_items(df)
+    result = {"trade_date": trade_date, "snapshot_version": ctx.snapshot.version, "count": len(df), "items": items}
+    return {"result": result, "python_code": generate_python_code("(draft)", dsl)}
 
-    # Execute stored python code in controlled globals
-    ctx = StrategyContext(trade_date=trade_date)
-    g = {"__builtins__": {"__import__": __import__}}  # minimal; allow imports
-    l: dict = {}
-    exec(stg.python_code, g, l)
-    if "screen" not in l:
-        raise RuntimeError("strategy code missing screen()")
-    screen_fn = l["screen"]
-    df = screen_fn(ctx)
-    if not isinstance(df, pd.DataFrame):
-        raise RuntimeError("screen() must return DataFrame")
-
-    df = df.head(100)
-    items = df.fillna("").to_dict(orient="records")
-    result = {"trade_date": trade_date, "count": len(items), "items": items}
-
-    run_id = _uid("run")
-    with SessionLocal() as db:
-        db.add(
-            StrategyRun(
-                id=run_id,
-                strategy_id=strategy_id,
-                params={"trade_date": trade_date},
-                result=result,
-            )
-        )
-        db.commit()
-    return {"run_id": run_id, "result": result}
 
+_RUN_SUMMARY = (
+    StrategyRun.id,
+    StrategyRun.strategy_id,
+    StrategyRun.params,
+    StrategyRun.trade_date,
+    StrategyRun.snapshot_version,
+    StrategyRun.item_count,
+    StrategyRun.created_at,
+)
 
-def run_dsl(dsl: StrategyDSL) -> dict:
-    from datetime import datetime
 
-    trade_date = datetime.now().strftime("%Y%m%d")
+def _run_summary(r) -> dict:
+    return {
+        "id": r.id,
+        "strategy_id": r.strategy_id,
+        "params": r.params,
+        "trade_date": r.trade_date,
+        "snapshot_version": r.snapshot_version,
+        "count": r.item_count,
+        "created_at": r.created_at.isoformat(),
+    }
+
+
+def _encode_cursor(created_at: datetime, run_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), run_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of ``_encode_cursor``; ValueError for anything the API didn't hand out."""
+    try:
+        ts, run_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(ts), str(run_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def strategy_runs(strategy_id: str, limit: int, cursor: str | None = None) -> dict:
+    """运行历史（只含摘要），按时间倒序；cursor 为上一页返回的 next_cursor（不透明字符串）。"""
+    limit = max(1, min(100, limit))
+    q = (
+        select(*_RUN_SUMMARY)
+        .where(StrategyRun.strategy_id == strategy_id)
+        .order_by(StrategyRun.created_at.desc(), StrategyRun.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        at, run_id = _decode_cursor(cursor)
+        q = q.where(or_(StrategyRun.created_at < at, and_(StrategyRun.created_at == at, StrategyRun.id < run_id)))
+    with SessionLocal() as db:
+        rows = db.execute(q).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if more else None
+    return {"items": [_run_summary(r) for r in rows], "next_cursor": next_cursor}
 
-    py = generate_python_code("(draft)", dsl)
-    ctx = StrategyContext(trade_date=trade_date)
-    g = {"__builtins__": {"__import__": __import__}}
-    l: dict = {}
-    exec(py, g, l)
-    screen_fn = l["screen"]
-    df = screen_fn(ctx)
-    df = df.head(100)
-    items = df.fillna("").to_dict(orient="records")
-    return {"result": {"trade_date": trade_date, "count": len(items), "items": items}, "python_code": py}
 
+def _item_dict(r: StrategyRunItem) -> dict:
+    return {"rank": r.rank, **{f: getattr(r, f) for f in RUN_ITEM_FIELDS}}
 
-def strategy_runs(strategy_id: str, limit: int) -> list[dict]:
+
+def run_item_page(run_id: str, cursor: int = 0, limit: int = 50) -> dict:
+    """某次运行的入选股票，按名次分页；cursor 为上一页最后的名次。"""
+    limit = max(1, min(200, limit))
     with SessionLocal() as db:
         rows = (
             db.execute(
-                select(StrategyRun)
-                .where(StrategyRun.strategy_id == strategy_id)
-                .order_by(StrategyRun.created_at.desc())
-                .limit(max(1, min(100, limit)))
+                select(StrategyRunItem)
+                .where(StrategyRunItem.run_id == run_id, StrategyRunItem.rank > cursor)
+                .order_by(StrategyRunItem.rank)
+                .limit(limit + 1)
             )
             .scalars()
             .all()
         )
-        return [
-            {"id": r.id, "strategy_id": r.strategy_id, "params": r.params, "result": r.result, "created_at": r.created_at.isoformat()}
-            for r in rows
-        ]
+        items = [_item_dict(r) for r in rows[:limit]]
+    return {"run_id": run_id, "items": items, "next_cursor": items[-1]["rank"] if len(rows) > limit else None}
+
+
+def latest_strategy_run(strategy_id: str) -> dict | None:
+    """最近一次运行结果（通常是收盘后批量预计算的那次）。"""
+    with SessionLocal() as db:
+        r = db.execute(
+            select(*_RUN_SUMMARY)
+            .where(StrategyRun.strategy_id == strategy_id)
+            .order_by(StrategyRun.created_at.desc(), StrategyRun.id.desc())
+            .limit(1)
+        ).one_or_none()
+    if r is None:
+        return None
+    run = _run_summary(r)
+    items = run_item_page(r.id, limit=200)["items"]
+    # items 只是前 200 名；count 是这次运行的入选总数
+    count = r.item_count if r.item_count is not None else len(items)
+    run["result"] = {"trade_date": r.trade_date, "snapshot_version": r.snapshot_version, "count": count, "items": items}
+    return run
+
+
+def diff_runs(run_id: str, base_run_id: str | None = None) -> dict:
+    """两次运行的差异：新进入 / 被移出 / 名次变化。base 默认是同一策略的上一次运行。"""
+    with SessionLocal() as db:
+        run = db.execute(select(*_RUN_SUMMARY).where(StrategyRun.id == run_id)).one_or_none()
+        if run is None:
+            raise KeyError(run_id)
+        if base_run_id is None:
+            base = db.execute(
+                select(*_RUN_SUMMARY)
+                .where(
+                    StrategyRun.strategy_id == run.strategy_id,
+                    or_(StrategyRun.created_at < run.created_at, and_(StrategyRun.created_at == run.created_at, StrategyRun.id < run.id)),
+                )
+                .order_by(StrategyRun.created_at.desc(), StrategyRun.id.desc())
+                .limit(1)
+            ).one_or_none()
+        else:
+            base = db.execute(select(*_RUN_SUMMARY).where(StrategyRun.id == base_run_id)).one_or_none()
+            if base is None:
+                raise KeyError(base_run_id)
+        cols = (StrategyRunItem.ts_code, StrategyRunItem.name, StrategyRunItem.rank)
+        now = {r.ts_code: r for r in db.execute(select(*cols).where(StrategyRunItem.run_id == run_id)).all()}
+        before = {} if base is None else {r.ts_code: r for r in db.execute(select(*cols).where(StrategyRunItem.run_id == base.id)).all()}
+    entered = [{"ts_code": c, "name": r.name, "rank": r.rank} for c, r in now.items() if c not in before]
+    exited = [{"ts_code": c, "name": r.name, "prev_rank": r.rank} for c, r in before.items() if c not in now]
+    moved = [
+        {"ts_code": c, "name": r.name, "rank": r.rank, "prev_rank": before[c].rank}
+        for c, r in now.items()
+        if c in before and before[c].rank != r.rank
+    ]
+    return {
+        "run": _run_summary(run),
+        "base": _run_summary(base) if base is not None else None,
+        "entered": sorted(entered, key=lambda x: x["rank"]),
+        "exited": sorted(exited, key=lambda x: x["prev_rank"]),
+        "moved": sorted(moved, key=lambda x: x["rank"]),
+        "kept": sum(1 for c in now if c in before),
+    }
+
+
+def normalize_legacy_runs(batch_size: int = 200) -> int:
+    """把旧版整块 JSON 里的 items 拆到 strategy_run_items，并补齐摘要列；返回处理的运行数（经写线程提交）。"""
+
+    def _batch(db) -> int:
+        runs = db.execute(select(StrategyRun).where(StrategyRun.item_count.is_(None)).limit(batch_size)).scalars().all()
+        item_rows: list[dict] = []
+        for r in runs:
+            result = dict(r.result or {})
+            items = run_items(pd.DataFrame(result.pop("items", None) or [], columns=list(RUN_ITEM_FIELDS)))
+            item_rows.extend({"run_id": r.id, **it} for it in items)
+            result["count"] = len(items)
+            r.result = result
+            r.trade_date = result.get("trade_date") or (r.params or {}).get("trade_date")
+            r.snapshot_version = result.get("snapshot_version")
+            r.item_count = len(items)
+        if item_rows:
+            db.execute(insert(StrategyRunItem), item_rows)
+        return len(runs)
 
+    done = 0
+    while True:
+        n = db_writer.write(_batch)
+        if not n:
+            return done
+        done += n
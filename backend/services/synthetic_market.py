@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import threading
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+# 板块代码前缀与占比（大致贴近 A 股结构）
+BOARDS = [
+    ("600", 0.16), ("601", 0.07), ("603", 0.12), ("605", 0.02),
+    ("000", 0.09), ("001", 0.02), ("002", 0.19), ("300", 0.19), ("301", 0.04),
+    ("688", 0.10),
+]
+INDUSTRIES = [
+    "银行", "证券", "保险", "白酒", "食品饮料", "医药生物", "医疗器械", "半导体", "电子元件", "消费电子",
+    "计算机设备", "软件开发", "通信设备", "光伏设备", "电池", "电网设备", "汽车整车", "汽车零部件", "化学制品", "钢铁",
+    "有色金属", "煤炭", "石油石化", "房地产", "建筑装饰", "工程机械", "家电", "纺织服装", "农牧饲渔", "交通运输",
+]
+_NAME_HEADS = list("华中海天东南北新金长安盛恒宏泰鑫瑞通达远大兴永信诚德方正光明")
+_NAME_TAILS = ["科技", "股份", "电子", "药业", "控股", "集团", "智能", "材料", "能源", "电气", "实业", "精工", "传媒", "生物"]
+INDEX_SPOT = [
+    ("sh000001", "上证指数", 3300.0, ("6",)),
+    ("sz399001", "深证成指", 10500.0, ("0", "3")),
+    ("sz399006", "创业板指", 2150.0, ("30",)),
+    ("sh000688", "科创50", 980.0, ("688",)),
+    ("sh000300", "沪深300", 3900.0, ("6", "0", "3")),
+]
+ORIGIN = date(2010, 1, 4)
+MEAN_REVERSION = 0.998
+
+
+def _limit(code: str, st: bool) -> float:
+    if code.startswith(("688", "30")):
+        return 0.20
+    return 0.05 if st else 0.10
+
+
+class SyntheticMarket:
+    """Deterministic stand-in for the AkShare tables the app reads.
+
+    A seeded universe of ``n`` symbols across the main/ChiNext/STAR boards
+    with names, industries, share counts and earnings. Daily closes follow a
+    one-factor model (market return × beta + fat-tailed idiosyncratic noise)
+    clipped to each board's price limit, generated from ``ORIGIN`` so any date
+    range of the same symbol is consistent. The spot table is today's bar plus
+    a small per-call intraday drift, so successive snapshots differ.
+    """
+
+    def __init__(self, n: int = 5000, seed: int = 20240101):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        codes: list[str] = []
+        for prefix, share in BOARDS:
+            k = min(1000, int(round(share * n)))
+            codes += [f"{prefix}{i:03d}" for i in sorted(rng.choice(1000, k, replace=False))]
+        codes = codes[:n]
+        self.n = len(codes)
+        self.codes = codes
+        self.index = {c: i for i, c in enumerate(codes)}
+        st = rng.random(self.n) < 0.02
+        self.names = [
+            ("ST" if st[i] else "") + rng.choice(_NAME_HEADS) + rng.choice(_NAME_HEADS) + rng.choice(_NAME_TAILS)
+            for i in range(self.n)
+        ]
+        self.industry = rng.integers(0, len(INDUSTRIES), self.n)
+        self.limit = np.array([_limit(c, s) for c, s in zip(codes, st)])
+        self.base_price = np.exp(rng.normal(np.log(12.0), 0.7, self.n))
+        self.beta = rng.uniform(0.6, 1.4, self.n)
+        self.sigma = rng.uniform(0.012, 0.035, self.n)
+        self.total_shares = np.exp(rng.normal(np.log(8e8), 1.1, self.n))
+        self.float_ratio = rng.uniform(0.3, 1.0, self.n)
+        self.turnover = np.exp(rng.normal(np.log(0.015), 0.7, self.n))
+        self.eps = rng.normal(0.5, 0.8, self.n)
+        first = rng.integers(0, 3000, self.n)
+        first[rng.random(self.n) < 0.6] = 0  # 大部分股票在 ORIGIN 前已上市
+        self.first_day = first
+        self.days = pd.DatetimeIndex([])
+        self._days_through: date | None = None
+        self._day_ints = np.zeros(0, dtype=np.int64)
+        self._day_labels = pd.Index([], dtype=object)
+        self._market: np.ndarray = np.zeros(0)
+        self._closes: dict[int, tuple[int, tuple[np.ndarray, np.ndarray]]] = {}
+        self._spot_base: tuple[int, np.ndarray, np.ndarray] | None = None
+        self._spot_calls = 0
+        self._lock = threading.Lock()
+
+    # ---- calendar / series ----
+
+    def calendar(self, end: date) -> pd.DatetimeIndex:
+        """Business days from ORIGIN through ``end`` (holidays are not modelled)."""
+        # 记录日历覆盖到哪天（而不是最后一个工作日），周末调用时不会每次都重建
+        if self._days_through is None or self._days_through < end:
+            through = max(end, date.today())
+            days = pd.bdate_range(ORIGIN, through)
+            # 整数 YYYYMMDD 与字符串标签只算一次，hist 按整数比较切片
+            ints = (days.year * 10000 + days.month * 100 + days.day).to_numpy(np.int64)
+            labels = days.strftime("%Y-%m-%d")
+            with self._lock:
+                if self._days_through is None or self._days_through < through:
+                    self.days, self._day_ints, self._day_labels, self._days_through = days, ints, labels, through
+        days, ints = self.days, self._day_ints
+        return days[: int(np.searchsorted(ints, end.year * 10000 + end.month * 100 + end.day, side="right"))]
+
+    def _market_returns(self, n: int) -> np.ndarray:
+        if len(self._market) < n:
+            rng = np.random.default_rng([self.seed, 0])
+            self._market = rng.standard_t(4, size=n) * 0.009 + 0.0002
+        return self._market[:n]
+
+    def series(self, i: int, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """(open, close) for symbol ``i`` over the first ``n`` calendar days."""
+        cached = self._closes.get(i)
+        if cached is not None and cached[0] >= n:
+            o, c = cached[1]
+            return o[:n], c[:n]
+        rng = np.random.default_rng([self.seed, 1, i])
+        idio = rng.standard_t(3, size=n) * self.sigma[i] / np.sqrt(3.0)
+        gap = rng.normal(0, 0.004, size=n)
+        r = np.clip(self.beta[i] * self._market_returns(n) + idio, -self.limit[i], self.limit[i])
+        # 对数价格做均值回复（AR(1)），否则十几年随机游走后价格分布过宽；回复后再按涨跌停截一次
+        decay = MEAN_REVERSION ** np.arange(n)
+        x = decay * np.cumsum(np.log1p(r) / decay)
+        r = np.clip(np.expm1(np.diff(x, prepend=0.0)), -self.limit[i], self.limit[i])
+        close = self.base_price[i] * np.exp(np.cumsum(np.log1p(r)))
+        prev = np.concatenate(([self.base_price[i]], close[:-1]))
+        open_ = np.clip(prev * (1 + gap), prev * (1 - self.limit[i]), prev * (1 + self.limit[i]))
+        with self._lock:
+            if len(self._closes) > 512:
+                self._closes.clear()
+            self._closes[i] = (n, (open_, close))
+        return open_, close
+
+    # ---- AkShare-shaped tables ----
+
+    def hist(self, symbol: str, start_date: str, end_date: str, **_ignored) -> pd.DataFrame:
+        """``stock_zh_a_hist`` columns (日期/开盘/收盘/最高/最低/成交量/成交额/...)."""
+        i = self.index.get(str(symbol))
+        cols = ["日期", "股票代码", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
+        end = min(datetime.strptime(str(end_date), "%Y%m%d").date(), date.today())
+        n = len(self.calendar(end))
+        if i is None or not n:
+            return pd.DataFrame(columns=cols)
+        open_, close = self.series(i, n)
+        prev = np.concatenate(([self.base_price[i]], close[:-1]))
+        rng = np.random.default_rng([self.seed, 2, i])
+        wick = np.abs(rng.normal(0, 0.6, size=(2, n))) * self.sigma[i]
+        turn = self.turnover[i] * np.exp(rng.normal(0, 0.4, n))
+        # 随机数按全历史生成（结果与请求区间无关），之后只对区间内的行做计算
+        lo = max(int(self.first_day[i]), int(np.searchsorted(self._day_ints[:n], int(start_date), side="left")))
+        open_, close, prev, turn = open_[lo:], close[lo:n], prev[lo:], turn[lo:]
+        wick = wick[:, lo:]
+        high = np.minimum(np.maximum(open_, close) * (1 + wick[0]), prev * (1 + self.limit[i]))
+        low = np.maximum(np.minimum(open_, close) * (1 - wick[1]), prev * (1 - self.limit[i]))
+        vol = np.round(self.total_shares[i] * self.float_ratio[i] * turn / 100)
+        return pd.DataFrame(
+            {
+                "日期": self._day_labels[lo:n],
+                "股票代码": symbol,
+                "开盘": np.round(open_, 2),
+                "收盘": np.round(close, 2),
+                "最高": np.round(high, 2),
+                "最低": np.round(low, 2),
+                "成交量": vol,
+                "成交额": np.round(vol * 100 * (open_ + close) / 2, 0),
+                "振幅": np.round((high - low) / prev * 100, 2),
+                "涨跌幅": np.round((close / prev - 1) * 100, 2),
+                "涨跌额": np.round(close - prev, 2),
+                "换手率": np.round(turn * 100, 2),
+            }
+        )
+
+    def spot(self) -> pd.DataFrame:
+        """``stock_zh_a_spot_em`` for today: last bar of every series plus per-call intraday drift."""
+        cal = self.calendar(date.today())
+        n = len(cal)
+        with self._lock:
+            self._spot_calls += 1
+            call = self._spot_calls
+        base = self._spot_base
+        if base is None or base[0] != n:
+            # 每个交易日只算一次全部股票的最后两根收盘价
+            last = np.empty(self.n)
+            prev = np.empty(self.n)
+            for i in range(self.n):
+                _, c = self.series(i, n)
+                last[i], prev[i] = c[-1], c[-2] if n > 1 else self.base_price[i]
+            base = self._spot_base = (n, last, prev)
+        _, last, prev = base
+        drift = np.random.default_rng([self.seed, 3, call]).normal(0, 0.001, self.n)
+        lo, hi = prev * (1 - self.limit), prev * (1 + self.limit)
+        price = np.round(np.clip(last * (1 + drift), lo, hi), 2)
+        pct = np.round((price / prev - 1) * 100, 2)
+        turn = self.turnover * 100
+        float_shares = self.total_shares * self.float_ratio
+        vol = np.round(float_shares * self.turnover / 100)
+        pe = np.where(np.abs(self.eps) > 1e-3, price / self.eps, np.nan)
+        return pd.DataFrame(
+            {
+                "序号": np.arange(1, self.n + 1),
+                "代码": self.codes,
+                "名称": self.names,
+                "最新价": price,
+                "涨跌幅": pct,
+                "涨跌额": np.round(price - prev, 2),
+                "成交量": vol,
+                "成交额": np.round(vol * 100 * price, 0),
+                "振幅": np.round(np.abs(pct) * 1.5, 2),
+                "最高": np.round(np.minimum(np.maximum(price, prev) * 1.005, hi), 2),
+                "最低": np.round(np.maximum(np.minimum(price, prev) * 0.995, lo), 2),
+                "今开": np.round(prev, 2),
+                "昨收": np.round(prev, 2),
+                "量比": 1.0,
+                "换手率": np.round(turn, 2),
+                "市盈率-动态": np.round(pe, 2),
+                "市净率": np.round(np.abs(pe) / 8, 2),
+                "总市值": np.round(price * self.total_shares, 0),
+                "流通市值": np.round(price * float_shares, 0),
+            }
+        )
+
+    def index_spot(self, **_ignored) -> pd.DataFrame:
+        """``stock_zh_index_spot_em``: cap-weighted moves of each index's boards."""
+        spot = self.spot()
+        codes = spot["代码"].to_numpy().astype(str)
+        rows = []
+        for code, name, base, prefixes in INDEX_SPOT:
+            m = np.char.startswith(codes, prefixes[0])
+            for p in prefixes[1:]:
+                m |= np.char.startswith(codes, p)
+            w = spot["总市值"].to_numpy()[m]
+            pct = float(np.average(spot["涨跌幅"].to_numpy()[m], weights=w)) if m.any() else 0.0
+            rows.append(
+                {
+                    "代码": code,
+                    "名称": name,
+                    "最新价": round(base * (1 + pct / 100), 2),
+                    "涨跌幅": round(pct, 2),
+                    "成交量": float(spot["成交量"].to_numpy()[m].sum()),
+                    "成交额": float(spot["成交额"].to_numpy()[m].sum()),
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def trade_dates(self, **_ignored) -> pd.DataFrame:
+        """``tool_trade_date_hist_sina``: the business-day calendar through the end of this year."""
+        days = pd.bdate_range(ORIGIN, date(date.today().year, 12, 31))
+        return pd.DataFrame({"trade_date": days.date})
+
+    def info(self, symbol: str) -> pd.DataFrame:
+        """``stock_individual_info_em`` item/value table."""
+        i = self.index.get(str(symbol))
+        if i is None:
+            return pd.DataFrame(columns=["item", "value"])
+        cal = self.calendar(date.today())
+        listed = cal[min(int(self.first_day[i]), len(cal) - 1)] if self.first_day[i] else pd.Timestamp(2000 + i % 10, 1 + i % 12, 10)
+        price = float(self.series(i, len(cal))[1][-1])
+        items = {
+            "股票代码": symbol,
+            "股票简称": self.names[i],
+            "总股本": float(self.total_shares[i]),
+            "流通股": float(self.total_shares[i] * self.float_ratio[i]),
+            "总市值": price * float(self.total_shares[i]),
+            "流通市值": price * float(self.total_shares[i] * self.float_ratio[i]),
+            "行业": INDUSTRIES[int(self.industry[i])],
+            "上市时间": int(listed.strftime("%Y%m%d")),
+        }
+        return pd.DataFrame({"item": list(items), "value": list(items.values())})
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend.services import upstream
+
+log = logging.getLogger(__name__)
+
+
+# 交易日历一年只变一次（年底公布次年安排），按天缓存足够
+CALENDAR_TTL = 86400
+# 集合竞价开始前，行情快照仍是上一交易日的收盘
+SESSION_OPEN_HHMM = 915
+
+
+def _day_int(day: int | str | date) -> int:
+    if isinstance(day, (date, datetime)):
+        return day.year * 10000 + day.month * 100 + day.day
+    return int(str(day).replace("-", "")[:8])
+
+
+def _load_days() -> list[int]:
+    df = upstream.call("tool_trade_date_hist_sina")
+    return sorted(pd.to_datetime(df["trade_date"]).dt.strftime("%Y%m%d").astype(int).tolist())
+
+
+def trading_days() -> np.ndarray:
+    """Ascending YYYYMMDD ints of SSE trading days (history plus the published rest of the year)."""
+    days = upstream.cached_call("akshare:trade_calendar:v1", _load_days, ttl_seconds=CALENDAR_TTL, refresh_ahead=3600)
+    return np.asarray(days, dtype=np.int64)
+
+
+def _days_or_empty() -> np.ndarray:
+    try:
+        return trading_days()
+    except Exception as e:
+        log.warning("trade calendar unavailable", extra={"error": str(e)})
+        return np.zeros(0, dtype=np.int64)
+
+
+def _is_session(d: int, days: np.ndarray) -> bool:
+    if not len(days) or d > days[-1]:
+        return date(d // 10000, d // 100 % 100, d % 100).weekday() < 5
+    i = int(np.searchsorted(days, d))
+    return i < len(days) and days[i] == d
+
+
+def is_trading_day(day: int | str | date) -> bool:
+    """True on exchange trading days; weekdays when the calendar is unavailable or doesn't reach ``day``."""
+    return _is_session(_day_int(day), _days_or_empty())
+
+
+def sessions_between(after: int | str | date, through: int | str | date) -> list[int]:
+    """Trading days ``d`` with ``after < d <= through``, ascending."""
+    a, b = _day_int(after), _day_int(through)
+    days = _days_or_empty()
+    out = []
+    cur = date(a // 10000, a // 100 % 100, a % 100) + timedelta(days=1)
+    while _day_int(cur) <= b:
+        if _is_session(_day_int(cur), days):
+            out.append(_day_int(cur))
+        cur += timedelta(days=1)
+    return out
+
+
+def last_trading_day(day: int | str | date) -> int:
+    """Latest trading day on or before ``day``."""
+    d = _day_int(day)
+    days = _days_or_empty()
+    if len(days) and days[0] <= d <= days[-1]:
+        return int(days[np.searchsorted(days, d, side="right") - 1])
+    # 日历不可用或不覆盖：按工作日回退
+    cur = date(d // 10000, d // 100 % 100, d % 100)
+    while cur.weekday() >= 5:
+        cur -= timedelta(days=1)
+    return _day_int(cur)
+
+
+def spot_session(day: int | str | date, now: datetime | None = None) -> int:
+    """Session whose prices a spot snapshot taken on ``day`` shows.
+
+    Weekends and holidays show the last session's close; so does today before
+    the open.
+    """
+    d = _day_int(day)
+    now = now or datetime.now()
+    if d == _day_int(now) and now.hour * 100 + now.minute < SESSION_OPEN_HHMM:
+        d = _day_int(now.date() - timedelta(days=1))
+    return last_trading_day(d)
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Hashable
+
+from backend.services.cache import cache_peek, cache_set
+from backend.services.executors import upstream_executor
+from backend.services.metrics import registry, upstream_calls, upstream_latency, upstream_rows
+from backend.services.providers import get_provider
+from backend.settings import get_settings
+
+log = logging.getLogger(__name__)
+
+
+# 各上游接口的超时（秒）；未列出的使用 UPSTREAM_TIMEOUT_SECONDS
+UPSTREAM_TIMEOUTS = {
+    "stock_zh_a_spot_em": 20.0,
+    "stock_zh_a_hist": 15.0,
+    "stock_zh_index_spot_em": 8.0,
+    "stock_individual_info_em": 8.0,
+    "tool_trade_date_hist_sina": 8.0,
+}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised when an upstream call times out, its circuit breaker is open or too many of its calls are hung."""
+
+
+def is_transport_error(e: BaseException) -> bool:
+    """Network/timeout failures (requests' exceptions are ``OSError`` subclasses).
+
+    Data errors (KeyError/ValueError from AkShare parsing a bad symbol, a
+    missing fixture) say nothing about the provider's health.
+    """
+    return isinstance(e, (OSError, TimeoutError, UpstreamUnavailable))
+
+
+class CircuitBreaker:
+    """Per-function breaker (keyed by AkShare function name).
+
+    Opens after ``threshold`` consecutive transport failures and probes again
+    after ``reset_after``.
+    """
+
+    def __init__(self, name: str, threshold: int, reset_after: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.time() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_after:
+                # 半开：放行一次探测，失败则重新计时
+                self.opened_at = time.time()
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    log.warning("circuit open", extra={"func": self.name, "failures": self.failures})
+                self.opened_at = time.time()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller runs ``fn``; callers arriving while it is in flight block
+    and receive the same result (or re-raise the same exception). Results are
+    shared objects, so callers must not mutate them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+
+_settings = get_settings()
+_flight = SingleFlight()
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+# 超时后仍在上游线程里运行的调用数（fut.cancel() 停不掉已开始的请求）
+_stuck: dict[str, int] = {}
+_stuck_lock = threading.Lock()
+
+
+def _release_stuck(func_name: str) -> None:
+    with _stuck_lock:
+        _stuck[func_name] -= 1
+
+
+def breaker(func_name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        b = _breakers.get(func_name)
+        if b is None:
+            b = _breakers[func_name] = CircuitBreaker(
+                func_name, _settings.upstream_breaker_threshold, _settings.upstream_breaker_reset_seconds
+            )
+        return b
+
+
+# 提前刷新（stale-while-revalidate）用的后台线程
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+def call(func_name: str, **kwargs: Any) -> Any:
+    """Call ``<provider>.fetch(func_name, **kwargs)`` on the upstream executor with a deadline.
+
+    The provider is live AkShare by default; MARKET_PROVIDER switches to
+    record/replay fixtures or the synthetic market.
+
+    Identical concurrent calls share one in-flight request. Raises
+    ``UpstreamUnavailable`` on timeout, while the function's breaker is open,
+    or while ``UPSTREAM_MAX_STUCK`` of its timed-out calls still occupy
+    upstream threads (so one hung endpoint can't take the whole pool);
+    callers fall back to cached/mock data as before.
+    """
+    key = ("ak", func_name, tuple(sorted(kwargs.items())))
+    return _flight.do(key, lambda: _guarded(func_name, kwargs))
+
+
+def _guarded(func_name: str, kwargs: dict) -> Any:
+    b = breaker(func_name)
+    if not b.allow():
+        upstream_calls.inc(func=func_name, outcome="circuit_open")
+        raise UpstreamUnavailable(f"{func_name} circuit open")
+    with _stuck_lock:
+        stuck = _stuck.get(func_name, 0)
+    if stuck >= _settings.upstream_max_stuck:
+        upstream_calls.inc(func=func_name, outcome="saturated")
+        raise UpstreamUnavailable(f"{func_name} has {stuck} hung calls")
+    timeout = UPSTREAM_TIMEOUTS.get(func_name, _settings.upstream_timeout_seconds)
+    t0 = time.perf_counter()
+    fut = upstream_executor.submit(get_provider().fetch, func_name, **kwargs)
+    try:
+        result = fut.result(timeout=timeout)
+    except FutureTimeout:
+        if not fut.cancel():
+            # 已在运行：记为占用，直到它真正结束
+            with _stuck_lock:
+                _stuck[func_name] = _stuck.get(func_name, 0) + 1
+            fut.add_done_callback(lambda f: _release_stuck(func_name))
+        b.failure()
+        upstream_calls.inc(func=func_name, outcome="timeout")
+        upstream_latency.observe(time.perf_counter() - t0, func=func_name)
+        raise UpstreamUnavailable(f"{func_name} timed out after {timeout}s") from None
+    except Exception as e:
+        # 数据错误（如代码不存在）说明上游有应答，不计入熔断
+        if is_transport_error(e):
+            b.failure()
+        else:
+            b.success()
+        upstream_calls.inc(func=func_name, outcome="error")
+        upstream_latency.observe(time.perf_counter() - t0, func=func_name)
+        raise
+    b.success()
+    upstream_calls.inc(func=func_name, outcome="ok")
+    upstream_latency.observe(time.perf_counter() - t0, func=func_name)
+    if hasattr(result, "__len__"):
+        upstream_rows.observe(len(result), func=func_name)
+    return result
+
+
+def cached_call(key: str, loader: Callable[[], Any], ttl_seconds: int, refresh_ahead: float = 0.0) -> Any:
+    """Read-through cache with single-flight loading.
+
+    On a miss one caller runs ``loader`` and stores its result; concurrent
+    callers wait for it. When a hit is within ``refresh_ahead`` seconds of
+    expiry the cached value is returned immediately and one background refresh
+    is started, so the entry normally never expires under load.
+    """
+    hit = cache_peek(key)
+    if hit is not None:
+        payload, expires_at = hit
+        if refresh_ahead > 0 and expires_at - time.time() <= refresh_ahead and not _flight.in_flight(("cache", key)):
+            _refresher.submit(_refresh, key, loader, ttl_seconds)
+        return payload
+    return _flight.do(("cache", key), lambda: _load_and_store(key, loader, ttl_seconds))
+
+
+def _load_and_store(key: str, loader: Callable[[], Any], ttl_seconds: int) -> Any:
+    payload = loader()
+    cache_set(key, payload, ttl_seconds=ttl_seconds)
+    return payload
+
+
+def _refresh(key: str, loader: Callable[[], Any], ttl_seconds: int) -> None:
+    try:
+        _flight.do(("cache", key), lambda: _load_and_store(key, loader, ttl_seconds))
+    except Exception as e:
+        log.warning("background refresh failed", extra={"key": key, "error": str(e)})
+
+
+_STATE_VALUE = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _breaker_samples():
+    with _breakers_lock:
+        items = list(_breakers.items())
+    for name, b in items:
+        yield {"func": name}, _STATE_VALUE[b.state]
+
+
+registry.collect("stockanalysis_upstream_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open).", "gauge", _breaker_samples)
+registry.collect(
+    "stockanalysis_upstream_stuck_calls",
+    "Timed-out upstream calls still occupying an upstream thread.",
+    "gauge",
+    lambda: [({"func": name}, n) for name, n in list(_stuck.items())],
+)
+registry.collect(
+    "stockanalysis_upstream_coalesced_total", "Calls answered by an identical in-flight request.", "counter", lambda: [({}, _flight.coalesced)]
+)
+
+
+def upstream_stats() -> dict:
+    with _breakers_lock:
+        breakers = {name: {"state": b.state, "failures": b.failures} for name, b in _breakers.items()}
+    with _stuck_lock:
+        stuck = {name: n for name, n in _stuck.items() if n}
+    return {"coalesced": _flight.coalesced, "breakers": breakers, "stuck": stuck, "provider": get_provider().stats()}
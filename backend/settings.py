@@ -14,6 +14,41 @@ class Settings:
     tushare_token: str | None
     db_url: str
     cache_default_ttl_seconds: int
+    bar_store_dir: str
+    spot_max_age_seconds: int
+    spot_refresh_interval_seconds: int
+    cache_memory_max_bytes: int
+    cache_memory_max_ttl_seconds: int
+    cache_db_max_bytes: int
+    cache_sweep_interval_seconds: int
+    cache_vacuum_interval_seconds: int
+    cache_sweep_batch: int
+    upstream_workers: int
+    io_workers: int
+    analytics_workers: int
+    upstream_timeout_seconds: float
+    upstream_breaker_threshold: int
+    upstream_breaker_reset_seconds: float
+    upstream_max_stuck: int
+    profile_max_age_days: float
+    profile_fetch_rate: float
+    market_stream_interval_seconds: float
+    strategy_batch_at: str
+    backtest_workers: int
+    db_read_pool: int
+    db_busy_timeout_ms: int
+    db_cache_mb: int
+    db_mmap_mb: int
+    db_write_batch: int
+    db_write_delay_ms: float
+    market_provider: str
+    fixture_dir: str
+    provider_latency_ms: float
+    provider_jitter_ms: float
+    synthetic_symbols: int
+    synthetic_seed: int
+    log_level: str
+    log_format: str
 
 
 def get_settings() -> Settings:
@@ -23,9 +58,92 @@ def get_settings() -> Settings:
     db_path = os.environ.get("STOCKANALYSIS_DB", "stockanalysis.sqlite3")
     db_url = f"sqlite:///{db_path}"
     ttl = int(os.environ.get("CACHE_TTL_SECONDS", "900"))
+    # 本地K线列式存储目录（每只股票一个 .npy 文件）
+    bar_store_dir = os.environ.get("STOCKANALYSIS_BAR_DIR", os.path.join("data", "bars"))
+    spot_max_age = int(os.environ.get("SPOT_MAX_AGE_SECONDS", "30"))
+    spot_refresh = int(os.environ.get("SPOT_REFRESH_INTERVAL_SECONDS", str(spot_max_age)))
+    # 进程内 LRU 缓存层：按字节上限淘汰；条目最长驻留时间限制跨进程不一致的窗口
+    cache_memory_max_bytes = int(float(os.environ.get("CACHE_MEMORY_MAX_MB", "256")) * 1024 * 1024)
+    cache_memory_max_ttl = int(os.environ.get("CACHE_MEMORY_MAX_TTL_SECONDS", "300"))
+    # SQLite 缓存表维护：过期清理周期、总容量上限、增量 VACUUM 周期
+    cache_db_max_bytes = int(float(os.environ.get("CACHE_DB_MAX_MB", "512")) * 1024 * 1024)
+    cache_sweep_interval = int(os.environ.get("CACHE_SWEEP_INTERVAL_SECONDS", "300"))
+    cache_vacuum_interval = int(os.environ.get("CACHE_VACUUM_INTERVAL_SECONDS", "3600"))
+    cache_sweep_batch = int(os.environ.get("CACHE_SWEEP_BATCH", "500"))
+    # 线程池大小：上游并发、等待上游的请求、本地计算（analytics_workers=0 表示按 CPU 数自动）
+    upstream_workers = int(os.environ.get("UPSTREAM_WORKERS", "8"))
+    io_workers = int(os.environ.get("IO_WORKERS", "32"))
+    analytics_workers = int(os.environ.get("ANALYTICS_WORKERS", "0"))
+    upstream_timeout = float(os.environ.get("UPSTREAM_TIMEOUT_SECONDS", "10"))
+    breaker_threshold = int(os.environ.get("UPSTREAM_BREAKER_THRESHOLD", "5"))
+    breaker_reset = float(os.environ.get("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+    # 单个接口超时后仍占着上游线程的调用数上限（0 表示上游线程数的一半），超过后直接拒绝
+    upstream_max_stuck = int(os.environ.get("UPSTREAM_MAX_STUCK", "0")) or max(1, upstream_workers // 2)
+    # 个股资料后台批量抓取：过期天数与每秒请求数
+    profile_max_age_days = float(os.environ.get("PROFILE_MAX_AGE_DAYS", "30"))
+    profile_fetch_rate = float(os.environ.get("PROFILE_FETCH_RATE", "2"))
+    # 大盘推送流：后台轮询周期（与客户端数量无关）
+    market_stream_interval = float(os.environ.get("MARKET_STREAM_INTERVAL_SECONDS", "15"))
+    # 收盘后批量运行全部已保存策略的时间（HH:MM，交易日）
+    strategy_batch_at = os.environ.get("STRATEGY_BATCH_AT", "15:05")
+    # 回测进程池大小（0 表示按 CPU 数）
+    backtest_workers = int(os.environ.get("BACKTEST_WORKERS", "0"))
+    # SQLite：读连接池大小、忙等待超时、页缓存/mmap 大小；写入由单线程按批合并提交
+    db_read_pool = int(os.environ.get("DB_READ_POOL", "8"))
+    db_busy_timeout_ms = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+    db_cache_mb = int(os.environ.get("DB_CACHE_MB", "64"))
+    db_mmap_mb = int(os.environ.get("DB_MMAP_MB", "256"))
+    db_write_batch = int(os.environ.get("DB_WRITE_BATCH", "200"))
+    db_write_delay_ms = float(os.environ.get("DB_WRITE_DELAY_MS", "5"))
+    # 行情数据来源：akshare（在线）| record（在线并录制到 fixture 目录）| replay（回放录制）| synthetic（合成全市场）
+    # replay/synthetic 可注入固定延迟 + 抖动，用于离线、可复现的压测和基准
+    market_provider = os.environ.get("MARKET_PROVIDER", "akshare").strip().lower()
+    fixture_dir = os.environ.get("MARKET_FIXTURE_DIR", os.path.join("data", "fixtures"))
+    provider_latency_ms = float(os.environ.get("PROVIDER_LATENCY_MS", "0"))
+    provider_jitter_ms = float(os.environ.get("PROVIDER_JITTER_MS", "0"))
+    synthetic_symbols = int(os.environ.get("SYNTHETIC_SYMBOLS", "5000"))
+    synthetic_seed = int(os.environ.get("SYNTHETIC_SEED", "20240101"))
+    # 日志：LOG_FORMAT=text（key=value，便于本地看）| json（每行一个对象，便于采集）
+    log_level = os.environ.get("LOG_LEVEL", "INFO").strip().upper()
+    log_format = os.environ.get("LOG_FORMAT", "text").strip().lower()
     return Settings(
         tushare_token=token.strip() if token else None,
         db_url=db_url,
         cache_default_ttl_seconds=ttl,
+        bar_store_dir=bar_store_dir,
+        spot_max_age_seconds=spot_max_age,
+        spot_refresh_interval_seconds=spot_refresh,
+        cache_memory_max_bytes=cache_memory_max_bytes,
+        cache_memory_max_ttl_seconds=cache_memory_max_ttl,
+        cache_db_max_bytes=cache_db_max_bytes,
+        cache_sweep_interval_seconds=cache_sweep_interval,
+        cache_vacuum_interval_seconds=cache_vacuum_interval,
+        cache_sweep_batch=cache_sweep_batch,
+        upstream_workers=upstream_workers,
+        io_workers=io_workers,
+        analytics_workers=analytics_workers,
+        upstream_timeout_seconds=upstream_timeout,
+        upstream_breaker_threshold=breaker_threshold,
+        upstream_breaker_reset_seconds=breaker_reset,
+        upstream_max_stuck=upstream_max_stuck,
+        profile_max_age_days=profile_max_age_days,
+        profile_fetch_rate=profile_fetch_rate,
+        market_stream_interval_seconds=market_stream_interval,
+        strategy_batch_at=strategy_batch_at,
+        backtest_workers=backtest_workers,
+        db_read_pool=db_read_pool,
+        db_busy_timeout_ms=db_busy_timeout_ms,
+        db_cache_mb=db_cache_mb,
+        db_mmap_mb=db_mmap_mb,
+        db_write_batch=db_write_batch,
+        db_write_delay_ms=db_write_delay_ms,
+        market_provider=market_provider,
+        fixture_dir=fixture_dir,
+        provider_latency_ms=provider_latency_ms,
+        provider_jitter_ms=provider_jitter_ms,
+        synthetic_symbols=synthetic_symbols,
+        synthetic_seed=synthetic_seed,
+        log_level=log_level,
+        log_format=log_format,
     )
 
@@ -0,0 +1,7 @@
+"""Micro-benchmarks for the analytics hot paths (offline, synthetic market).
+
+    python -m benchmarks                       # 准备数据（首次）并运行全部用例
+    python -m benchmarks --save main           # 记录基线到 benchmarks/baselines/main.json
+    python -m benchmarks --compare main        # 与基线比较，超过阈值时退出码为 1
+    python -m benchmarks --only search,kline_hit --iterations 500
+"""
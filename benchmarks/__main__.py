@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline micro-benchmarks with baseline regression gates.")
+    parser.add_argument("--only", help="comma-separated case names")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="calls traced with tracemalloc per case")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--cache-rows", type=int, default=20000)
+    parser.add_argument("--workdir", default=os.path.join("data", "bench"))
+    parser.add_argument("--save", metavar="NAME", help="store results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare with baseline NAME and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed relative growth of p50 / peak allocation")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args(argv)
+
+    # 设置必须在导入 backend 之前生效（各模块在导入时读取配置）
+    os.makedirs(args.workdir, exist_ok=True)
+    os.environ["MARKET_PROVIDER"] = "synthetic"
+    os.environ["PROVIDER_LATENCY_MS"] = "0"
+    os.environ["PROVIDER_JITTER_MS"] = "0"
+    os.environ["SYNTHETIC_SYMBOLS"] = str(args.symbols)
+    os.environ["STOCKANALYSIS_DB"] = os.path.join(args.workdir, "bench.sqlite3")
+    os.environ["STOCKANALYSIS_BAR_DIR"] = os.path.join(args.workdir, "bars")
+
+    from benchmarks.cases import build_cases
+    from benchmarks.fixture import prepare
+    from benchmarks.harness import compare, environment, format_table, measure, save_baseline
+
+    spec = prepare(args.symbols, args.years, args.cache_rows)
+    from backend.services.db_writer import db_writer
+
+    # 与线上一致：写入走后台写线程
+    db_writer.start()
+    try:
+        cases = build_cases(args.cache_rows)
+        names = [n.strip() for n in args.only.split(",")] if args.only else list(cases)
+        unknown = [n for n in names if n not in cases]
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(unknown)} (have: {', '.join(cases)})")
+        results = []
+        for name in names:
+            r = measure(name, cases[name], args.iterations, args.warmup, args.alloc_iterations)
+            print(f"[bench] {name}: p50={r.p50_ms:.3f}ms p99={r.p99_ms:.3f}ms peak={r.alloc_peak_kb:.1f}KB", file=sys.stderr)
+            results.append(r)
+    finally:
+        db_writer.stop()
+
+    meta = {"fixture": spec, "env": environment(), "iterations": args.iterations}
+    deltas = compare(args.compare, results, args.threshold) if args.compare else None
+    print(format_table(results, deltas))
+    if args.save:
+        print(f"baseline saved to {save_baseline(args.save, results, meta)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": [r.__dict__ for r in results]}, f, indent=2)
+    regressed = [n for n, d in (deltas or {}).items() if d["regressed"]]
+    if regressed:
+        print(f"regressions beyond {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
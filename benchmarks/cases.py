@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from backend.services.bar_store import get_bar_store
+from backend.services.cache import cache_get, cache_set, memory_tier
+from backend.services.price_panel import get_price_panel, tech_mask
+from backend.services.signals import compute_strategy_events
+from backend.services.spot_snapshot import get_spot_snapshot
+from backend.services.stocks import get_kline, search_stocks
+from backend.services.strategy_dsl import StrategyDSL
+from backend.services.strategy_plan import build_screen_frame, compile_dsl, get_screen_frame
+from backend.services.strategy_store import run_dsl
+from backend.services.trade_calendar import spot_session
+
+from benchmarks.fixture import FIXTURE_DSLS
+
+
+# 模拟逐键输入：代码前缀、完整代码、拼音首字母、中文子串
+SEARCH_QUERIES = ["6", "60", "600", "6000", "000001", "30", "688", "h", "hx", "zk", "科技", "药业", "能源", "华", "st"]
+
+Case = Callable[[int], Any]
+
+
+def build_cases(cache_rows: int) -> dict[str, Case]:
+    """name -> fn(i); ``i`` picks the input so every run sees the same sequence."""
+    snap = get_spot_snapshot()
+    store = get_bar_store()
+    codes = store.symbols("qfq")
+    # 不复权数据只由 kline_miss 写入：每轮开始时清空，保证每次调用都是一只未入库的新股票
+    shutil.rmtree(os.path.join(store.root, "none"), ignore_errors=True)
+    fresh = snap.df["ts_code"].tolist()
+    end = datetime.now()
+    one_year = ((end - timedelta(days=365)).strftime("%Y%m%d"), end.strftime("%Y%m%d"))
+    dsls = [StrategyDSL.model_validate(d) for d in FIXTURE_DSLS]
+    plans = [compile_dsl(d) for d in dsls]
+    today = int(end.strftime("%Y%m%d"))
+    session = spot_session(today)
+    # 选股走编译计划（strategy_plan）：列式帧按快照复用，技术条件是全市场面板掩码
+    frame = get_screen_frame(snap)
+    panel = get_price_panel()
+    techs = ["ma_up_5", "break_20d", "rsi_oversold"]
+    set_payload = {"bars": [{"t": str(20240101 + k), "c": 10.0 + k / 100} for k in range(240)]}
+    for k in range(64):
+        # cache_get_memory 只读这 64 个键：先读一次，让它们进入内存层
+        cache_get(f"bench:fill:{k}")
+
+    def search(i: int) -> Any:
+        return search_stocks(SEARCH_QUERIES[i % len(SEARCH_QUERIES)], snap)
+
+    def kline_hit(i: int) -> Any:
+        return get_kline(codes[(i * 7919) % len(codes)], one_year[0], one_year[1], "qfq")
+
+    def kline_miss(i: int) -> Any:
+        # 每次都是一只新股票，走上游（合成数据）+ 写 bar store；不回绕，否则后面全是命中
+        if i >= len(fresh):
+            raise RuntimeError(f"kline_miss needs one symbol per call: {len(fresh)} symbols, call {i + 1}; raise --symbols")
+        return get_kline(fresh[i], one_year[0], one_year[1], "none")
+
+    def signals(i: int) -> Any:
+        return compute_strategy_events(codes[(i * 104729) % len(codes)], dsls[i % len(dsls)], 120)
+
+    def screen_frame(i: int) -> Any:
+        # 快照或个股资料版本变化时的重建
+        return build_screen_frame(snap)
+
+    def tech_mask_full(i: int) -> Any:
+        # 技术条件掩码缓存未命中时的全市场计算
+        return tech_mask(panel.history_matrix(frame.df["ts_code"], session, frame.column("close")), techs[i % len(techs)])
+
+    def plan_select(i: int) -> Any:
+        # 一次选股请求：融合谓词掩码 + 技术条件（已缓存）+ 部分排序
+        return plans[i % len(plans)].select(frame, today, limit=100)
+
+    def dsl_run(i: int) -> Any:
+        return run_dsl(dsls[i % len(dsls)])
+
+    def cache_get_memory(i: int) -> Any:
+        return cache_get(f"bench:fill:{i % 64}")
+
+    def cache_get_sqlite(i: int) -> Any:
+        key = f"bench:fill:{(i * 7919) % cache_rows}"
+        memory_tier.discard(key)
+        return cache_get(key)
+
+    def cache_put(i: int) -> Any:
+        cache_set(f"bench:set:{i % 1000}", set_payload, ttl_seconds=600)
+
+    return {
+        "search": search,
+        "kline_hit": kline_hit,
+        "kline_miss": kline_miss,
+        "signals": signals,
+        "screen_frame": screen_frame,
+        "tech_mask": tech_mask_full,
+        "plan_select": plan_select,
+        "run_dsl": dsl_run,
+        "cache_get_memory": cache_get_memory,
+        "cache_get_sqlite": cache_get_sqlite,
+        "cache_set": cache_put,
+    }
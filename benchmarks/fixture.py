@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from backend.db import SessionLocal, init_db
+from backend.ingest import ingest
+from backend.models import CacheEntry
+from backend.services.bar_store import shift_day, today_int
+from backend.services.cache_codec import encode_payload
+from backend.services.spot_snapshot import get_spot_snapshot
+from backend.services.strategy_dsl import StrategyCreateRequest, StrategyDSL
+from backend.services.strategy_store import create_strategy, list_strategies
+from backend.settings import get_settings
+
+
+FIXTURE_DSLS = [
+    {"filters": {"peMax": 30, "turnMinPct": 1}},
+    {"filters": {"peMax": 60, "mcapMaxYi": 500, "tech": "ma_up_5"}},
+    {"filters": {"turnMinPct": 3, "tech": "break_20d"}},
+    {"filters": {"peMax": 25, "tech": "rsi_oversold"}},
+    {"filters": {}, "exits": {"takeProfitPct": 8, "stopLossPct": 5, "exitPattern": "close_below_ma10"}},
+]
+
+
+def _fill_cache(rows: int, batch: int = 2000) -> None:
+    """Cache table at a realistic size: kline-shaped JSON payloads under their own key family."""
+    rng = np.random.default_rng(7)
+    now = int(time.time())
+    with SessionLocal() as db:
+        have = int(db.execute(select(func.count()).select_from(CacheEntry).where(CacheEntry.key.like("bench:fill:%"))).scalar() or 0)
+    for start in range(have, rows, batch):
+        values = []
+        for i in range(start, min(rows, start + batch)):
+            bars = [{"t": str(20240101 + k), "c": round(float(v), 2)} for k, v in enumerate(rng.uniform(5, 50, 120))]
+            codec, blob = encode_payload({"bars": bars})
+            values.append(
+                {"key": f"bench:fill:{i}", "codec": codec, "blob": blob, "size_bytes": len(blob), "expires_at": now + 86400 * 365, "accessed_at": now}
+            )
+        with SessionLocal() as db:
+            db.execute(insert(CacheEntry), values)
+            db.commit()
+
+
+def prepare(symbols: int, years: int, cache_rows: int) -> dict:
+    """Build (once) the synthetic bar store, cache table and saved strategies under the bench workdir."""
+    settings = get_settings()
+    spec = {"symbols": symbols, "years": years, "cache_rows": cache_rows, "seed": settings.synthetic_seed}
+    marker = os.path.join(settings.bar_store_dir, "_bench_fixture.json")
+    init_db()
+    try:
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == spec:
+                return spec
+    except (OSError, ValueError):
+        pass
+
+    t0 = time.perf_counter()
+    print(f"[bench] preparing fixture {spec} in {settings.bar_store_dir}")
+    codes = get_spot_snapshot().df["ts_code"].tolist()
+    end = today_int()
+    ingest(shift_day(end, -365 * years), end, symbols=codes, workers=4, rate=1e6, retries=0, report_every=30)
+    _fill_cache(cache_rows)
+    existing = {s["name"] for s in list_strategies()}
+    for k, dsl in enumerate(FIXTURE_DSLS):
+        if f"bench-{k}" not in existing:
+            create_strategy(StrategyCreateRequest(name=f"bench-{k}", dsl=StrategyDSL.model_validate(dsl)))
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    print(f"[bench] fixture ready in {time.perf_counter() - t0:.1f}s")
+    return spec
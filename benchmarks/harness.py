@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+import numpy as np
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+# 低于这个绝对差值（毫秒）的 p50 变化视为噪声，不算回归
+MIN_DELTA_MS = 0.05
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    ops_per_s: float
+    alloc_peak_kb: float
+    alloc_retained_kb: float
+
+
+def measure(name: str, fn: Callable[[int], Any], iterations: int, warmup: int, alloc_iterations: int) -> Result:
+    """Time ``fn(i)`` per call, then a separate tracemalloc pass for allocations (it slows calls down)."""
+    for i in range(warmup):
+        fn(i)
+    gc.collect()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn(warmup + i)
+        samples[i] = time.perf_counter_ns() - t0
+    ms = samples / 1e6
+
+    peaks: list[float] = []
+    retained: list[float] = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_iterations):
+            gc.collect()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn(warmup + iterations + i)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        name=name,
+        iterations=iterations,
+        mean_ms=round(float(ms.mean()), 4),
+        p50_ms=round(float(np.percentile(ms, 50)), 4),
+        p90_ms=round(float(np.percentile(ms, 90)), 4),
+        p99_ms=round(float(np.percentile(ms, 99)), 4),
+        max_ms=round(float(ms.max()), 4),
+        ops_per_s=round(1000.0 / float(ms.mean()), 1) if ms.mean() > 0 else 0.0,
+        alloc_peak_kb=round(float(np.median(peaks)) / 1024, 1) if peaks else 0.0,
+        alloc_retained_kb=round(float(np.mean(retained)) / 1024, 1) if retained else 0.0,
+    )
+
+
+def environment() -> dict:
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_table(results: list[Result], deltas: dict[str, dict] | None = None) -> str:
+    head = f"{'case':<22}{'iters':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>10}{'peak KB':>10}{'kept KB':>9}"
+    lines = [head, "-" * len(head)]
+    for r in results:
+        line = (
+            f"{r.name:<22}{r.iterations:>7}{r.p50_ms:>10.3f}{r.p90_ms:>10.3f}{r.p99_ms:>10.3f}{r.max_ms:>10.3f}"
+            f"{r.ops_per_s:>10.1f}{r.alloc_peak_kb:>10.1f}{r.alloc_retained_kb:>9.1f}"
+        )
+        d = (deltas or {}).get(r.name)
+        if d:
+            line += f"  p50 {d['p50']:+.0%} peak {d['alloc']:+.0%}" + ("  REGRESSION" if d["regressed"] else "")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def save_baseline(name: str, results: list[Result], meta: dict) -> str:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = os.path.join(BASELINE_DIR, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": {r.name: asdict(r) for r in results}}, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare(name: str, results: list[Result], threshold: float) -> dict[str, dict]:
+    """Per-case relative change of p50 latency and peak allocation against a stored baseline.
+
+    A case regresses when either grows by more than ``threshold`` (p50 also has
+    to grow by at least ``MIN_DELTA_MS``, so sub-microsecond jitter never trips it).
+    """
+    with open(os.path.join(BASELINE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    out: dict[str, dict] = {}
+    for r in results:
+        b = base.get(r.name)
+        if b is None:
+            continue
+        p50 = r.p50_ms / b["p50_ms"] - 1 if b["p50_ms"] > 0 else 0.0
+        alloc = r.alloc_peak_kb / b["alloc_peak_kb"] - 1 if b["alloc_peak_kb"] > 1 else 0.0
+        slow = p50 > threshold and r.p50_ms - b["p50_ms"] >= MIN_DELTA_MS
+        fat = alloc > threshold and r.alloc_peak_kb - b["alloc_peak_kb"] >= 16
+        out[r.name] = {"p50": p50, "alloc": alloc, "regressed": slow or fat}
+    return out
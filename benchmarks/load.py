@@ -0,0 +1,336 @@
+"""HTTP load test: simulated analysts replaying the ``app.js`` traffic mix.
+
+    python -m benchmarks.load                          # 本地启动服务（合成行情），20 个用户跑 60 秒
+    python -m benchmarks.load --users 100 --workers 4 --duration 300
+    python -m benchmarks.load --url http://127.0.0.1:8000 --users 50   # 压测已在运行的服务
+
+Each virtual user behaves like one browser tab: loads the overview and the
+strategy list, keeps one SSE connection to ``/market/overview/stream`` open
+(``--poll`` polls every 15s instead, like a browser without EventSource),
+types a query into the stock
+search (one request per keystroke), opens a result (profile + kline with ETag
+revalidation + signals), and now and then runs a saved strategy. Think times
+can be scaled down with ``--think`` to push harder than real people would.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+from benchmarks.harness import environment
+
+
+# 逐字输入的检索词：代码前缀、拼音首字母、中文子串
+TYPED_QUERIES = ["600519", "000001", "300750", "688", "zgpa", "gzmt", "hx", "科技", "银行", "药业", "能源", "st"]
+DEFAULT_DSL = {"version": 1, "universe": "A", "filters": {"peMax": 30, "turnMinPct": 1}, "exits": {"takeProfitPct": 8, "stopLossPct": 5}}
+
+
+class Recorder:
+    """Latency samples and error counts per route template (``GET /api/stocks/{ts_code}/kline``)."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.bytes: dict[str, int] = defaultdict(int)
+        self.errors: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.not_modified: dict[str, int] = defaultdict(int)
+        # SSE：按事件类型计数（full / patch / ping）
+        self.events: dict[str, int] = defaultdict(int)
+        # 异常退出的用户会话：(uid, 异常)
+        self.crashed: list[tuple[int, str]] = []
+
+    def add(self, route: str, seconds: float, status: int | str, size: int = 0) -> None:
+        self.samples[route].append(seconds)
+        self.bytes[route] += size
+        if status == 304:
+            self.not_modified[route] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[route][str(status)] += 1
+
+    def summary(self, wall: float) -> dict[str, dict]:
+        out = {}
+        for route in sorted(self.samples):
+            ms = np.array(self.samples[route]) * 1000
+            errors = sum(self.errors[route].values())
+            out[route] = {
+                "requests": len(ms),
+                "rps": round(len(ms) / wall, 2),
+                "errors": errors,
+                "error_rate": round(errors / len(ms), 4),
+                "error_kinds": dict(self.errors[route]),
+                "not_modified": self.not_modified[route],
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "max_ms": round(float(ms.max()), 2),
+                "avg_kb": round(self.bytes[route] / len(ms) / 1024, 1),
+            }
+        return out
+
+
+class Analyst:
+    """One simulated browser tab."""
+
+    def __init__(self, uid: int, base_url: str, rec: Recorder, args: argparse.Namespace, deadline: float):
+        self.uid = uid
+        self.rec = rec
+        self.args = args
+        self.deadline = deadline
+        self.rng = random.Random(args.seed * 100003 + uid)
+        # 浏览器对同一主机最多 6 个连接
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/api",
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=6, max_keepalive_connections=6),
+            headers={"Accept-Encoding": "gzip, br"},
+        )
+        self.etags: dict[str, str] = {}
+        self.strategies: list[dict] = []
+
+    async def request(self, route: str, method: str, path: str, json_body: dict | None = None) -> dict | None:
+        headers = {}
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        t0 = time.perf_counter()
+        try:
+            res = await self.client.request(method, path, json=json_body, headers=headers)
+        except httpx.HTTPError as e:
+            self.rec.add(route, time.perf_counter() - t0, type(e).__name__)
+            return None
+        self.rec.add(route, time.perf_counter() - t0, res.status_code, len(res.content))
+        if res.status_code >= 400 or res.status_code == 304:
+            return None
+        if "etag" in res.headers:
+            self.etags[path] = res.headers["etag"]
+        try:
+            return res.json()
+        except ValueError:
+            return None
+
+    async def think(self, lo: float, hi: float) -> None:
+        await asyncio.sleep(self.rng.uniform(lo, hi) * self.args.think)
+
+    def alive(self) -> bool:
+        return time.monotonic() < self.deadline
+
+    async def poll_overview(self) -> None:
+        while self.alive():
+            await asyncio.sleep(self.args.poll_interval)
+            await self.request("GET /api/market/overview", "GET", "/market/overview")
+
+    async def stream_overview(self) -> None:
+        """One EventSource per tab; the sample is the time to the first event, reconnecting after 3s like browsers do."""
+        route = "GET /api/market/overview/stream"
+        while self.alive():
+            t0 = time.perf_counter()
+            first = True
+            try:
+                timeout = httpx.Timeout(self.args.timeout, read=None)
+                async with self.client.stream("GET", "/market/overview/stream", timeout=timeout) as res:
+                    if res.status_code != 200:
+                        self.rec.add(route, time.perf_counter() - t0, res.status_code)
+                    else:
+                        async for line in res.aiter_lines():
+                            if line.startswith("event: "):
+                                if first:
+                                    self.rec.add(route, time.perf_counter() - t0, 200)
+                                    first = False
+                                self.rec.events[line[len("event: ") :]] += 1
+                            elif line.startswith(": ping"):
+                                self.rec.events["ping"] += 1
+                            if line.startswith("data: "):
+                                self.rec.bytes[route] += len(line)
+                            if not self.alive():
+                                return
+            except httpx.HTTPError as e:
+                self.rec.add(route, time.perf_counter() - t0, type(e).__name__)
+            await asyncio.sleep(3.0)
+
+    async def open_stock(self, ts_code: str) -> None:
+        end = datetime.now()
+        start = end - timedelta(days=240)
+        await self.request("GET /api/stocks/{ts_code}/profile", "GET", f"/stocks/{ts_code}/profile")
+        await self.request(
+            "GET /api/stocks/{ts_code}/kline",
+            "GET",
+            f"/stocks/{ts_code}/kline?start={start:%Y%m%d}&end={end:%Y%m%d}&adj=qfq&format=columns",
+        )
+        await self.think(1.0, 4.0)
+        dsl = self.rng.choice(self.strategies)["dsl"] if self.strategies else DEFAULT_DSL
+        await self.request("POST /api/stocks/{ts_code}/signals", "POST", f"/stocks/{ts_code}/signals?days=60", dsl)
+
+    async def run_strategy(self) -> None:
+        if self.strategies:
+            sid = self.rng.choice(self.strategies)["id"]
+            await self.request("POST /api/strategies/{strategy_id}/run", "POST", f"/strategies/{sid}/run")
+        else:
+            await self.request("POST /api/strategies/run_draft", "POST", "/strategies/run_draft", DEFAULT_DSL)
+
+    async def session(self) -> None:
+        # 首屏：大盘 + 策略列表，之后大盘走 SSE 推送（--poll 时每 15 秒轮询）
+        await self.request("GET /api/market/overview", "GET", "/market/overview")
+        data = await self.request("GET /api/strategies", "GET", "/strategies")
+        self.strategies = (data or {}).get("items", [])
+        poller = asyncio.create_task(self.poll_overview() if self.args.poll else self.stream_overview())
+        try:
+            while self.alive():
+                word = self.rng.choice(TYPED_QUERIES)
+                items: list[dict] = []
+                for k in range(1, len(word) + 1):
+                    data = await self.request("GET /api/stocks/search", "GET", f"/stocks/search?q={word[:k]}")
+                    if data is not None:
+                        items = data.get("items", [])
+                    await self.think(0.08, 0.25)
+                if items and self.alive():
+                    await self.open_stock(self.rng.choice(items[:10])["ts_code"])
+                if self.rng.random() < self.args.strategy_rate and self.alive():
+                    await self.run_strategy()
+                await self.think(2.0, 8.0)
+        finally:
+            poller.cancel()
+            await self.client.aclose()
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> tuple[Recorder, float]:
+    rec = Recorder()
+    t0 = time.monotonic()
+    deadline = t0 + args.duration
+    tasks = []
+    for uid in range(args.users):
+        # 用户在 ramp 时间内均匀上线
+        await asyncio.sleep(args.ramp / max(args.users, 1))
+        tasks.append(asyncio.create_task(Analyst(uid, base_url, rec, args, deadline).session()))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for uid, r in enumerate(results):
+        if isinstance(r, BaseException):
+            rec.crashed.append((uid, f"{type(r).__name__}: {r}"))
+    return rec, time.monotonic() - t0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """Prepare the synthetic fixture, then start uvicorn on a free port with the same settings."""
+    os.makedirs(args.workdir, exist_ok=True)
+    env = {
+        "MARKET_PROVIDER": args.provider,
+        "PROVIDER_LATENCY_MS": str(args.latency_ms),
+        "PROVIDER_JITTER_MS": str(args.latency_ms / 2),
+        "SYNTHETIC_SYMBOLS": str(args.symbols),
+        "STOCKANALYSIS_DB": os.path.join(args.workdir, "bench.sqlite3"),
+        "STOCKANALYSIS_BAR_DIR": os.path.join(args.workdir, "bars"),
+    }
+    os.environ.update(env)
+    if args.provider == "synthetic":
+        # 与微基准共用同一份数据（bar store + 策略），导入 backend 前环境变量必须已设置
+        from benchmarks.fixture import prepare
+
+        prepare(args.symbols, args.years, 0)
+    port = _free_port()
+    log = open(os.path.join(args.workdir, "server.log"), "ab")
+    cmd = [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port)]
+    cmd += ["--workers", str(args.workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < 60:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}; see {log.name}")
+        try:
+            if httpx.get(f"{url}/api/system/upstream", timeout=2).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    proc.terminate()
+    raise RuntimeError(f"server did not become ready in 60s; see {log.name}")
+
+
+def format_report(summary: dict[str, dict], wall: float, rec: Recorder) -> str:
+    head = f"{'route':<42}{'reqs':>7}{'rps':>8}{'err%':>7}{'304':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'avg KB':>8}"
+    lines = [head, "-" * len(head)]
+    for route, s in summary.items():
+        lines.append(
+            f"{route:<42}{s['requests']:>7}{s['rps']:>8.2f}{s['error_rate'] * 100:>7.2f}{s['not_modified']:>6}"
+            f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}{s['avg_kb']:>8.1f}"
+        )
+    total = sum(s["requests"] for s in summary.values())
+    errors = sum(s["errors"] for s in summary.values())
+    lines.append("-" * len(head))
+    lines.append(f"total {total} requests in {wall:.1f}s = {total / wall:.1f} req/s, errors {errors} ({errors / max(total, 1):.2%})")
+    for route, s in summary.items():
+        if s["error_kinds"]:
+            lines.append(f"  {route}: {', '.join(f'{k}x{v}' for k, v in s['error_kinds'].items())}")
+    if rec.events:
+        lines.append(f"sse events: {', '.join(f'{k}={v}' for k, v in sorted(rec.events.items()))}")
+    if rec.crashed:
+        lines.append(f"sessions crashed: {len(rec.crashed)}")
+        lines += [f"  user {uid}: {err}" for uid, err in rec.crashed[:10]]
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="Replay the app.js traffic mix against the API.")
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated analysts")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which users join")
+    parser.add_argument("--think", type=float, default=1.0, help="think-time multiplier (0 = no pauses)")
+    parser.add_argument("--poll", action="store_true", help="poll the overview instead of the SSE stream (no EventSource)")
+    parser.add_argument("--poll-interval", type=float, default=15.0, help="overview poll period per user with --poll")
+    parser.add_argument("--strategy-rate", type=float, default=0.1, help="chance of a strategy run per search cycle")
+    parser.add_argument("--timeout", type=float, default=12.0, help="per-request timeout (app.js aborts after 12s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (local server only)")
+    parser.add_argument("--provider", default="synthetic", choices=["synthetic", "replay"], help="offline data provider for the local server")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="injected upstream latency (local server only)")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--workdir", default=os.path.join("data", "bench"))
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit 1 above this overall error rate")
+    args = parser.parse_args(argv)
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(args)
+        print(f"[load] server {url} workers={args.workers} provider={args.provider} latency={args.latency_ms}ms", file=sys.stderr)
+    try:
+        print(f"[load] {args.users} users for {args.duration:.0f}s (ramp {args.ramp:.0f}s, think x{args.think})", file=sys.stderr)
+        rec, wall = asyncio.run(run_load(url, args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    summary = rec.summary(wall)
+    print(format_report(summary, wall, rec))
+    total = sum(s["requests"] for s in summary.values())
+    errors = sum(s["errors"] for s in summary.values())
+    if args.json:
+        meta = {k: v for k, v in vars(args).items() if k != "json"}
+        with open(args.json, "w", encoding="utf-8") as f:
+            report = {"routes": summary, "sse_events": dict(rec.events), "crashed": [{"user": u, "error": e} for u, e in rec.crashed]}
+            json.dump({"meta": {**meta, "env": environment(), "wall_s": round(wall, 2)}, **report}, f, indent=2, ensure_ascii=False)
+    # 会话崩溃说明压测脚本本身出错，结果不可信
+    return 1 if rec.crashed or (total and errors / total > args.max_error_rate) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
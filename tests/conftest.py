@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# 配置在导入 backend 时读取：测试用临时目录和离线合成行情，不碰真实数据库/网络
+_tmp = tempfile.mkdtemp(prefix="stockanalysis-tests-")
+os.environ.setdefault("STOCKANALYSIS_DB", os.path.join(_tmp, "test.sqlite3"))
+os.environ.setdefault("STOCKANALYSIS_BAR_DIR", os.path.join(_tmp, "bars"))
+os.environ.setdefault("MARKET_PROVIDER", "synthetic")
+os.environ.setdefault("SYNTHETIC_SYMBOLS", "200")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    from backend.db import init_db
+
+    init_db()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import stocks
+from backend.services.bar_store import BAR_DTYPE, BarStore
+
+
+def _bdays(start: int, end: int) -> np.ndarray:
+    days = pd.bdate_range(str(start), str(end))
+    out = np.zeros(len(days), dtype=BAR_DTYPE)
+    out["t"] = days.year * 10000 + days.month * 100 + days.day
+    out["c"] = 10.0
+    return out
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = BarStore(str(tmp_path))
+    fetched: list[tuple[int, int]] = []
+
+    def fake_fetch(ts_code, start, end, adj, limiter=None):
+        fetched.append((start, end))
+        return _bdays(start, end)
+
+    monkeypatch.setattr(stocks, "get_bar_store", lambda: s)
+    monkeypatch.setattr(stocks, "_fetch_hist", fake_fetch)
+    s.fetched = fetched
+    return s
+
+
+@pytest.mark.parametrize("adj", ["none", "qfq"])
+@pytest.mark.parametrize("order", [("first", "second"), ("second", "first")])
+def test_disjoint_windows_do_not_mark_the_gap_as_covered(store, adj, order):
+    windows = {"first": (20240102, 20240329), "second": (20240603, 20240628)}
+    for name in order:
+        assert stocks.sync_bars("600000.SH", *windows[name], adj)
+    assert stocks.sync_bars("600000.SH", 20240102, 20240628, adj)
+    got = store.slice("600000.SH", adj, 20240102, 20240628)
+    np.testing.assert_array_equal(got["t"], _bdays(20240102, 20240628)["t"])
+
+
+def test_missing_ranges_join_the_stored_range(store):
+    store.merge("600000.SH", "none", _bdays(20240102, 20240329), 20240102, 20240329)
+    assert store.missing_ranges("600000.SH", "none", 20240603, 20240628, 60) == [(20240330, 20240628)]
+    assert store.missing_ranges("600000.SH", "none", 20231002, 20231031, 60) == [(20231002, 20240101)]
+
+
+def test_merge_rejects_a_detached_range(store):
+    store.merge("600000.SH", "none", _bdays(20240102, 20240329), 20240102, 20240329)
+    with pytest.raises(ValueError):
+        store.merge("600000.SH", "none", _bdays(20240603, 20240628), 20240603, 20240628)
+
+
+def test_rewrite_uses_a_new_file_and_keeps_old_mappings_readable(store):
+    store.merge("600000.SH", "none", _bdays(20240102, 20240329), 20240102, 20240329)
+    mapped, meta = store.load("600000.SH", "none")
+    store.merge("600000.SH", "none", _bdays(20240401, 20240430), 20240330, 20240430)
+    _, meta2 = store.load("600000.SH", "none")
+    assert meta2["file"] != meta["file"]
+    assert len(mapped) == len(_bdays(20240102, 20240329))
+    assert len(store.slice("600000.SH", "none", 20240102, 20240430)) == len(_bdays(20240102, 20240430))
+
+
+def test_tail_refetch_starts_at_the_last_stored_bar(store):
+    store.merge("600000.SH", "none", _bdays(20240102, 20240329), 20240102, 20240329)
+    assert stocks.sync_bars("600000.SH", 20240102, 20240412, "none")
+    assert store.fetched[-1] == (20240329, 20240412)
+
+
+def test_failed_fetch_is_not_retried_for_a_while(store, monkeypatch):
+    calls = []
+
+    def failing(ts_code, start, end, adj, limiter=None):
+        calls.append((start, end))
+        return None
+
+    monkeypatch.setattr(stocks, "_fetch_hist", failing)
+    assert not stocks.sync_bars("000001.SZ", 20240102, 20240329, "none")
+    assert not stocks.sync_bars("000001.SZ", 20240102, 20240329, "none")
+    assert len(calls) == 1
+    # 批量导入（带 limiter）自己管理重试，不受负缓存影响
+    assert not stocks.sync_bars("000001.SZ", 20240102, 20240329, "none", limiter=lambda: None)
+    assert len(calls) == 2
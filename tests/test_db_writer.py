@@ -0,0 +1,56 @@
+import threading
+
+from backend.services.db_writer import DbWriter
+
+
+def test_writes_racing_stop_all_resolve():
+    w = DbWriter(batch_size=8, max_delay=0.001)
+    w.start()
+    futures, lock = [], threading.Lock()
+    go = threading.Event()
+
+    def submitter():
+        go.wait()
+        for i in range(200):
+            f = w.submit(lambda db, i=i: i)
+            with lock:
+                futures.append(f)
+
+    threads = [threading.Thread(target=submitter) for _ in range(4)]
+    for t in threads:
+        t.start()
+    go.set()
+    w.stop()
+    for t in threads:
+        t.join()
+    # 停止前入队的由写线程提交，之后的直接落盘；没有悬空的 Future
+    assert len(futures) == 800
+    assert all(f.result(timeout=5) is not None for f in futures)
+    assert not w.running and w.stats()["queue_depth"] == 0
+
+
+def test_submit_after_stop_applies_inline():
+    w = DbWriter(batch_size=8, max_delay=0.001)
+    w.start()
+    w.stop()
+    w.stop()
+    assert w.submit(lambda db: 42).done()
+    assert w.write(lambda db: 7) == 7
+
+
+def test_cache_sweeps_go_through_the_writer(monkeypatch):
+    from backend.models import CacheEntry
+    from backend.services import cache_maintenance as cm
+
+    w = DbWriter(batch_size=8, max_delay=0.001)
+    monkeypatch.setattr(cm, "db_writer", w)
+    w.write(lambda db: db.add_all([CacheEntry(key=f"sweep:{i}", codec="json", blob=b"x" * 100, size_bytes=100, expires_at=1) for i in range(5)]))
+    w.start()
+    try:
+        writes = w.writes
+        n = cm.sweep_expired(batch_size=2)
+        # 每批 2 行：每次删除都由写线程提交
+        assert n >= 5 and w.writes - writes == n // 2 + 1
+        assert w.write(lambda db: db.get(CacheEntry, "sweep:0")) is None
+    finally:
+        w.stop()
@@ -0,0 +1,52 @@
+from backend import ingest as ingest_mod
+from backend.services import upstream
+from backend.services.spot_snapshot import get_spot_snapshot
+
+
+def test_outage_pauses_instead_of_failing_symbols(monkeypatch):
+    codes = get_spot_snapshot().df["ts_code"].tolist()[:12]
+    outage = {"left": 5}
+    real = upstream.call
+
+    def flaky(name, **kw):
+        if name == "stock_zh_a_hist" and outage["left"] > 0:
+            outage["left"] -= 1
+            raise upstream.UpstreamUnavailable("stock_zh_a_hist circuit open")
+        return real(name, **kw)
+
+    pauses = []
+    monkeypatch.setattr(upstream, "call", flaky)
+    monkeypatch.setattr(ingest_mod.RateLimiter, "pause", lambda self, s: pauses.append(s))
+    out = ingest_mod.ingest(20240101, 20240301, symbols=codes, workers=3, rate=1e6, retries=0, report_every=60, pause=0.01)
+    assert out["ok"] == len(codes) and not out["failed"]
+    assert len(pauses) == 5
+
+
+def test_data_errors_still_fail_the_symbol(monkeypatch):
+    def bad(name, **kw):
+        raise KeyError("no such symbol")
+
+    monkeypatch.setattr(upstream, "call", bad)
+    out = ingest_mod.ingest(20230101, 20230301, symbols=["600000.SH"], workers=1, rate=1e6, retries=0, report_every=60, pause=0.01)
+    assert list(out["failed"]) == ["600000.SH"]
+
+
+def test_default_range_resumes_on_a_later_day(monkeypatch):
+    codes = get_spot_snapshot().df["ts_code"].tolist()[:4]
+    real = upstream.call
+
+    def fail_one(name, **kw):
+        if name == "stock_zh_a_hist" and kw["symbol"] == codes[0][:6]:
+            raise KeyError("no such symbol")
+        return real(name, **kw)
+
+    monkeypatch.setattr(upstream, "call", fail_one)
+    monkeypatch.setattr(ingest_mod, "today_int", lambda: 20240301)
+    first = ingest_mod.ingest(symbols=codes, workers=2, rate=1e6, retries=0, report_every=60, pause=0.01)
+    assert (first["start"], first["end"]) == (20190303, 20240301) and list(first["failed"]) == [codes[0]]
+    # 第二天用同样的命令（不带日期）重跑：沿用原来的区间，只补失败的那只
+    monkeypatch.setattr(upstream, "call", real)
+    monkeypatch.setattr(ingest_mod, "today_int", lambda: 20240304)
+    second = ingest_mod.ingest(symbols=codes, workers=2, rate=1e6, retries=0, report_every=60, pause=0.01)
+    assert (second["start"], second["end"]) == (20190303, 20240301)
+    assert second["resumed"] == 3 and second["ok"] == 1
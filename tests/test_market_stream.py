@@ -0,0 +1,28 @@
+from backend.services import market, upstream
+from backend.services.market_stream import OverviewStream
+
+
+def test_stream_tick_bypasses_the_index_cache(monkeypatch):
+    calls = []
+    real = upstream.call
+    monkeypatch.setattr(upstream, "call", lambda name, **kw: calls.append(name) or real(name, **kw))
+    market.market_overview(None)
+    cached = calls.count("stock_zh_index_spot_em")
+    stream = OverviewStream(interval=1)
+    stream.tick()
+    stream.tick()
+    assert calls.count("stock_zh_index_spot_em") == cached + 2
+    # HTTP 接口读到的是推送线程刚写回的缓存
+    assert market.market_overview(None)["indices"] == stream._payload["indices"]
+    assert calls.count("stock_zh_index_spot_em") == cached + 2
+
+
+def test_upstream_failure_keeps_the_last_real_indices(monkeypatch):
+    good = market.live_index_overview()
+    assert not good["mock"]
+
+    def down(name, **kw):
+        raise upstream.UpstreamUnavailable(name)
+
+    monkeypatch.setattr(upstream, "call", down)
+    assert market.live_index_overview()["indices"] == good["indices"]
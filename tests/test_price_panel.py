@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import price_panel, strategy_batch, strategy_plan
+from backend.services.spot_snapshot import SpotSnapshot
+from backend.services.strategy_plan import build_screen_frame, tech_rows
+from backend.services.strategy_store import StrategyContext
+
+
+CODES = np.array(["600000.SH", "600001.SH"], dtype=object)
+
+
+def _panel(closes: list[list[float]], start: int = 20240102) -> price_panel.PricePanel:
+    c = np.array(closes, dtype=float)
+    dates = np.arange(start, start + c.shape[1], dtype=np.int32)
+    return price_panel.PricePanel(CODES, dates, c, np.ones_like(c))
+
+
+@pytest.fixture
+def snap():
+    df = pd.DataFrame({"ts_code": CODES, "name": CODES, "close": [10.0, 10.0], "vol": [1.0, 1.0], "pct_chg": [0.0, 0.0], "turnover_rate": [1.0, 1.0]})
+    # 负版本号：不和其它测试里真实快照的缓存键冲突
+    return SpotSnapshot(version=-1, fetched_at=0.0, df=df)
+
+
+def test_tech_cache_follows_the_panel_not_its_id(snap, monkeypatch):
+    frame = build_screen_frame(snap)
+    rows = np.arange(2)
+    strategy_plan._tech_cache.clear()
+    # 现价都是 10：第一只此前持续上涨（MA5 上行），第二只持续下跌
+    monkeypatch.setattr(price_panel, "_panel", _panel([[1, 2, 3, 4, 5, 6], [20, 19, 18, 17, 16, 15]]))
+    monkeypatch.setattr(price_panel, "_panel_mtime", price_panel._file_mtime())
+    assert tech_rows(frame, rows, 20240110, "ma_up_5").tolist() == [0]
+    # 同样的日期、新的数据：旧面板对象释放后 id 可能被复用，版本号不会
+    monkeypatch.setattr(price_panel, "_panel", _panel([[20, 19, 18, 17, 16, 15], [1, 2, 3, 4, 5, 6]]))
+    assert tech_rows(frame, rows, 20240110, "ma_up_5").tolist() == [1]
+
+
+def test_screening_does_not_grow_the_panel(snap, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(price_panel, "record_day", lambda *a: recorded.append(a))
+    ctx = StrategyContext("20240608", snapshot=snap)
+    ctx.screen_frame()
+    ctx.latest_daily_basic(ctx.universe())
+    assert not recorded
+
+
+def test_scheduler_records_the_close_on_trading_days(snap, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(strategy_batch, "record_day", lambda day, *a: recorded.append(day))
+    monkeypatch.setattr(strategy_batch, "get_spot_snapshot", lambda max_age=None: snap)
+    s = strategy_batch.StrategyScheduler(at="15:05")
+    assert not s.due(datetime(2024, 6, 8, 16, 0))
+    s.run_once(datetime(2024, 6, 7, 16, 0))
+    assert recorded == [20240607]
+
+
+def test_weekend_snapshot_is_not_a_new_session(monkeypatch):
+    from backend.services import trade_calendar
+
+    monkeypatch.setattr(trade_calendar, "trading_days", lambda: np.array([20261014, 20261015, 20261016, 20261019]))
+    # 周日、周一开盘前都还是周五收盘；开盘后才是新的交易日
+    assert trade_calendar.spot_session(20261018, now=datetime(2026, 10, 18, 12, 0)) == 20261016
+    assert trade_calendar.spot_session(20261019, now=datetime(2026, 10, 19, 8, 0)) == 20261016
+    assert trade_calendar.spot_session(20261019, now=datetime(2026, 10, 19, 10, 0)) == 20261019
+    panel = _panel([[1, 2, 3], [4, 5, np.nan]], start=20261014)
+    close = panel.history_matrix(CODES, 20261016, np.array([3.5, 6.0]))
+    assert close.tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert panel.history_matrix(CODES, 20261019, np.array([3.5, 6.0])).shape == (2, 4)
+
+
+def test_rows_without_history_fall_back_to_the_approximation(snap, monkeypatch):
+    frame = build_screen_frame(snap)
+    strategy_plan._tech_cache.clear()
+    # 只有第一只股票在面板里；第二只（新股）按当日涨跌幅近似而不是全部落选
+    panel = price_panel.PricePanel(CODES[:1], np.arange(20240102, 20240108, dtype=np.int32), np.array([[1.0, 2, 3, 4, 5, 6]]), np.ones((1, 6)))
+    monkeypatch.setattr(price_panel, "_panel", panel)
+    monkeypatch.setattr(price_panel, "_panel_mtime", price_panel._file_mtime())
+    monkeypatch.setitem(frame.cols, "pct_chg", np.array([0.0, 1.0]))
+    assert tech_rows(frame, np.arange(2), 20240110, "ma_up_5").tolist() == [0, 1]
+
+
+def test_missed_sessions_are_backfilled_from_the_bar_store(tmp_path, monkeypatch):
+    from backend.services import trade_calendar
+    from backend.services.bar_store import BAR_DTYPE, BarStore
+
+    store = BarStore(str(tmp_path / "bars"))
+    bars = np.zeros(3, dtype=BAR_DTYPE)
+    bars["t"], bars["c"], bars["v"] = [20240102, 20240103, 20240104], [1.0, 7.0, 3.0], 100.0
+    store.merge(CODES[0], "qfq", bars, 20240102, 20240104)
+    monkeypatch.setattr(price_panel, "get_bar_store", lambda: store)
+    monkeypatch.setattr(price_panel, "_panel_path", lambda: str(tmp_path / "panel.npz"))
+    monkeypatch.setattr(trade_calendar, "trading_days", lambda: np.array([20240102, 20240103, 20240104, 20240105]))
+    # 调度器 1 月 3 日没有运行：面板缺这一列
+    gap = price_panel.PricePanel(CODES, np.array([20240102, 20240104], dtype=np.int32), np.array([[1.0, 3], [4, 6]]), np.ones((2, 2)))
+    monkeypatch.setattr(price_panel, "_panel", gap)
+    monkeypatch.setattr(price_panel, "_panel_mtime", None)
+    price_panel.record_day(20240105, CODES, np.array([9.0, 9.0]), np.array([1.0, 1.0]))
+    panel = price_panel.get_price_panel()
+    assert panel.dates.tolist() == [20240102, 20240103, 20240104, 20240105]
+    np.testing.assert_array_equal(panel.close, [[1, 7, 3, 9], [4, np.nan, 6, 9]])
@@ -0,0 +1,66 @@
+import time
+
+import pandas as pd
+import pytest
+
+from backend.services import profile_store as ps
+from backend.services.spot_snapshot import SpotSnapshot
+
+
+CODES = ["600000.SH", "600001.SH", "000001.SZ"]
+
+
+def _profile(ts_code: str) -> dict:
+    return {
+        "ts_code": ts_code,
+        "code": ts_code[:6],
+        "name": ts_code,
+        "industry": "银行",
+        "area": "",
+        "market": "主板",
+        "list_date": "",
+        "total_shares": None,
+        "float_shares": None,
+        "updated_at": int(time.time()),
+    }
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    store = ps.ProfileStore()
+    store._map = {}
+    monkeypatch.setattr(ps, "profile_store", store)
+    monkeypatch.setattr(ps.db_writer, "write", lambda fn: None)
+    snap = SpotSnapshot(version=1, fetched_at=time.time(), df=pd.DataFrame({"ts_code": CODES}))
+    monkeypatch.setattr(type(ps.spot_manager), "current", property(lambda self: snap))
+    return ps.ProfileRefresher(max_age=86400, rate_per_second=1e6, batch_size=10)
+
+
+def test_failing_symbol_backs_off(refresher, monkeypatch):
+    def fetch(ts_code):
+        if ts_code == "600001.SH":
+            raise RuntimeError("no such symbol")
+        return None if ts_code == "000001.SZ" else _profile(ts_code)
+
+    monkeypatch.setattr(ps, "fetch_profile", fetch)
+    assert refresher.run_batch() == 3
+    assert refresher.due() == []
+    assert refresher.stats()["backing_off"] == 2
+
+    # 退避到期后重试，间隔随连续失败翻倍
+    refresher._backoff = {c: (n, 0.0) for c, (n, _) in refresher._backoff.items()}
+    assert sorted(refresher.due()) == ["000001.SZ", "600001.SH"]
+    t0 = time.time()
+    refresher.run_batch()
+    n, until = refresher._backoff["600001.SH"]
+    assert n == 2 and until - t0 >= 2 * refresher.retry_after - 1
+
+
+def test_readers_get_a_snapshot(refresher):
+    store = ps.profile_store
+    store.upsert_many([_profile("600000.SH")])
+    before = store._map
+    frame = store.frame()
+    store.upsert_many([_profile("600001.SH")])
+    assert list(before) == ["600000.SH"]
+    assert len(frame) == 1 and len(store.frame()) == 2
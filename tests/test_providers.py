@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from backend.services.metrics import Metric
+from backend.services.providers import FixtureMissing, FixtureStore, Provider, ReplayProvider
+
+
+def _hist(days: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({"日期": days, "收盘": [10.0] * len(days)})
+
+
+def _kwargs(start: str, end: str) -> dict:
+    return {"symbol": "600000", "period": "daily", "start_date": start, "end_date": end, "adjust": ""}
+
+
+@pytest.fixture
+def replay(tmp_path):
+    fixtures = FixtureStore(str(tmp_path))
+    # 最长的录制覆盖不到请求的日期，较短的那条才覆盖
+    fixtures.write("stock_zh_a_hist", _kwargs("20230101", "20231231"), _hist([f"2023-{m:02d}-15" for m in range(1, 13)]))
+    fixtures.write("stock_zh_a_hist", _kwargs("20240101", "20240331"), _hist(["2024-01-15", "2024-02-15", "2024-03-15"]))
+    return ReplayProvider(fixtures)
+
+
+def test_hist_served_only_from_a_covering_recording(replay):
+    df = replay.fetch("stock_zh_a_hist", **_kwargs("20240201", "20240331"))
+    assert df["日期"].tolist() == ["2024-02-15", "2024-03-15"]
+    with pytest.raises(FixtureMissing):
+        replay.fetch("stock_zh_a_hist", **_kwargs("20231201", "20240131"))
+    with pytest.raises(FixtureMissing):
+        replay.fetch("stock_zh_a_hist", **{**_kwargs("20240201", "20240331"), "adjust": "qfq"})
+    assert (replay.hits, replay.misses) == (1, 2)
+
+
+def test_bases_are_abstract():
+    with pytest.raises(TypeError):
+        Provider()
+    with pytest.raises(TypeError):
+        Metric("x", "y")
@@ -0,0 +1,39 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.services.spot_snapshot import get_spot_snapshot
+
+
+def test_kline_is_compressed_and_revalidated():
+    client = TestClient(app)
+    ts_code = get_spot_snapshot().df["ts_code"].iloc[0]
+    url = f"/api/stocks/{ts_code}/kline?start=20240101&end=20240630&adj=none&format=columns"
+    r = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+    body = json.loads(r.content)
+    assert body["ts_code"] == ts_code and len(body["bars"]["t"]) > 20
+    again = client.get(url, headers={"If-None-Match": r.headers["etag"]})
+    assert again.status_code == 304 and not again.content
+
+
+def test_search_etag_follows_content_not_the_process_counter(monkeypatch):
+    from backend.services import spot_snapshot
+
+    client = TestClient(app)
+    url = "/api/stocks/search?q=0"
+    first = client.get(url).headers["etag"]
+    # 重启或另一个 worker：版本计数从头开始，缓存里是同一份行情
+    restarted = spot_snapshot.SnapshotManager(max_age=3600, refresh_interval=60)
+    monkeypatch.setattr(spot_snapshot, "spot_manager", restarted)
+    assert client.get(url).headers["etag"] == first
+    # 同样的版本号、不同的行情
+    df = restarted.current.df.copy()
+    df["close"] = df["close"] + 1
+    changed = spot_snapshot.SnapshotManager(max_age=3600, refresh_interval=60)
+    monkeypatch.setattr(changed, "_load", lambda max_age: (df, time.time()))
+    monkeypatch.setattr(spot_snapshot, "spot_manager", changed)
+    assert changed.get().version == restarted.current.version
+    assert client.get(url).headers["etag"] != first
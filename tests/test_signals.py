@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import signals
+from backend.services.bar_store import BAR_DTYPE
+from backend.services.strategy_dsl import StrategyDSL
+
+
+def _bars(rng: np.random.Generator, n: int) -> np.ndarray:
+    bars = np.zeros(n, dtype=BAR_DTYPE)
+    days = [date(2023, 1, 2) + timedelta(days=int(d)) for d in np.cumsum(rng.integers(1, 4, n))]
+    bars["t"] = [d.year * 10000 + d.month * 100 + d.day for d in days]
+    bars["c"] = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, n))), 2)
+    bars["o"] = bars["c"]
+    bars["v"] = 1000.0
+    return bars
+
+
+def _baseline_events(bars: np.ndarray, dsl: StrategyDSL) -> list[dict]:
+    """The original row-by-row engine (before vectorization), for equivalence checks."""
+    df = pd.DataFrame({"date": pd.to_datetime(bars["t"].astype(str)), "close": bars["c"].astype(float)})
+    df["ma5"] = df["close"].rolling(5).mean()
+    df["ma10"] = df["close"].rolling(10).mean()
+    df["ma5_slope"] = df["ma5"].diff()
+    events, entry_price, entry_date = [], None, None
+    tp, sl = dsl.exits.takeProfitPct, dsl.exits.stopLossPct
+
+    def ev(typ, date_, price, title, desc):
+        return {"type": typ, "date": date_.strftime("%Y-%m-%d"), "price": round(price, 3), "title": title, "desc": desc}
+
+    for i in range(1, len(df)):
+        r0, r1 = df.iloc[i - 1], df.iloc[i]
+        if pd.isna(r1["ma5"]) or pd.isna(r1["ma10"]):
+            continue
+        d, close0, close1 = r1["date"], float(r0["close"]), float(r1["close"])
+        buy_ok = close0 <= float(r0["ma5"]) and close1 > float(r1["ma5"]) and float(r1["ma5_slope"] or 0) > 0
+        if dsl.filters.tech == "break_20d":
+            w = df.iloc[max(0, i - 20) : i]
+            if len(w) >= 10 and close1 >= float(w["close"].max()):
+                buy_ok = True
+        if dsl.filters.tech == "rsi_oversold":
+            w = df.iloc[max(0, i - 10) : i]
+            if len(w) >= 8 and close1 > close0 and close1 >= float(w["close"].min()) * 1.03:
+                buy_ok = True
+        if entry_price is None and buy_ok:
+            entry_price, entry_date = close1, d
+            events.append(ev("buy", d, close1, "买入触发", "价格上穿MA5且MA5上行（或技术触发近似）。"))
+            continue
+        if entry_price is not None:
+            if tp is not None and close1 >= entry_price * (1 + float(tp) / 100.0):
+                events.append(ev("sell", d, close1, "止盈触发", f"达到止盈 {tp}%。"))
+                entry_price = None
+                continue
+            if sl is not None and close1 <= entry_price * (1 + float(sl) / 100.0):
+                events.append(ev("sell", d, close1, "止损触发", f"达到止损 {sl}%。"))
+                entry_price = None
+                continue
+            if dsl.exits.exitPattern == "close_below_ma10" and close0 >= float(r0["ma10"]) and close1 < float(r1["ma10"]):
+                events.append(ev("sell", d, close1, "形态退出", "收盘跌破MA10。"))
+                entry_price = None
+                continue
+            if (d - entry_date).days >= 15:
+                events.append(ev("note", d, close1, "持仓观察", "持仓超过两周，关注趋势延续与量能。"))
+                entry_date = d
+    return events[-30:]
+
+
+@pytest.mark.parametrize("tech", ["", "ma_up_5", "break_20d", "rsi_oversold"])
+@pytest.mark.parametrize("exit_pattern", ["", "close_below_ma10"])
+def test_events_match_the_baseline_engine(monkeypatch, tech, exit_pattern):
+    rng = np.random.default_rng(len(tech) * 7 + len(exit_pattern))
+    for k in range(20):
+        # 短序列覆盖 break_20d / rsi_oversold 窗口未满（10 / 8 根起算）的情况
+        bars = _bars(rng, int(rng.integers(12, 300)))
+        exits = {"exitPattern": exit_pattern, "takeProfitPct": [None, 8][k % 2], "stopLossPct": [None, -5][k // 2 % 2]}
+        dsl = StrategyDSL.model_validate({"filters": {"tech": tech}, "exits": exits})
+        monkeypatch.setattr(signals, "get_kline_array", lambda *a, **kw: bars)
+        assert signals.compute_strategy_events("600000.SH", dsl, 400)["events"] == _baseline_events(bars, dsl)
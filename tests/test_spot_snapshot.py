@@ -0,0 +1,45 @@
+import time
+
+import pandas as pd
+import pytest
+
+from backend.services import spot_snapshot, upstream
+from backend.services.cache import cache_set
+from backend.services.spot_snapshot import codes_to_ts
+from backend.services.stocks import _code_to_ts
+
+
+def test_every_exchange_gets_a_suffix():
+    codes = ["600000", "688981", "000001", "300750", "830799", "430047", "920001", "900901"]
+    expected = ["600000.SH", "688981.SH", "000001.SZ", "300750.SZ", "830799.BJ", "430047.BJ", "920001.BJ", "900901"]
+    assert codes_to_ts(pd.Series(codes)).tolist() == expected
+    assert [_code_to_ts(c) for c in codes] == expected
+
+
+@pytest.fixture
+def manager(monkeypatch, request):
+    monkeypatch.setattr(spot_snapshot, "SPOT_CACHE_KEY", f"test:spot:{request.node.name}")
+    calls = []
+    real = upstream.call
+    monkeypatch.setattr(upstream, "call", lambda name, **kw: calls.append(name) or real(name, **kw))
+    m = spot_snapshot.SnapshotManager(max_age=3600, refresh_interval=60, error_backoff=60)
+    m.calls = calls
+    return m
+
+
+def test_cache_hit_keeps_the_original_fetch_time(manager):
+    df = spot_snapshot.typed_spot(upstream.call("stock_zh_a_spot_em"))
+    manager.calls.clear()
+    fetched_at = time.time() - 100
+    cache_set(spot_snapshot.SPOT_CACHE_KEY, {"frame": df, "fetched_at": fetched_at}, ttl_seconds=3600)
+    snap = manager.get(max_age=600)
+    assert snap.fetched_at == fetched_at and snap.age >= 100 and not manager.calls
+    # 调用方要更新的数据时，别的 worker 写的旧缓存不算数
+    assert manager.get(max_age=30).age < 30 and manager.calls == ["stock_zh_a_spot_em"]
+
+
+def test_empty_upstream_frame_backs_off(manager, monkeypatch):
+    monkeypatch.setattr(upstream, "call", lambda name, **kw: manager.calls.append(name) or pd.DataFrame())
+    assert manager.get().empty
+    assert manager.get().empty
+    assert manager.calls == ["stock_zh_a_spot_em"]
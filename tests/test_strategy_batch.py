@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services import strategy_batch as sb
+from backend.services import trade_calendar
+from backend.services.spot_snapshot import SpotSnapshot
+from backend.services.strategy_dsl import StrategyCreateRequest, StrategyDSL
+from backend.services.strategy_store import create_strategy
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    create_strategy(StrategyCreateRequest(name="sched", dsl=StrategyDSL.model_validate({"filters": {"peMax": 30}})))
+    out = []
+    real = sb.run_all_strategies
+    monkeypatch.setattr(sb, "run_all_strategies", lambda *a, **kw: out.append(a) or real(*a, **kw))
+    return out
+
+
+@pytest.fixture
+def scheduler(calls):
+    return sb.StrategyScheduler(at="15:30")
+
+
+def test_batch_runs_once_per_trading_day_across_restarts(scheduler, calls):
+    now = datetime(2024, 6, 3, 16, 0)
+    assert scheduler.due(now)
+    assert scheduler.run_once(now)["runs"]
+    # 新进程（重启 / 另一个 worker）从库里看到当天已跑过
+    fresh = sb.StrategyScheduler(at="15:30")
+    assert not fresh.due(now)
+    assert fresh.run_once(now) is None
+    assert len(calls) == 1
+
+
+def test_manual_batch_does_not_count_as_scheduled(scheduler):
+    sb.run_all_strategies("20240604")
+    assert scheduler.due(datetime(2024, 6, 4, 16, 0))
+
+
+def test_holiday_and_empty_snapshot_are_skipped(scheduler, calls, monkeypatch):
+    assert not scheduler.due(datetime(2024, 6, 8, 16, 0))
+    # 国庆假期是工作日但不开市
+    monkeypatch.setattr(trade_calendar, "trading_days", lambda: np.array([20240927, 20240930, 20241008]))
+    assert not scheduler.due(datetime(2024, 10, 1, 16, 0))
+    assert scheduler.due(datetime(2024, 10, 8, 16, 0))
+    empty = SpotSnapshot(version=0, fetched_at=0.0, df=pd.DataFrame())
+    monkeypatch.setattr(sb, "get_spot_snapshot", lambda max_age=None: empty)
+    now = datetime(2024, 10, 8, 16, 0)
+    assert scheduler.run_once(now) is None
+    assert scheduler.due(now) and not calls
@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.services.strategy_store import save_runs
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def _items(n: int) -> list[dict]:
+    return [{"rank": i + 1, "ts_code": f"{600000 + i}.SH", "name": str(i)} for i in range(n)]
+
+
+def test_runs_paginate_with_an_opaque_cursor(client):
+    save_runs([("stg_page", {"trade_date": "20240603"}, {"trade_date": "20240603"}, _items(3)) for _ in range(5)])
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/strategies/stg_page/runs", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        seen += [r["id"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert "|" not in cursor
+    assert len(seen) == len(set(seen)) == 5
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2024-01-01|run_x", "bnVsbA", "WzFd"])
+def test_bad_cursor_is_a_400(client, cursor):
+    r = client.get("/api/strategies/stg_page/runs", params={"cursor": cursor})
+    assert r.status_code == 400
+
+
+def test_latest_counts_every_item(client):
+    save_runs([("stg_big", {"trade_date": "20240603"}, {"trade_date": "20240603"}, _items(250))])
+    result = client.get("/api/strategies/stg_big/latest").json()["result"]
+    assert result["count"] == 250 and len(result["items"]) == 200
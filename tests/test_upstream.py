@@ -0,0 +1,66 @@
+import dataclasses
+import threading
+import time
+
+import pytest
+
+from backend.services import upstream
+
+
+class FakeProvider:
+    def __init__(self):
+        self.release = threading.Event()
+        self.error: BaseException | None = None
+
+    def fetch(self, func_name, **kwargs):
+        if func_name == "hangs":
+            self.release.wait(5)
+            return []
+        if self.error is not None:
+            raise self.error
+        return [kwargs]
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    p = FakeProvider()
+    monkeypatch.setattr(upstream, "get_provider", lambda: p)
+    monkeypatch.setattr(upstream, "_settings", dataclasses.replace(upstream._settings, upstream_max_stuck=2, upstream_breaker_threshold=3))
+    monkeypatch.setitem(upstream.UPSTREAM_TIMEOUTS, "hangs", 0.05)
+    monkeypatch.setattr(upstream, "_breakers", {})
+    yield p
+    p.release.set()
+
+
+def test_hung_calls_are_bounded_per_function(provider):
+    for i in range(2):
+        with pytest.raises(upstream.UpstreamUnavailable, match="timed out"):
+            upstream.call("hangs", n=i)
+    assert upstream.upstream_stats()["stuck"] == {"hangs": 2}
+    t0 = time.perf_counter()
+    with pytest.raises(upstream.UpstreamUnavailable, match="hung calls"):
+        upstream.call("hangs", n=9)
+    assert time.perf_counter() - t0 < 0.05
+    # 其它接口不受影响
+    assert upstream.call("other", n=1) == [{"n": 1}]
+    provider.release.set()
+    deadline = time.time() + 2
+    while upstream.upstream_stats()["stuck"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert upstream.upstream_stats()["stuck"] == {}
+
+
+def test_breaker_counts_only_transport_errors(provider):
+    provider.error = KeyError("no such symbol")
+    for i in range(5):
+        with pytest.raises(KeyError):
+            upstream.call("data_fn", symbol=str(i))
+    assert upstream.breaker("data_fn").state == "closed"
+    provider.error = ConnectionError("reset by peer")
+    for i in range(3):
+        with pytest.raises(ConnectionError):
+            upstream.call("data_fn", symbol=str(i))
+    assert upstream.breaker("data_fn").state == "open"